@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+سكريبت قياس أداء سكريبتات الترجمة
+يولّد مشروع JSX اصطناعياً بالحجم المطلوب ويقيس الوقت والسرعة وذروة الذاكرة
+لكل مرحلة، ويقارن النتائج بقياس أساسي محفوظ لاكتشاف التراجع
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ============================================
+# الإعدادات
+# ============================================
+
+# أحجام المشروع (عدد النصوص)
+SIZES = [100, 1000, 10000, 100000]
+
+# ملف القياس الأساسي
+BASELINE_FILE = "benchmark_baseline.json"
+
+# نسبة البطء التي تُعتبر تراجعاً (0.2 = أبطأ بـ 20%)
+REGRESSION_THRESHOLD = 0.2
+
+# عدد مرات التكرار (يؤخذ الأسرع)
+REPEAT = 3
+
+# عدد النصوص في كل ملف JSX
+STRINGS_PER_FILE = 40
+
+BENCHMARKS = ['extract_all_texts', 'generate_translation_key', 'generate_translations_jsx',
+              'split_translations', 'load_translations']
+
+# ============================================
+# توليد المشروع الاصطناعي
+# ============================================
+
+ARABIC_WORDS = [
+    'التوبة', 'الإسلام', 'الصلاة', 'الرحمة', 'المغفرة', 'الدروس', 'الفتاوى', 'تواصل',
+    'معنا', 'الآن', 'حفظ', 'التغييرات', 'إرسال', 'الرسالة', 'بحث', 'الصفحة', 'الرئيسية',
+    'مرحبا', 'بكم', 'في', 'موقعنا', 'تعلم', 'أركان', 'الإيمان', 'اقرأ', 'المزيد',
+]
+
+ENGLISH_WORDS = [
+    'Welcome', 'to', 'our', 'website', 'Learn', 'about', 'Islam', 'Repentance', 'Contact',
+    'us', 'today', 'Save', 'changes', 'Send', 'message', 'Search', 'courses', 'Read', 'more',
+    'Profile', 'settings', 'Your', 'progress', 'lesson', 'completed',
+]
+
+PAGE_NAMES = ['Home', 'Repentance', 'Fatwa', 'LearnIslam', 'Contact', 'Courses', 'Profile',
+              'Reconciliation', 'Settings', 'Search', 'About', 'Login']
+
+def random_phrase(rng):
+    """عبارة عربية أو إنجليزية عشوائية"""
+    if rng.random() < 0.6:
+        return ' '.join(rng.choice(ARABIC_WORDS) for _ in range(rng.randint(2, 7)))
+    words = [rng.choice(ENGLISH_WORDS) for _ in range(rng.randint(2, 7))]
+    return ' '.join([words[0].capitalize()] + words[1:])
+
+def generate_page(rng, strings):
+    """محتوى ملف JSX فيه النصوص المطلوبة بأشكال مختلفة + كود لا يُترجم"""
+    lines = [
+        "import React, { useState } from 'react';",
+        "import { Button } from '@/components/ui/button';",
+        "",
+        "export default function Page() {",
+        "  const [open, setOpen] = useState(false);",
+        "  const url = 'https://example.com/api/v1';",
+        "  return (",
+        '    <div className="container mx-auto px-4">',
+    ]
+    for i in range(strings):
+        text = random_phrase(rng)
+        kind = rng.random()
+        if kind < 0.45:
+            # نص JSX
+            lines.append(f'      <p className="text-lg text-gray-700">{text}</p>')
+        elif kind < 0.7:
+            # خاصية بين علامتي تنصيص مزدوجة
+            lines.append(f'      <Button title="{text}" onClick={{() => setOpen(!open)}}>'
+                         f'{{open ? "{i}" : null}}</Button>')
+        elif kind < 0.9:
+            # نص JavaScript بين علامتي تنصيص مفردة
+            lines.append(f"      {{open && <span>{{'{text}'}}</span>}}")
+        else:
+            # تكرار نصوص شائعة بين الصفحات
+            lines.append(f'      <h2 className="font-bold">{rng.choice(ARABIC_WORDS)} {rng.choice(ARABIC_WORDS)}</h2>')
+    lines += ["    </div>", "  );", "}", ""]
+    return '\n'.join(lines)
+
+def generate_corpus(root, total_strings, seed=42):
+    """توليد src/pages بعدد النصوص المطلوب تقريباً"""
+    rng = random.Random(seed)
+    pages_dir = Path(root) / 'src' / 'pages'
+    files = max(1, total_strings // STRINGS_PER_FILE)
+
+    for i in range(files):
+        folder = pages_dir / f"section{i % 10}"
+        folder.mkdir(parents=True, exist_ok=True)
+        name = f"{PAGE_NAMES[i % len(PAGE_NAMES)]}{i}.jsx"
+        strings = min(STRINGS_PER_FILE, total_strings - i * STRINGS_PER_FILE) if i == files - 1 else STRINGS_PER_FILE
+        (folder / name).write_text(generate_page(rng, max(strings, 1)), encoding='utf-8')
+
+    return pages_dir
+
+def fill_translations(data):
+    """ترجمات وهمية لكل اللغات (لقياس مرحلة الإخراج)"""
+    for category_data in data.values():
+        for item in category_data.values():
+            source = item['ar'] or item['en']
+            for lang in ('ar', 'en', 'fr', 'zh'):
+                if not item[lang]:
+                    item[lang] = f"[{lang}] {source}"
+            item['needs_translation'] = False
+    return data
+
+# ============================================
+# تشغيل القياسات
+# ============================================
+
+def peak_rss_mb():
+    """ذروة ذاكرة العملية الحالية بالميغابايت"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # كيلوبايت في Linux، بايت في macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_case(name, workdir, repeat):
+    """تشغيل قياس واحد داخل عملية مستقلة: (أفضل وقت، عدد النصوص، حجم المدخلات، ذروة الذاكرة)"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import extract_texts
+    import split_translations
+
+    pages_dir = os.path.join(workdir, 'src', 'pages')
+    final_file = os.path.join(workdir, 'translations_final.json')
+
+    if name == 'load_translations':
+        # بدون json.load مسبق: ذروة الذاكرة هنا هي ذاكرة المخزن المضغوط وحده
+        import translate_texts
+        func = lambda: translate_texts.read_translations(final_file)
+        strings = sum(len(category) for category in func().values())
+        return time_case(func, repeat), strings, os.path.getsize(final_file), peak_rss_mb()
+
+    with open(final_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    texts = [item['ar'] or item['en'] for category in data.values() for item in category.values()]
+
+    if name == 'extract_all_texts':
+        input_bytes = sum(path.stat().st_size for path in Path(pages_dir).rglob('*.jsx'))
+        func = lambda: extract_texts.extract_all_texts(pages_dir)
+    elif name == 'generate_translation_key':
+        input_bytes = sum(len(text.encode('utf-8')) for text in texts)
+        def func():
+            keys = extract_texts.KeyIndex()
+            for text in texts:
+                extract_texts.generate_translation_key(text, keys)
+    elif name == 'generate_translations_jsx':
+        import translate_texts
+        input_bytes = os.path.getsize(final_file)
+        func = lambda: translate_texts.generate_translations_jsx(data)
+    elif name == 'split_translations':
+        input_bytes = os.path.getsize(final_file)
+        output_dir = os.path.join(workdir, 'locales')
+        func = lambda: split_translations.split_translations(final_file, output_dir)
+    else:
+        raise ValueError(f"قياس غير معروف: {name}")
+
+    return time_case(func, repeat), len(texts), input_bytes, peak_rss_mb()
+
+def time_case(func, repeat):
+    """أفضل وقت من عدة تكرارات"""
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def prepare_workdir(workdir, size):
+    """توليد المشروع واستخراجه مرة واحدة لكل حجم"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import extract_texts
+
+    pages_dir = generate_corpus(workdir, size)
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = extract_texts.extract_all_texts(str(pages_dir))
+
+    with open(os.path.join(workdir, 'translations_final.json'), 'w', encoding='utf-8') as f:
+        json.dump(fill_translations(data), f, ensure_ascii=False, indent=2)
+
+def run_benchmarks(sizes, benchmarks, repeat=REPEAT):
+    """تشغيل كل القياسات لكل حجم، كل قياس في عملية جديدة لقياس ذروة الذاكرة بدقة"""
+    results = {}
+    context = get_context('spawn')
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix=f"bench_{size}_") as workdir:
+            print(f"\n📦 توليد مشروع بـ {size} نص...")
+            prepare_workdir(workdir, size)
+
+            for name in benchmarks:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    seconds, strings, input_bytes, rss = pool.submit(run_case, name, workdir, repeat).result()
+
+                results.setdefault(name, {})[str(size)] = {
+                    'seconds': round(seconds, 5),
+                    'strings': strings,
+                    'strings_per_second': round(strings / seconds, 1) if seconds else None,
+                    'mb_per_second': round(input_bytes / (1024 * 1024) / seconds, 2) if seconds else None,
+                    'peak_rss_mb': round(rss, 1) if rss is not None else None,
+                }
+                print_result(name, size, results[name][str(size)])
+
+    return results
+
+# ============================================
+# المقارنة والتقارير
+# ============================================
+
+def print_result(name, size, result):
+    """سطر نتيجة واحد"""
+    rss = f"{result['peak_rss_mb']:.1f} MB" if result['peak_rss_mb'] is not None else "-"
+    print(f"   {name:<28} {result['seconds']:>9.4f}s  {result['strings_per_second']:>12,.0f} نص/ث"
+          f"  {result['mb_per_second']:>8.2f} MB/s  ذروة الذاكرة {rss}")
+
+def compare_with_baseline(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """مقارنة النتائج بالقياس الأساسي وإرجاع قائمة التراجعات"""
+    regressions = []
+
+    print("\n" + "="*50)
+    print("📊 المقارنة مع القياس الأساسي:")
+    print("="*50)
+
+    for name, sizes in results.items():
+        for size, result in sizes.items():
+            base = baseline.get(name, {}).get(size)
+            if not base:
+                continue
+            ratio = result['seconds'] / base['seconds'] if base['seconds'] else 1.0
+            marker = "✅"
+            if ratio > 1 + threshold:
+                marker = "❌"
+                regressions.append((name, size, ratio))
+            print(f"{marker} {name} [{size}]: {base['seconds']:.4f}s ← {result['seconds']:.4f}s ({ratio:.2f}x)")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} تراجع في الأداء (أبطأ بأكثر من {threshold:.0%} من الأساس)")
+    else:
+        print("\n✅ لا يوجد تراجع في الأداء")
+
+    return regressions
+
+def parse_args():
+    """قراءة خيارات سطر الأوامر"""
+    parser = argparse.ArgumentParser(description="قياس أداء سكريبتات الترجمة")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in SIZES),
+                        help="أحجام المشروع (عدد النصوص) مفصولة بفواصل")
+    parser.add_argument('--only', default=','.join(BENCHMARKS),
+                        help="القياسات المطلوبة مفصولة بفواصل")
+    parser.add_argument('--repeat', type=int, default=REPEAT,
+                        help="عدد مرات التكرار (يؤخذ الأسرع)")
+    parser.add_argument('--baseline', default=BASELINE_FILE,
+                        help="ملف القياس الأساسي")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="حفظ النتائج كقياس أساسي جديد")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="نسبة البطء التي تُعتبر تراجعاً")
+    parser.add_argument('--output', help="حفظ النتائج في ملف JSON")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    benchmarks = [name for name in args.only.split(',') if name]
+    for name in benchmarks:
+        if name not in BENCHMARKS:
+            raise SystemExit(f"❌ قياس غير معروف: {name} (المتاح: {', '.join(BENCHMARKS)})")
+
+    print("🚀 بدء قياس الأداء...")
+    results = run_benchmarks(sizes, benchmarks, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ تم حفظ النتائج في: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ تم حفظ القياس الأساسي: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare_with_baseline(results, baseline, args.threshold):
+            exit(1)
+    else:
+        print(f"\n💡 لا يوجد قياس أساسي بعد، احفظه بـ: python benchmark.py --save-baseline")
@@ -1,36 +1,81 @@
 #!/usr/bin/env python3
 """
 سكريبت فحص تقدم الترجمة
+يقرأ ملف الإحصائيات الصغير الذي يحدّثه translate_texts.py، وإذا لم يوجد
+يعدّ النصوص بقراءة متدفقة لـ translations_final.json دون تحميله كاملاً
 """
 
 import json
 import os
 
+from translation_store import iter_items
+
 INPUT_FILE = "translations_final.json"
+STATS_FILE = "translations_final.stats.json"
+
+LANGUAGES = ['ar', 'en', 'fr', 'zh']
+
+def load_stats():
+    """قراءة ملف الإحصائيات إذا كان أحدث من ملف الترجمات"""
+    if not os.path.exists(STATS_FILE):
+        return None
+    if os.path.exists(INPUT_FILE) and os.path.getmtime(STATS_FILE) < os.path.getmtime(INPUT_FILE):
+        return None
+    try:
+        with open(STATS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def count_progress():
+    """عدّ النصوص بقراءة متدفقة (عند غياب ملف الإحصائيات)"""
+    categories = {}
+    languages = {lang: {'filled': 0, 'missing': 0} for lang in LANGUAGES}
+    
+    for category, key, item in iter_items(INPUT_FILE):
+        counts = categories.setdefault(category, {'total': 0, 'pending': 0})
+        counts['total'] += 1
+        if item.get('needs_translation', True):
+            counts['pending'] += 1
+        for lang, lang_counts in languages.items():
+            lang_counts['filled' if item.get(lang) else 'missing'] += 1
+    
+    total = sum(c['total'] for c in categories.values())
+    pending = sum(c['pending'] for c in categories.values())
+    return {
+        'total': total,
+        'completed': total - pending,
+        'pending': pending,
+        'categories': categories,
+        'languages': languages,
+    }
+
+def format_duration(seconds):
+    """مدة مقروءة"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours} ساعة {minutes} دقيقة"
+    if minutes:
+        return f"{minutes} دقيقة {seconds} ثانية"
+    return f"{seconds} ثانية"
 
 def check_progress():
     """فحص تقدم الترجمة"""
     
-    if not os.path.exists(INPUT_FILE):
-        print("❌ الملف غير موجود: translations_final.json")
-        print("   شغّل translate_texts.py أولاً")
-        return
-    
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    stats = load_stats()
     
-    total = 0
-    completed = 0
-    needs_translation = 0
+    if stats is None:
+        if not os.path.exists(INPUT_FILE):
+            print("❌ الملف غير موجود: translations_final.json")
+            print("   شغّل translate_texts.py أولاً")
+            return
+        stats = count_progress()
     
-    for category in data.values():
-        for item in category.values():
-            total += 1
-            
-            if not item.get('needs_translation', True):
-                completed += 1
-            else:
-                needs_translation += 1
+    total = stats['total']
+    completed = stats['completed']
+    needs_translation = stats['pending']
     
     percentage = (completed / total * 100) if total > 0 else 0
     
@@ -41,17 +86,46 @@ def check_progress():
     print(f"✅ مترجم: {completed}")
     print(f"⏳ يحتاج ترجمة: {needs_translation}")
     print(f"\n📈 النسبة: {percentage:.1f}%")
+    
+    print("\nحسب الفئة:")
+    for category, counts in sorted(stats['categories'].items()):
+        print(f"  • {category}: {counts['total'] - counts['pending']}/{counts['total']}")
+    
+    print("\nحسب اللغة:")
+    for lang, counts in stats['languages'].items():
+        print(f"  • {lang}: {counts['filled']} مترجم، {counts['missing']} فارغ")
+    
+    totals = stats.get('totals')
+    if totals:
+        print(f"\n💰 التوكنات: {totals['input_tokens']} مدخلات + {totals['output_tokens']} مخرجات"
+              f" ≈ ${totals['cost_usd']:.2f}")
+        if totals.get('cache_read_tokens') or totals.get('cache_write_tokens'):
+            print(f"🗄️  كاش التعليمات: كتابة {totals.get('cache_write_tokens', 0)}"
+                  f" + قراءة {totals.get('cache_read_tokens', 0)} توكن")
     print("="*50)
     
     if needs_translation == 0:
         print("\n🎉 تهانينا! اكتملت جميع الترجمات!")
         print("\n📝 الخطوة التالية:")
         print("   python split_translations.py")
-    else:
-        remaining_runs = (needs_translation // 50) + 1
-        print(f"\n⏳ متبقي حوالي {remaining_runs} تشغيل")
-        print("\n📝 شغّل:")
-        print("   python translate_texts.py")
+        return
+    
+    run = stats.get('run') or {}
+    # آخر تشغيل توقف عند الميزانية: التشغيلات الباقية بنفس الميزانية
+    if run.get('budget_reached') and run.get('translated'):
+        remaining_runs = -(-needs_translation // run['translated'])
+        budget = f"${run['budget_usd']:g}" if run.get('budget_usd') else f"{run.get('budget_tokens')} توكن"
+        print(f"\n⏳ متبقي حوالي {remaining_runs} تشغيل (ميزانية {budget} لكل تشغيل)")
+    
+    # الوقت المتبقي حسب سرعة الترجمة المقاسة في آخر تشغيل (النصوص المترجمة عبر الـ API
+    # ومدة مرحلة الترجمة فقط؛ ملفات إحصائيات قديمة بدون translated لا تُستخدم)
+    speed = run.get('items_per_second') if run.get('translated') else None
+    if speed:
+        print(f"⏱️  الوقت المتبقي المتوقع: {format_duration(needs_translation / speed)}"
+              f" ({speed:.2f} نص/ثانية)")
+    
+    print("\n📝 شغّل:")
+    print("   python translate_texts.py")
 
 if __name__ == "__main__":
     check_progress()
@@ -4,9 +4,12 @@
 يستخرج النصوص العربية والإنجليزية من ملفات JSX ويترجمها لـ 4 لغات
 """
 
+import argparse
+import hashlib
 import re
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # ============================================
@@ -17,7 +20,18 @@ from pathlib import Path
 PAGES_DIR = "src/pages"
 OUTPUT_FILE = "translations_extracted.json"
 
+# سجل الملفات (mtime + الحجم + البصمة + النصوص) لإعادة الفحص التزايدي
+MANIFEST_FILE = "translations_extracted.manifest.json"
+MANIFEST_VERSION = 1
+
+# فهرس المفاتيح (عداد لكل مفتاح أساسي) ليبقى توليد المفاتيح ثابتاً وسريعاً بين التشغيلات
+KEY_INDEX_FILE = "translations_extracted.keys.json"
+
+# عدد العمليات المتوازية للاستخراج (1 = بدون توازي)
+JOBS = 1
+
 # أنماط البحث عن النصوص
+# (كل نمط يبدأ بحرف ثابت ويحتوي مجموعة التقاط واحدة - انظر build_scanner)
 PATTERNS = {
     # نصوص بين علامات تنصيص مزدوجة
     'double_quotes': r'"([^"]{3,})"',
@@ -40,19 +54,97 @@ IGNORE_PATTERNS = [
     r'^https?://',  # روابط
 ]
 
+# التصنيف قبل الترجمة: نصوص تُحفظ كما هي ولا تُرسل للترجمة
+# كلمات قرآنية مميزة
+QURANIC_INDICATORS = [
+    'قُلْ', 'إِنَّ', 'وَ', 'الَّذِينَ', 'يَا عِبَادِيَ',
+    'لَا تَقْنَطُوا', 'رَّحْمَةِ', 'اللَّهِ', 'يُحِبُّ',
+    'التَّوَّابِينَ', 'الْمُتَطَهِّرِينَ'
+]
+# نسبة التشكيل التي تجعل النص آية (الآيات تحتوي تشكيلاً كاملاً)
+QURANIC_TASHKEEL_RATIO = 0.3
+
+# أسماء علامات تجارية لا تُترجم (أضف أسماء مشروعك)
+BRAND_NAMES = [
+    'WhatsApp', 'YouTube', 'Facebook', 'Instagram', 'Telegram', 'Twitter',
+    'TikTok', 'LinkedIn', 'Google Play', 'App Store', 'Google', 'Apple',
+]
+
+# أسماء اللغات بلغتها (قائمة تبديل اللغة): تُعرض كما هي في كل اللغات
+NATIVE_LANG_NAMES = ['العربية', 'English', 'Français', '中文']
+
+# حروف لاتينية لا تُكتب بها الإنجليزية: نص غير عربي يحتويها مكتوب أصلاً بالفرنسية
+FRENCH_LETTERS = 'àâæçéèêëîïôœùûüÿÀÂÆÇÉÈÊËÎÏÔŒÙÛÜŸ'
+
+# أنماط النص الكامل التي لا تُترجم (الاسم هو سبب التخطي)
+SKIP_PATTERNS = {
+    # أرقام وتواريخ وأسعار وهواتف (عربية أو لاتينية)
+    'numeric': r'[\d\u0660-\u0669\s.,:;/+\-%()$€£#×]+',
+    'brand': '|'.join(re.escape(name) for name in BRAND_NAMES),
+    # اختصارات بحروف كبيرة: FAQ, PDF, HTML5
+    'acronym': r'[A-Z][A-Z0-9&.\-]+',
+    # اسم لغة بلغتها في قائمة تبديل اللغة
+    'native_name': '|'.join(re.escape(name) for name in NATIVE_LANG_NAMES),
+}
+
+# ============================================
+# الأنماط المترجمة مسبقاً
+# ============================================
+
+def build_scanner(patterns):
+    """دمج أنماط البحث في تعبير واحد يُمرّ به على الملف مرة واحدة
+    
+    كل نمط يبدأ بحرف ثابت (" أو ' أو >)، فيختار المحرك البديل المناسب من
+    الحرف الأول فقط، وبقية النمط داخل نظرة أمامية. هكذا يُبلَّغ عن كل
+    موضع يبدأ منه أي نمط، ويحاكي scan_texts سلوك re.findall لكل نمط.
+    """
+    alternatives = []
+    for name, pattern in patterns.items():
+        rest = pattern[1:].replace('(', f'(?P<{name}_value>', 1)
+        alternatives.append(f"{re.escape(pattern[0])}(?=(?P<{name}>{rest}))")
+    return re.compile('|'.join(alternatives))
+
+SCANNER = build_scanner(PATTERNS)
+
+# رقم مجموعة كل نمط ← رقم مجموعة النص داخله
+SCANNER_VALUE_GROUPS = {
+    SCANNER.groupindex[name]: SCANNER.groupindex[f'{name}_value'] for name in PATTERNS
+}
+
+# كل أنماط التجاهل في تعبير واحد
+IGNORE_MATCHER = re.compile('|'.join(f'(?:{pattern})' for pattern in IGNORE_PATTERNS))
+
+KEY_STRIP_RE = re.compile(r'[^\w\s]')
+
+# كل أنماط التخطي في تعبير واحد: اسم المجموعة المطابقة هو السبب
+SKIP_MATCHER = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in SKIP_PATTERNS.items()))
+# الكلمات القرآنية (الأطول أولاً) وحركات التشكيل
+QURANIC_MATCHER = re.compile('|'.join(
+    re.escape(indicator) for indicator in sorted(QURANIC_INDICATORS, key=len, reverse=True)
+))
+TASHKEEL_RE = re.compile('[ًٌٍَُِّْ]')
+
+ARABIC_RE = re.compile(r'[\u0600-\u06FF]')
+CHINESE_RE = re.compile(r'[\u4e00-\u9fff]')
+FRENCH_RE = re.compile(f'[{FRENCH_LETTERS}]')
+
 # ============================================
 # دوال مساعدة
 # ============================================
 
 def is_arabic(text):
     """فحص إذا كان النص يحتوي على عربي"""
-    arabic_pattern = re.compile(r'[\u0600-\u06FF]')
-    return bool(arabic_pattern.search(text))
+    return ARABIC_RE.search(text) is not None
 
 def is_chinese(text):
     """فحص إذا كان النص يحتوي على صيني"""
-    chinese_pattern = re.compile(r'[\u4e00-\u9fff]')
-    return bool(chinese_pattern.search(text))
+    return CHINESE_RE.search(text) is not None
+
+def is_target_script(text):
+    """نص مصدره غير عربي (يُعامل كإنجليزي) لكنه مكتوب بحروف لغة هدف: فرنسية أو صينية"""
+    return not is_arabic(text) and (
+        FRENCH_RE.search(text) is not None or CHINESE_RE.search(text) is not None
+    )
 
 def should_ignore(text):
     """فحص إذا كان النص يجب تجاهله"""
@@ -63,11 +155,15 @@ def should_ignore(text):
         return True
     
     # تحقق من الأنماط المتجاهلة
-    for pattern in IGNORE_PATTERNS:
-        if re.match(pattern, text):
-            return True
+    return IGNORE_MATCHER.match(text) is not None
+
+def is_candidate(text):
+    """هل النص المنظف نص واجهة يحتاج ترجمة؟"""
+    if should_ignore(text):
+        return False
     
-    return False
+    # النصوص العربية والإنجليزية فقط
+    return is_arabic(text) or (len(text) > 5 and text[0].isupper())
 
 def clean_text(text):
     """تنظيف النص"""
@@ -77,6 +173,31 @@ def clean_text(text):
     text = text.strip('.,;:!?()[]{}\'\"')
     return text
 
+def is_quranic_verse(text):
+    """فحص إذا كان النص آية قرآنية"""
+    # إذا كان أكثر من 30% من النص تشكيل → غالباً آية
+    if text and len(TASHKEEL_RE.findall(text)) / len(text) > QURANIC_TASHKEEL_RATIO:
+        return True
+    
+    # إذا كان يحتوي كلمات قرآنية مميزة
+    return QURANIC_MATCHER.search(text) is not None
+
+def classify_text(text):
+    """نوع النص وسبب تخطي ترجمته ('' = يُترجم)"""
+    match = SKIP_MATCHER.fullmatch(text)
+    if match:
+        return match.lastgroup, match.lastgroup
+    if is_arabic(text) and is_quranic_verse(text):
+        return 'quranic', 'quranic'
+    if is_target_script(text):
+        return 'already_target', 'already_target'
+    return 'text', ''
+
+def classify_item(item, text):
+    """إضافة kind و skip_reason إلى عنصر (مرة واحدة عند الاستخراج)"""
+    item['kind'], item['skip_reason'] = classify_text(text)
+    return item
+
 def extract_texts_from_file(file_path):
     """استخراج جميع النصوص من ملف JSX"""
     try:
@@ -86,32 +207,108 @@ def extract_texts_from_file(file_path):
         print(f"❌ خطأ في قراءة {file_path}: {e}")
         return []
     
-    texts = set()
-    
-    # استخراج النصوص باستخدام الأنماط المختلفة
-    for pattern_name, pattern in PATTERNS.items():
-        matches = re.findall(pattern, content)
-        for match in matches:
-            text = clean_text(match)
-            
-            # تجاهل النصوص غير المناسبة
-            if should_ignore(text):
-                continue
-            
-            # إضافة النصوص العربية والإنجليزية فقط
-            if is_arabic(text) or (len(text) > 5 and text[0].isupper()):
-                texts.add(text)
+    return extract_texts_from_content(content)
+
+def scan_texts(content):
+    """مرور واحد على الملف: (النص، السطر، العمود) لكل نص مرشح"""
+    # نهاية آخر تطابق لكل نمط (نفس سلوك findall بدون تداخل)
+    ends = dict.fromkeys(SCANNER_VALUE_GROUPS, 0)
+    # قرار كل نص خام محفوظ لأن النصوص تتكرر كثيراً في JSX
+    decisions = {}
+    line = 1
+    line_pos = 0
     
-    return list(texts)
+    for match in SCANNER.finditer(content):
+        group = match.lastindex
+        if match.start() < ends[group]:
+            continue
+        ends[group] = match.end(group)
+        
+        value_group = SCANNER_VALUE_GROUPS[group]
+        raw = match.group(value_group)
+        text = decisions.get(raw)
+        if text is None:
+            text = clean_text(raw)
+            if not is_candidate(text):
+                text = ''
+            decisions[raw] = text
+        if not text:
+            continue
+        
+        position = match.start(value_group)
+        line += content.count('\n', line_pos, position)
+        line_pos = position
+        column = position - content.rfind('\n', 0, position)
+        
+        yield text, line, column
 
-def generate_translation_key(text, existing_keys):
-    """توليد مفتاح ترجمة فريد"""
+def extract_texts_from_content(content):
+    """استخراج جميع النصوص من محتوى ملف JSX"""
+    # dict يحفظ ترتيب الظهور الأول ليكون الناتج ثابتاً بين التشغيلات
+    return list(dict.fromkeys(text for text, _, _ in scan_texts(content)))
+
+class KeyIndex:
+    """فهرس مفاتيح الترجمة: عداد لكل مفتاح أساسي بدلاً من تجربة key_1، key_2، ..."""
+
+    def __init__(self, counters=None):
+        self.counters = counters or {}
+        self.used = set()
+
+    def __contains__(self, key):
+        return key in self.used
+
+    def __len__(self):
+        return len(self.used)
+
+    def add(self, key):
+        """تسجيل مفتاح موجود مسبقاً"""
+        self.used.add(key)
+
+    def allocate(self, base_key):
+        """حجز أول مفتاح متاح للمفتاح الأساسي"""
+        counter = self.counters.get(base_key, 0)
+        key = base_key if counter == 0 else f"{base_key}_{counter}"
+        
+        # نادر: مفتاح أساسي آخر ينتهي بـ _رقم، أو مفاتيح من ناتج قديم
+        while key in self.used:
+            counter += 1
+            key = f"{base_key}_{counter}"
+        
+        self.counters[base_key] = counter + 1
+        self.used.add(key)
+        return key
+
+    @classmethod
+    def load(cls, index_file=KEY_INDEX_FILE):
+        """قراءة العدادات من التشغيل السابق"""
+        if not os.path.exists(index_file):
+            return cls()
+        with open(index_file, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def save(self, index_file=KEY_INDEX_FILE):
+        """حفظ العدادات"""
+        with open(index_file, 'w', encoding='utf-8') as f:
+            json.dump(self.counters, f, ensure_ascii=False, sort_keys=True)
+
+def make_base_key(text):
+    """المفتاح الأساسي للنص قبل حل التكرار"""
     # إزالة الأحرف الخاصة
-    key = re.sub(r'[^\w\s]', '', text.lower())
+    key = KEY_STRIP_RE.sub('', text.lower())
     # استبدال المسافات بـ _
     key = '_'.join(key.split())
     # تقصير إلى 50 حرف
-    key = key[:50]
+    return key[:50]
+
+def generate_translation_key(text, existing_keys):
+    """توليد مفتاح ترجمة فريد
+    
+    existing_keys: KeyIndex (سريع، يحجز المفتاح) أو مجموعة مفاتيح
+    """
+    key = make_base_key(text)
+    
+    if isinstance(existing_keys, KeyIndex):
+        return existing_keys.allocate(key)
     
     # التأكد من عدم التكرار
     original_key = key
@@ -159,58 +356,205 @@ def categorize_text(text, file_name):
 # الوظيفة الرئيسية
 # ============================================
 
-def extract_all_texts(pages_directory):
-    """استخراج جميع النصوص من كل الملفات"""
+def scan_file(file_path):
+    """قراءة الملف مرة واحدة: البصمة + النصوص (تعمل داخل عمليات متوازية)"""
+    try:
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        content = raw.decode('utf-8')
+    except Exception as e:
+        print(f"❌ خطأ في قراءة {file_path}: {e}")
+        return None, []
+    
+    return hashlib.sha1(raw).hexdigest(), extract_texts_from_content(content)
+
+def scan_files(paths, jobs=JOBS):
+    """فحص عدة ملفات، بالتوازي إذا jobs > 1، بنفس ترتيب المدخلات"""
+    if jobs <= 1 or len(paths) < 2:
+        return [scan_file(path) for path in paths]
+    
+    # دفعات متوسطة الحجم لتقليل تكلفة التواصل بين العمليات
+    chunksize = max(1, len(paths) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(scan_file, paths, chunksize=chunksize))
+
+def load_manifest(manifest_file=MANIFEST_FILE):
+    """قراءة سجل الملفات من التشغيل السابق"""
+    if os.path.exists(manifest_file):
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    return {'version': MANIFEST_VERSION, 'files': {}}
+
+def save_manifest(manifest, manifest_file=MANIFEST_FILE):
+    """حفظ سجل الملفات"""
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+def scan_pages(jsx_files, pages_directory, manifest, jobs=JOBS):
+    """استخراج نصوص الملفات المتغيرة فقط، وإعادة استخدام السجل للباقي"""
+    previous = manifest['files']
+    current = {}
+    to_scan = []
+    
+    for file_path in jsx_files:
+        rel_path = file_path.relative_to(pages_directory).as_posix()
+        stat = file_path.stat()
+        entry = previous.get(rel_path)
+        
+        # نفس الوقت والحجم: لا حاجة حتى لقراءة الملف
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            current[rel_path] = entry
+        else:
+            to_scan.append((file_path, rel_path, stat))
+    
+    results = scan_files([file_path for file_path, _, _ in to_scan], jobs)
+    
+    changed = 0
+    failed = set()
+    for (file_path, rel_path, stat), (fingerprint, texts) in zip(to_scan, results):
+        entry = previous.get(rel_path)
+        if fingerprint is None:
+            # فشل القراءة (ملف نصف مكتوب أثناء الحفظ مثلاً): لا يُسجل كنتيجة حقيقية
+            # السجل السابق يبقى كما هو (فيُعاد فحص الملف في المرة القادمة) ولا تُحذف نصوصه
+            failed.add(rel_path)
+            if entry:
+                current[rel_path] = entry
+            continue
+        
+        if not (entry and entry['sha1'] == fingerprint):
+            changed += 1
+            print(f"📄 {file_path.stem}.jsx")
+            if texts:
+                print(f"   ✅ تم استخراج {len(texts)} نص\n")
+            else:
+                print(f"   ⚠️  لم يتم العثور على نصوص\n")
+        
+        current[rel_path] = {
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'sha1': fingerprint,
+            'texts': texts,
+        }
+    
+    rel_paths = [file_path.relative_to(pages_directory).as_posix() for file_path in jsx_files]
+    deleted = len(set(previous) - set(rel_paths))
+    
+    # نفس ترتيب الملفات دائماً مهما كان عدد العمليات
+    manifest['files'] = {
+        rel_path: current[rel_path] for rel_path in rel_paths if rel_path in current
+    }
+    
+    print(f"🔁 ملفات متغيرة: {changed} | بدون تغيير: {len(jsx_files) - changed - len(failed)} "
+          f"| محذوفة: {deleted}" + (f" | تعذرت قراءتها: {len(failed)}" if failed else "") + "\n")
+    
+    # None = تعذرت القراءة وليس له سجل سابق
+    return [
+        (file_path, current[rel_path]['texts'] if rel_path in current else None)
+        for file_path, rel_path in zip(jsx_files, rel_paths)
+    ]
+
+def source_of(item):
+    """النص الأصلي لعنصر مستخرج"""
+    return item['ar'] or item['en']
+
+def extract_all_texts(pages_directory, manifest=None, existing=None, jobs=JOBS,
+                      key_index=None):
+    """استخراج جميع النصوص من كل الملفات
+    
+    manifest: سجل الملفات لإعادة فحص المتغير منها فقط (None = فحص كامل)
+    existing: ناتج سابق للحفاظ على مفاتيحه وترجماته
+    jobs: عدد العمليات المتوازية
+    key_index: فهرس المفاتيح من التشغيل السابق
+    """
     
     if not os.path.exists(pages_directory):
         print(f"❌ المجلد غير موجود: {pages_directory}")
         return {}
     
     all_texts = {}
-    existing_keys = set()
+    existing_keys = key_index if key_index is not None else KeyIndex()
     
-    # قراءة جميع ملفات JSX
-    jsx_files = list(Path(pages_directory).rglob('*.jsx'))
+    # العناصر السابقة حسب (الملف، النص) لإبقاء مفاتيحها ثابتة
+    previous = {}
+    for category_name, category_data in (existing or {}).items():
+        for key, item in category_data.items():
+            previous[(item['source_file'], source_of(item))] = (category_name, key, item)
+            existing_keys.add(key)
+    
+    # قراءة جميع ملفات JSX (مرتبة ليكون الناتج ثابتاً)
+    jsx_files = sorted(Path(pages_directory).rglob('*.jsx'))
     
     print(f"\n🔍 جاري فحص {len(jsx_files)} ملف...\n")
     
-    for file_path in jsx_files:
+    if manifest is None:
+        manifest = {'version': MANIFEST_VERSION, 'files': {}}
+    
+    file_texts = scan_pages(jsx_files, pages_directory, manifest, jobs)
+    
+    kept = set()
+    
+    for file_path, texts in file_texts:
         file_name = file_path.stem
-        print(f"📄 {file_name}.jsx")
         
-        # استخراج النصوص
-        texts = extract_texts_from_file(file_path)
-        
-        if not texts:
-            print(f"   ⚠️  لم يتم العثور على نصوص\n")
+        if texts is None:
+            # تعذرت قراءة الملف: نصوصه السابقة تبقى كما هي
+            for identity, (category, key, item) in previous.items():
+                if identity[0] == file_name and identity not in kept:
+                    all_texts.setdefault(category, {})[key] = item
+                    kept.add(identity)
             continue
         
-        print(f"   ✅ تم استخراج {len(texts)} نص\n")
-        
         # معالجة كل نص
         for text in texts:
+            identity = (file_name, text)
+            
+            # نص موجود سابقاً: نفس المفتاح ونفس الترجمات
+            if identity in previous:
+                if identity not in kept:
+                    category, key, item = previous[identity]
+                    # عناصر من استخراج قديم قبل التصنيف
+                    if 'kind' not in item:
+                        classify_item(item, text)
+                    all_texts.setdefault(category, {})[key] = item
+                    kept.add(identity)
+                continue
+            
             # تحديد الفئة
             category = categorize_text(text, file_name)
             
             # توليد مفتاح
             key = generate_translation_key(text, existing_keys)
-            existing_keys.add(key)
             
             # إضافة للنتائج
             if category not in all_texts:
                 all_texts[category] = {}
             
-            all_texts[category][key] = {
+            all_texts[category][key] = classify_item({
                 'ar': text if is_arabic(text) else '',
                 'en': text if not is_arabic(text) else '',
                 'fr': '',
                 'zh': '',
                 'source_file': file_name,
                 'needs_translation': True
-            }
+            }, text)
+            previous[identity] = (category, key, all_texts[category][key])
+            kept.add(identity)
+    
+    retired = len(set(previous) - kept)
+    if retired:
+        print(f"🗑️  تم حذف {retired} نص لم يعد موجوداً في الملفات")
     
     return all_texts
 
+def load_existing(output_file=OUTPUT_FILE):
+    """قراءة ناتج الاستخراج السابق إن وجد"""
+    if not os.path.exists(output_file):
+        return None
+    with open(output_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 def save_results(data, output_file):
     """حفظ النتائج في ملف JSON"""
     with open(output_file, 'w', encoding='utf-8') as f:
@@ -238,6 +582,13 @@ def print_statistics(data):
     print(f"إجمالي النصوص: {total_texts}")
     print(f"نصوص عربية: {arabic_texts}")
     print(f"نصوص إنجليزية: {english_texts}")
+    skipped = {}
+    for category in data.values():
+        for item in category.values():
+            if item.get('skip_reason'):
+                skipped[item['skip_reason']] = skipped.get(item['skip_reason'], 0) + 1
+    if skipped:
+        print("بدون ترجمة: " + '، '.join(f"{reason} {count}" for reason, count in sorted(skipped.items())))
     print(f"\nالفئات:")
     for category, items in data.items():
         print(f"  • {category}: {len(items)} نص")
@@ -247,17 +598,40 @@ def print_statistics(data):
 # التشغيل
 # ============================================
 
+def parse_args():
+    """قراءة خيارات سطر الأوامر"""
+    parser = argparse.ArgumentParser(description="استخراج النصوص من ملفات JSX")
+    parser.add_argument('--full', action='store_true',
+                        help="فحص كل الملفات من جديد وتجاهل الناتج والسجل السابقين")
+    parser.add_argument('--jobs', '-j', type=int, default=JOBS,
+                        help="عدد العمليات المتوازية (0 = عدد الأنوية)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    
     print("🚀 بدء استخراج النصوص من ملفات JSX...\n")
     
-    # استخراج النصوص
-    extracted_data = extract_all_texts(PAGES_DIR)
+    # استخراج النصوص (الملفات المتغيرة فقط ما لم يُطلب --full)
+    if args.full:
+        manifest = {'version': MANIFEST_VERSION, 'files': {}}
+        existing = None
+        key_index = KeyIndex()
+    else:
+        manifest = load_manifest()
+        existing = load_existing()
+        key_index = KeyIndex.load()
+    
+    jobs = args.jobs or os.cpu_count() or 1
+    extracted_data = extract_all_texts(PAGES_DIR, manifest, existing, jobs, key_index)
     
     if not extracted_data:
         print("\n❌ لم يتم العثور على أي نصوص!")
     else:
         # حفظ النتائج
         save_results(extracted_data, OUTPUT_FILE)
+        save_manifest(manifest)
+        key_index.save()
         
         # طباعة الإحصائيات
         print_statistics(extracted_data)
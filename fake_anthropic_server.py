@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+خادم محلي يحاكي Claude Messages API لاختبار مرحلة الترجمة بدون مفتاح أو إنترنت
+يفهم طلبات translate_texts.py (نص واحد أو الوضع المجمّع أو Message Batches) ويرد بترجمات وهمية،
+مع تأخير ونسبة أخطاء وردود 429 قابلة للضبط لقياس السرعة والتوازي وإعادة المحاولة
+
+الاستخدام:
+    python fake_anthropic_server.py --latency 0.5 --rate-limit-rate 0.05
+    python translate_texts.py --base-url http://127.0.0.1:8765
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ============================================
+# الإعدادات
+# ============================================
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# متوسط زمن الرد بالثواني + زمن إضافي لكل توكن مخرجات
+LATENCY = 0.3
+LATENCY_PER_TOKEN = 0.0
+# التذبذب حول المتوسط (0.5 = ±50%)
+JITTER = 0.5
+
+# نسب الأخطاء العشوائية (0 - 1)
+ERROR_RATE = 0.0        # 500 api_error
+OVERLOAD_RATE = 0.0     # 529 overloaded_error
+RATE_LIMIT_RATE = 0.0   # 429 rate_limit_error
+
+# حد طلبات حقيقي في الدقيقة (0 = بدون حد) وقيمة retry-after للـ 429 العشوائي
+REQUESTS_PER_MINUTE = 0
+RETRY_AFTER = 2
+
+# مدة معالجة الدفعة في Message Batches API بالثواني (الحقيقية قد تصل إلى 24 ساعة)
+BATCH_DELAY = 5
+
+# أقل عدد توكنات يُخزَّن في كاش التعليمات (مثل Sonnet)
+CACHE_MIN_TOKENS = 1024
+
+# أسماء اللغات كما تظهر في الطلبات → الرموز
+LANG_CODES = {
+    'Arabic': 'ar',
+    'English': 'en',
+    'French': 'fr',
+    'Simplified Chinese': 'zh',
+}
+
+# ============================================
+# فهم الطلبات
+# ============================================
+
+def estimate_tokens(text):
+    """تقدير تقريبي لعدد التوكنات"""
+    return len(text) // 3 + 1
+
+def fake_translation(text, lang):
+    """ترجمة وهمية يمكن التعرف عليها"""
+    return f"[{lang}] {text}"
+
+def prompt_text(body):
+    """نص آخر رسالة من المستخدم"""
+    content = body['messages'][-1]['content']
+    if isinstance(content, str):
+        return content
+    return ''.join(block.get('text', '') for block in content if block.get('type') == 'text')
+
+def system_usage(body, cache):
+    """توكنات التعليمات: (غير مخزنة، كتابة كاش، قراءة كاش) مع محاكاة cache_control"""
+    system = body.get('system') or []
+    if isinstance(system, str):
+        return estimate_tokens(system), 0, 0
+
+    # كل ما قبل آخر كتلة عليها cache_control (ومعها) هو البادئة المخزنة
+    cached_until = -1
+    for index, block in enumerate(system):
+        if block.get('cache_control'):
+            cached_until = index
+    prefix = ''.join(block.get('text', '') for block in system[:cached_until + 1])
+    rest = ''.join(block.get('text', '') for block in system[cached_until + 1:])
+    uncached = estimate_tokens(rest) if rest else 0
+
+    prefix_tokens = estimate_tokens(prefix) if prefix else 0
+    if not prefix or prefix_tokens < CACHE_MIN_TOKENS:
+        return uncached + prefix_tokens, 0, 0
+
+    digest = hashlib.sha256(f"{body.get('model')}\0{prefix}".encode('utf-8')).hexdigest()
+    if digest in cache:
+        return uncached, 0, prefix_tokens
+    cache.add(digest)
+    return uncached, prefix_tokens, 0
+
+def answer_batch(prompt):
+    """رد الوضع المجمّع: JSON بالترجمات لكل id"""
+    entries = json.loads(prompt.split("Entries:\n", 1)[1].rsplit("\n\nJSON:", 1)[0])
+    return json.dumps({
+        entry['id']: {lang: fake_translation(entry['text'], lang) for lang in entry['targets']}
+        for entry in entries
+    }, ensure_ascii=False)
+
+def answer_single(prompt):
+    """رد ترجمة نص واحد"""
+    header = prompt.split('\n', 1)[0]
+    target = header.rsplit(' to ', 1)[-1].rstrip('.')
+    text = prompt.split("Text to translate:\n", 1)[-1].rsplit("\n\nTranslation:", 1)[0]
+    return fake_translation(text, LANG_CODES.get(target, target))
+
+def answer(prompt):
+    """الرد المناسب لنوع الطلب"""
+    if "Entries:\n" in prompt and prompt.rstrip().endswith("JSON:"):
+        return answer_batch(prompt)
+    if "Text to translate:\n" in prompt:
+        return answer_single(prompt)
+    return "OK"
+
+# ============================================
+# الخادم
+# ============================================
+
+class FakeState:
+    """الإعدادات والعدادات المشتركة بين الطلبات"""
+
+    def __init__(self, latency=LATENCY, latency_per_token=LATENCY_PER_TOKEN, jitter=JITTER,
+                 error_rate=ERROR_RATE, overload_rate=OVERLOAD_RATE, rate_limit_rate=RATE_LIMIT_RATE,
+                 requests_per_minute=REQUESTS_PER_MINUTE, retry_after=RETRY_AFTER,
+                 batch_delay=BATCH_DELAY, seed=None):
+        self.latency = latency
+        self.latency_per_token = latency_per_token
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.overload_rate = overload_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests_per_minute = requests_per_minute
+        self.retry_after = retry_after
+        self.batch_delay = batch_delay
+        self.batches = {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.statuses = Counter()
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_write_tokens = 0
+        self.cache_read_tokens = 0
+        self.cache = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started = time.time()
+
+    def admit(self):
+        """تحديد ما إذا كان الطلب سيفشل: (رمز HTTP، نوع الخطأ، retry-after) أو None"""
+        with self.lock:
+            now = time.monotonic()
+            if self.requests_per_minute:
+                while self.recent and now - self.recent[0] >= 60:
+                    self.recent.popleft()
+                if len(self.recent) >= self.requests_per_minute:
+                    return 429, 'rate_limit_error', max(1, int(60 - (now - self.recent[0])) + 1)
+                self.recent.append(now)
+
+            roll = self.random.random()
+            if roll < self.rate_limit_rate:
+                return 429, 'rate_limit_error', self.retry_after
+            roll -= self.rate_limit_rate
+            if roll < self.overload_rate:
+                return 529, 'overloaded_error', None
+            roll -= self.overload_rate
+            if roll < self.error_rate:
+                return 500, 'api_error', None
+            return None
+
+    def failed_in_batch(self):
+        """هل يفشل طلب داخل دفعة (نسبة الأخطاء نفسها بدون 429)"""
+        with self.lock:
+            return self.random.random() < self.error_rate + self.overload_rate
+
+    def delay(self, output_tokens):
+        """زمن الرد لهذا الطلب"""
+        with self.lock:
+            factor = 1 + self.random.uniform(-self.jitter, self.jitter)
+        return max(0.0, (self.latency + self.latency_per_token * output_tokens) * factor)
+
+    def stats(self):
+        """العدادات الحالية"""
+        with self.lock:
+            elapsed = time.time() - self.started
+            return {
+                'requests': sum(self.statuses.values()),
+                'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+                'input_tokens': self.input_tokens,
+                'output_tokens': self.output_tokens,
+                'cache_write_tokens': self.cache_write_tokens,
+                'cache_read_tokens': self.cache_read_tokens,
+                'max_in_flight': self.max_in_flight,
+                'seconds': round(elapsed, 1),
+            }
+
+def make_message(body, state):
+    """رد Messages API لطلب واحد مع تحديث العدادات"""
+    prompt = prompt_text(body)
+    text = answer(prompt)
+    with state.lock:
+        system_tokens, cache_write, cache_read = system_usage(body, state.cache)
+    input_tokens = estimate_tokens(prompt) + system_tokens
+    output_tokens = min(estimate_tokens(text), body.get('max_tokens', 4096))
+
+    with state.lock:
+        state.statuses[200] += 1
+        state.input_tokens += input_tokens
+        state.output_tokens += output_tokens
+        state.cache_write_tokens += cache_write
+        state.cache_read_tokens += cache_read
+
+    return {
+        'id': f"msg_{uuid.uuid4().hex[:24]}",
+        'type': 'message',
+        'role': 'assistant',
+        'model': body.get('model', 'fake'),
+        'content': [{'type': 'text', 'text': text}],
+        'stop_reason': 'end_turn',
+        'stop_sequence': None,
+        'usage': {
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'cache_creation_input_tokens': cache_write,
+            'cache_read_input_tokens': cache_read,
+        },
+    }
+
+def rfc3339(timestamp):
+    """وقت بصيغة RFC 3339"""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+def batch_object(batch, base_url):
+    """كائن message_batch كما يرجعه الـ API"""
+    ended = time.time() >= batch['ends_at']
+    counts = {'processing': 0, 'succeeded': 0, 'errored': 0, 'canceled': 0, 'expired': 0}
+    if ended:
+        for result in batch['results']:
+            counts[result['result']['type']] += 1
+    else:
+        counts['processing'] = len(batch['results'])
+
+    return {
+        'id': batch['id'],
+        'type': 'message_batch',
+        'processing_status': 'ended' if ended else 'in_progress',
+        'request_counts': counts,
+        'created_at': rfc3339(batch['created_at']),
+        'expires_at': rfc3339(batch['created_at'] + 24 * 3600),
+        'ended_at': rfc3339(batch['ends_at']) if ended else None,
+        'cancel_initiated_at': None,
+        'archived_at': None,
+        'results_url': f"{base_url}/v1/messages/batches/{batch['id']}/results" if ended else None,
+    }
+
+class FakeMessagesHandler(BaseHTTPRequestHandler):
+    """معالج /v1/messages و /v1/messages/batches و GET /stats"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, payload, headers=None):
+        """إرسال رد JSON"""
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('request-id', f"req_{uuid.uuid4().hex[:24]}")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, error_type, message, headers=None):
+        """إرسال خطأ بصيغة Anthropic"""
+        self.send_json(status, {'type': 'error', 'error': {'type': error_type, 'message': message}}, headers)
+
+    def do_GET(self):
+        path = self.path.split('?')[0].rstrip('/')
+        if path == '/stats':
+            self.send_json(200, self.server.state.stats())
+        elif path.startswith('/v1/messages/batches/'):
+            self.get_batch(path[len('/v1/messages/batches/'):])
+        else:
+            self.send_error_json(404, 'not_found_error', f"Not found: {self.path}")
+
+    def get_batch(self, rest):
+        """حالة دفعة أو نتائجها (JSONL)"""
+        batch_id, _, action = rest.partition('/')
+        with self.server.state.lock:
+            batch = self.server.state.batches.get(batch_id)
+        if batch is None:
+            self.send_error_json(404, 'not_found_error', f"Batch not found: {batch_id}")
+            return
+
+        if not action:
+            self.send_json(200, batch_object(batch, self.server.base_url))
+        elif action == 'results' and time.time() >= batch['ends_at']:
+            body = ''.join(json.dumps(result, ensure_ascii=False) + '\n' for result in batch['results'])
+            body = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/binary')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif action == 'results':
+            self.send_error_json(400, 'invalid_request_error', "Batch is still processing")
+        else:
+            self.send_error_json(404, 'not_found_error', f"Not found: {self.path}")
+
+    def create_batch(self, body):
+        """إنشاء دفعة: النتائج تُحسب الآن وتظهر بعد batch_delay ثانية"""
+        state = self.server.state
+        results = []
+        for request in body['requests']:
+            if state.failed_in_batch():
+                with state.lock:
+                    state.statuses[500] += 1
+                result = {'type': 'errored', 'error': {
+                    'type': 'error', 'error': {'type': 'api_error', 'message': "Simulated api_error"},
+                }}
+            else:
+                result = {'type': 'succeeded', 'message': make_message(request['params'], state)}
+            results.append({'custom_id': request['custom_id'], 'result': result})
+
+        now = time.time()
+        batch = {
+            'id': f"msgbatch_{uuid.uuid4().hex[:24]}",
+            'created_at': now,
+            'ends_at': now + state.batch_delay,
+            'results': results,
+        }
+        with state.lock:
+            state.batches[batch['id']] = batch
+        self.send_json(200, batch_object(batch, self.server.base_url))
+
+    def do_POST(self):
+        state = self.server.state
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length)
+        path = self.path.split('?')[0].rstrip('/')
+
+        if path not in ('/v1/messages', '/v1/messages/batches'):
+            self.send_error_json(404, 'not_found_error', f"Not found: {self.path}")
+            return
+
+        try:
+            body = json.loads(raw)
+            if path == '/v1/messages/batches':
+                for request in body['requests']:
+                    prompt_text(request['params'])
+            else:
+                prompt_text(body)
+        except (ValueError, KeyError, IndexError, TypeError):
+            with state.lock:
+                state.statuses[400] += 1
+            self.send_error_json(400, 'invalid_request_error', "Invalid request body")
+            return
+
+        failure = state.admit()
+        with state.lock:
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+
+        try:
+            if failure is not None:
+                status, error_type, retry_after = failure
+                # الأخطاء ترجع أسرع من الردود العادية
+                time.sleep(state.delay(0) / 4)
+                with state.lock:
+                    state.statuses[status] += 1
+                headers = {'retry-after': str(retry_after)} if retry_after else None
+                self.send_error_json(status, error_type, f"Simulated {error_type}", headers)
+                return
+
+            if path == '/v1/messages/batches':
+                self.create_batch(body)
+                return
+
+            message = make_message(body, state)
+            time.sleep(state.delay(message['usage']['output_tokens']))
+            self.send_json(200, message)
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+class FakeAnthropicServer(ThreadingHTTPServer):
+    """خادم HTTP متعدد الخيوط (طلب لكل خيط مثل الخادم الحقيقي)"""
+
+    daemon_threads = True
+
+    def __init__(self, address, state, verbose=False):
+        super().__init__(address, FakeMessagesHandler)
+        self.state = state
+        self.verbose = verbose
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+def start_server(host=HOST, port=0, verbose=False, **options):
+    """تشغيل الخادم في خيط خلفي (port=0 = منفذ حر) وإرجاعه"""
+    server = FakeAnthropicServer((host, port), FakeState(**options), verbose)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def print_server_stats(state):
+    """ملخص الطلبات عند الإيقاف"""
+    stats = state.stats()
+    print("\n" + "="*50)
+    print("📊 إحصائيات الخادم المحلي:")
+    print("="*50)
+    print(f"الطلبات: {stats['requests']} خلال {stats['seconds']} ثانية")
+    for status, count in stats['statuses'].items():
+        print(f"   HTTP {status}: {count}")
+    print(f"التوكنات: {stats['input_tokens']} مدخلات + {stats['output_tokens']} مخرجات")
+    print(f"كاش التعليمات: كتابة {stats['cache_write_tokens']} + قراءة {stats['cache_read_tokens']}")
+    print(f"أقصى طلبات متزامنة: {stats['max_in_flight']}")
+
+def parse_args():
+    """قراءة خيارات سطر الأوامر"""
+    parser = argparse.ArgumentParser(description="خادم محلي يحاكي Claude Messages API")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--latency', type=float, default=LATENCY,
+                        help="متوسط زمن الرد بالثواني")
+    parser.add_argument('--latency-per-token', type=float, default=LATENCY_PER_TOKEN,
+                        help="زمن إضافي لكل توكن مخرجات")
+    parser.add_argument('--jitter', type=float, default=JITTER,
+                        help="التذبذب حول المتوسط (0.5 = ±50%%)")
+    parser.add_argument('--error-rate', type=float, default=ERROR_RATE,
+                        help="نسبة أخطاء 500")
+    parser.add_argument('--overload-rate', type=float, default=OVERLOAD_RATE,
+                        help="نسبة أخطاء 529")
+    parser.add_argument('--rate-limit-rate', type=float, default=RATE_LIMIT_RATE,
+                        help="نسبة ردود 429 العشوائية")
+    parser.add_argument('--rpm', type=int, default=REQUESTS_PER_MINUTE,
+                        help="حد طلبات حقيقي في الدقيقة (0 = بدون حد)")
+    parser.add_argument('--retry-after', type=int, default=RETRY_AFTER,
+                        help="قيمة retry-after بالثواني لردود 429")
+    parser.add_argument('--batch-delay', type=float, default=BATCH_DELAY,
+                        help="مدة معالجة الدفعة في Message Batches API بالثواني")
+    parser.add_argument('--seed', type=int, help="بذرة الأرقام العشوائية")
+    parser.add_argument('--verbose', action='store_true', help="طباعة كل طلب")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    state = FakeState(
+        latency=args.latency,
+        latency_per_token=args.latency_per_token,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        overload_rate=args.overload_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        requests_per_minute=args.rpm,
+        retry_after=args.retry_after,
+        batch_delay=args.batch_delay,
+        seed=args.seed,
+    )
+    server = FakeAnthropicServer((args.host, args.port), state, args.verbose)
+
+    print(f"🚀 الخادم المحلي يعمل على: {server.base_url}")
+    print(f"   python translate_texts.py --base-url {server.base_url}")
+    print(f"   أو: python translate_texts.py --batch-api --base-url {server.base_url}")
+    print("   إحصائيات مباشرة: GET /stats — أوقفه بـ Ctrl+C\n")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print_server_stats(state)
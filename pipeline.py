@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+خط إنتاج متدفق: استخراج ← ترجمة ← كتابة ملفات اللغات في نفس الوقت
+بدلاً من انتظار فحص كل الملفات ثم ترجمة كل شيء ثم الكتابة، كل مرحلة تعمل على ما وصلها:
+طلبات الترجمة تبدأ مع أول ملف، وملفات الفئات تُحدّث دورياً أثناء الترجمة
+الطوابير محدودة الحجم (backpressure): الفحص ينتظر إذا تأخرت الترجمة، فلا تتراكم النصوص في الذاكرة
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from pathlib import Path
+
+import translate_texts
+from extract_texts import (
+    PAGES_DIR, KeyIndex, categorize_text, classify_item, generate_translation_key,
+    is_arabic, load_manifest, save_manifest, scan_file, source_of,
+)
+from extract_texts import OUTPUT_FILE as EXTRACTED_FILE
+from split_translations import OUTPUT_DIR, add_output_arguments, output_options, write_output
+from telemetry import print_telemetry_summary
+from translation_backends import BACKENDS, BackendError
+from translation_memory import print_memory_stats
+from translation_store import TranslationStore
+
+# ============================================
+# الإعدادات
+# ============================================
+
+# أقصى عدد نصوص تنتظر الترجمة بين الفحص والتجميع (يتوقف الفحص عند الامتلاء)
+ITEM_QUEUE_SIZE = 500
+# أقصى عدد طلبات جاهزة تنتظر عاملاً لكل طلب متزامن
+JOB_QUEUE_FACTOR = 2
+
+# تجميع النصوص قبل الجدولة: حتى GROUP_SIZE نص أو GROUP_WAIT ثانية
+GROUP_SIZE = 50
+GROUP_WAIT = 0.2
+
+# الفترة بين تحديثات ملفات اللغات بالثواني
+EMIT_EVERY = 5.0
+
+# ============================================
+# خط الإنتاج
+# ============================================
+
+class Pipeline:
+    """مراحل الفحص والتجميع والترجمة والكتابة، متصلة بطوابير محدودة"""
+
+    def __init__(self, pages_dir=PAGES_DIR, budget_tokens=None, budget_usd=None,
+                 concurrency=translate_texts.MAX_CONCURRENCY,
+                 requests_per_minute=translate_texts.REQUESTS_PER_MINUTE,
+                 tokens_per_minute=translate_texts.TOKENS_PER_MINUTE,
+                 batched=False, batch_size=translate_texts.BATCH_MAX_ITEMS,
+                 emit_every=EMIT_EVERY, output=None):
+        self.pages_dir = pages_dir
+        self.budget_tokens = budget_tokens
+        self.budget_usd = budget_usd
+        self.concurrency = concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.batched = batched
+        self.batch_size = batch_size
+        self.emit_every = emit_every
+        self.output = output or {}
+
+        self.manifest = load_manifest()
+        self.key_index = KeyIndex.load()
+        self.extracted = None
+        self.data = None
+        # (الملف، النص) ← (الفئة، المفتاح) من الاستخراج السابق
+        self.previous = {}
+        self.seen = set()
+        # ملفات تعذرت قراءتها (أسماؤها كما في source_file)
+        self.unreadable = set()
+        # الأعمال المرسلة حسب النص: النسخ المكررة اللاحقة تنضم إليها بدل طلب جديد
+        self.in_flight = {}
+        # الفئات التي تغيرت منذ آخر كتابة
+        self.dirty = set()
+        self.plan = {
+            'requests': 0, 'tokens': 0, 'cost_usd': 0.0,
+            'deferred_requests': 0, 'deferred_tokens': 0, 'deferred_cost_usd': 0.0,
+            'budget_reached': False,
+        }
+        self.files = 0
+
+    # ---------- التحميل ----------
+
+    def load(self):
+        """الاستخراج السابق (للمفاتيح الثابتة) والترجمات السابقة + السجل"""
+        if os.path.exists(EXTRACTED_FILE):
+            self.extracted = translate_texts.read_translations(EXTRACTED_FILE)
+        else:
+            self.extracted = TranslationStore() if translate_texts.COMPACT_STORE else {}
+
+        for category_name, category_data in self.extracted.items():
+            for key, item in category_data.items():
+                self.previous[(item['source_file'], source_of(item))] = (category_name, key)
+                self.key_index.add(key)
+
+        if os.path.exists(translate_texts.OUTPUT_FILE):
+            self.data = translate_texts.read_translations(translate_texts.OUTPUT_FILE)
+            print(f"🔁 استئناف من {translate_texts.OUTPUT_FILE}")
+        else:
+            self.data = TranslationStore() if translate_texts.COMPACT_STORE else {}
+
+        restored = translate_texts.replay_journal(self.data)
+        if restored:
+            print(f"🔁 تمت استعادة {restored} ترجمة من السجل {translate_texts.JOURNAL_FILE}")
+
+        translate_texts.journal = translate_texts.TranslationJournal(self.data)
+
+    # ---------- المرحلة 1: الفحص ----------
+
+    async def scan_page(self, file_path):
+        """نصوص ملف واحد: من السجل إذا لم يتغير، وإلا قراءته في خيط منفصل"""
+        rel_path = file_path.relative_to(self.pages_dir).as_posix()
+        stat = file_path.stat()
+        entry = self.manifest['files'].get(rel_path)
+
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return rel_path, entry
+
+        # القراءة والتحليل خارج حلقة الأحداث حتى لا تتوقف الطلبات الجارية
+        fingerprint, texts = await asyncio.to_thread(scan_file, file_path)
+        if fingerprint is None:
+            # فشل القراءة: السجل السابق كما هو (يُعاد فحصه في المرة القادمة)، أو لا شيء
+            return rel_path, entry
+        if not (entry and entry['sha1'] == fingerprint):
+            print(f"📄 {file_path.stem}.jsx: {len(texts)} نص")
+        return rel_path, {
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'sha1': fingerprint,
+            'texts': texts,
+        }
+
+    def add_text(self, text, file_name):
+        """تسجيل نص في الاستخراج والترجمات؛ يرجع العنصر إذا كان يحتاج ترجمة"""
+        identity = (file_name, text)
+        if identity in self.seen:
+            return None
+        self.seen.add(identity)
+
+        if identity in self.previous:
+            category, key = self.previous[identity]
+            source_item = self.extracted[category][key]
+            # عناصر من استخراج قديم قبل التصنيف
+            if 'kind' not in source_item:
+                classify_item(source_item, text)
+        else:
+            category = categorize_text(text, file_name)
+            key = generate_translation_key(text, self.key_index)
+            self.extracted.setdefault(category, {})[key] = classify_item({
+                'ar': text if is_arabic(text) else '',
+                'en': text if not is_arabic(text) else '',
+                'fr': '',
+                'zh': '',
+                'source_file': file_name,
+                'needs_translation': True
+            }, text)
+            source_item = self.extracted[category][key]
+
+        target = self.data.setdefault(category, {})
+        if key not in target:
+            target[key] = dict(source_item)
+            self.dirty.add(category)
+        else:
+            # التصنيف من آخر استخراج
+            target[key]['kind'] = source_item['kind']
+            target[key]['skip_reason'] = source_item['skip_reason']
+
+        item = target[key]
+        if item.get('needs_translation', True):
+            return category, key, item
+        return None
+
+    async def scan(self, items):
+        """المرحلة 1: فحص الملفات بالترتيب وإرسال النصوص المعلقة للتجميع"""
+        jsx_files = sorted(Path(self.pages_dir).rglob('*.jsx'))
+        print(f"\n🔍 فحص {len(jsx_files)} ملف أثناء الترجمة...\n")
+
+        files = {}
+        for file_path in jsx_files:
+            rel_path, entry = await self.scan_page(file_path)
+            if entry is None:
+                # تعذرت القراءة بدون سجل سابق: نصوصه السابقة لا تُحذف
+                self.unreadable.add(file_path.stem)
+                continue
+            files[rel_path] = entry
+            for text in entry['texts']:
+                pending = self.add_text(text, file_path.stem)
+                if pending is not None:
+                    # ينتظر هنا إذا امتلأ الطابور (backpressure)
+                    await items.put(pending)
+            self.files += 1
+            # put لا ينتظر إذا كان في الطابور مكان: إفساح المجال لبقية المراحل بعد كل ملف
+            await asyncio.sleep(0)
+
+        self.manifest['files'] = files
+        self.retire()
+        await items.put(None)
+
+    def retire(self):
+        """حذف النصوص التي لم تعد موجودة في الملفات (بعد انتهاء الفحص)"""
+        retired = 0
+        for identity in set(self.previous) - self.seen:
+            if identity[0] in self.unreadable:
+                continue
+            category, key = self.previous[identity]
+            for data in (self.extracted, self.data):
+                if key in data.get(category, {}):
+                    del data[category][key]
+                    if not data[category]:
+                        del data[category]
+            self.dirty.add(category)
+            retired += 1
+        if retired:
+            print(f"🗑️  تم حذف {retired} نص لم يعد موجوداً في الملفات")
+
+    # ---------- المرحلة 2: التجميع والجدولة ----------
+
+    async def next_group(self, items):
+        """حتى GROUP_SIZE نص، أو ما وصل خلال GROUP_WAIT ثانية؛ None في النهاية"""
+        entry = await items.get()
+        if entry is None:
+            return None
+
+        group = [entry]
+        deadline = time.monotonic() + GROUP_WAIT
+        while len(group) < GROUP_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = await asyncio.wait_for(items.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if entry is None:
+                # إعادة علامة النهاية للدورة التالية
+                items.put_nowait(None)
+                break
+            group.append(entry)
+        return group
+
+    def join_in_flight(self, jobs):
+        """ضم النصوص المكررة لعمل جارٍ بنفس النص واللغات؛ يرجع الأعمال الجديدة فقط"""
+        new_jobs = []
+        for job in jobs:
+            running = self.in_flight.get((job['source_lang'], job['text']))
+            if running is not None and set(job['targets']) <= set(running['targets']):
+                # تُكتب ترجماتها بعد انتهاء العمل (انظر finish_job)
+                running.setdefault('joined', []).extend(job['members'])
+            else:
+                new_jobs.append(job)
+        return new_jobs
+
+    def finish_job(self, job):
+        """بعد انتهاء عمل: نسخ ترجماته للنصوص المكررة التي انضمت إليه أثناء الترجمة"""
+        self.in_flight.pop((job['source_lang'], job['text']), None)
+        members = job['members'] + job.get('joined', [])
+        self.dirty.update(category_name for category_name, _, _ in members)
+        if job.get('joined'):
+            _, _, translated = job['members'][0]
+            translations = {lang: translated[lang] for lang in job['targets'] if translated[lang]}
+            translate_texts.apply_job_result({**job, 'members': job['joined']}, translations)
+
+    def defer(self, jobs):
+        """خطة بدون طلبات بعد نفاد الميزانية (لحساب المؤجل فقط)"""
+        plan = {
+            'requests': 0, 'tokens': 0, 'cost_usd': 0.0,
+            'deferred_requests': 0, 'deferred_tokens': 0, 'deferred_cost_usd': 0.0,
+            'budget_reached': bool(jobs),
+        }
+        batch = {'placed': set(), 'requests': 0, 'items': 0, 'tokens': 0}
+        for job in jobs:
+            for lang in job['targets']:
+                if self.batched:
+                    tokens, cost = translate_texts.estimate_batched_request(job, lang, batch, self.batch_size)
+                else:
+                    tokens, cost = translate_texts.estimate_request(job, lang)
+                    plan['deferred_requests'] += 1
+                plan['deferred_tokens'] += tokens
+                plan['deferred_cost_usd'] += cost
+        plan['deferred_requests'] += batch['requests']
+        return [], plan
+
+    def within_budget(self, jobs):
+        """اختيار ما يدخل في الميزانية المتبقية من هذه المجموعة"""
+        plan = self.plan
+        remaining_tokens = self.budget_tokens and self.budget_tokens - plan['tokens']
+        remaining_usd = self.budget_usd and self.budget_usd - plan['cost_usd']
+        exhausted = (remaining_tokens is not None and remaining_tokens <= 0) or \
+                    (remaining_usd is not None and remaining_usd <= 0) or \
+                    translate_texts.budget_exhausted()
+        if plan['budget_reached'] or exhausted:
+            planned, group_plan = self.defer(jobs)
+        else:
+            # كتابة التعليمات في الكاش مرة واحدة في التشغيل
+            planned, group_plan = translate_texts.plan_jobs(
+                jobs, remaining_tokens, remaining_usd, cache_write=plan['requests'] == 0,
+                batch_size=self.batch_size if self.batched else None,
+            )
+
+        for field in ('requests', 'tokens', 'cost_usd',
+                      'deferred_requests', 'deferred_tokens', 'deferred_cost_usd'):
+            plan[field] += group_plan[field]
+        if group_plan['budget_reached'] and not plan['budget_reached']:
+            plan['budget_reached'] = True
+            translate_texts.run_stats['budget_reached'] = True
+            print("\n⏸️  تم الوصول للميزانية: متابعة الفحص والكتابة بدون طلبات جديدة\n")
+        return planned
+
+    async def group(self, items, units):
+        """المرحلة 2: تخطي ما لا يُترجم، إزالة التكرار، الميزانية، ثم إرسال الطلبات للعمال"""
+        while True:
+            group = await self.next_group(items)
+            if group is None:
+                break
+
+            # المتخطى (آيات، أرقام...) والمستعاد من الذاكرة يكتمل هنا مباشرة
+            self.dirty.update(category_name for category_name, _, _ in group)
+            pending = list(translate_texts.select_pending(group))
+            jobs = self.join_in_flight(translate_texts.build_jobs(pending))
+            planned = self.within_budget(jobs)
+
+            for job in planned:
+                self.in_flight[(job['source_lang'], job['text'])] = job
+            if self.batched:
+                batches = translate_texts.pack_batches(planned, max_items=self.batch_size)
+            else:
+                translate_texts.link_similar_jobs(planned)
+                batches = [[job] for job in planned]
+            for batch in batches:
+                # ينتظر هنا إذا كان كل العمال مشغولين (backpressure)
+                await units.put(batch)
+
+        for _ in range(self.concurrency):
+            await units.put(None)
+
+    # ---------- المرحلة 3: الترجمة ----------
+
+    async def translate(self, units, limiter, adaptive):
+        """المرحلة 3 (عدة عمال): ترجمة الطلبات فور وصولها"""
+        while True:
+            batch = await units.get()
+            if batch is None:
+                break
+
+            if self.batched:
+                await translate_texts.translate_jobs_batched(batch, limiter, adaptive)
+            else:
+                await translate_texts.translate_job_async(batch[0], limiter, adaptive)
+
+            for job in batch:
+                self.finish_job(job)
+
+    # ---------- المرحلة 4: الكتابة ----------
+
+    def flush(self):
+        """كتابة ملفات الفئات المتغيرة منذ آخر كتابة"""
+        if not self.dirty:
+            return
+        changed, self.dirty = self.dirty, set()
+        print(f"\n📝 تحديث {len(changed)} فئة في {OUTPUT_DIR} "
+              f"({self.files} ملف مفحوص، {translate_texts.run_stats['items']} نص مكتمل):")
+        # فئة حُذفت كل نصوصها لا تُكتب
+        write_output(self.data, categories=changed & set(self.data), **self.output)
+
+    async def emit(self, done):
+        """المرحلة 4: كتابة دورية أثناء الفحص والترجمة"""
+        while not done.is_set():
+            try:
+                await asyncio.wait_for(done.wait(), self.emit_every)
+            except asyncio.TimeoutError:
+                self.flush()
+
+    # ---------- التشغيل ----------
+
+    async def run_async(self):
+        """تشغيل كل المراحل معاً حتى ينتهي الفحص وتكتمل كل الطلبات"""
+        items = asyncio.Queue(maxsize=ITEM_QUEUE_SIZE)
+        units = asyncio.Queue(maxsize=self.concurrency * JOB_QUEUE_FACTOR)
+        limiter = translate_texts.RateLimiter(self.requests_per_minute, self.tokens_per_minute)
+        # يبدأ من --concurrency وينخفض تلقائياً عند 429 / 529
+        adaptive = translate_texts.AdaptiveConcurrency(self.concurrency)
+        done = asyncio.Event()
+        # الخطة تقديرية: الطلبات الجديدة تتوقف أيضاً عندما يبلغ الإنفاق الفعلي الميزانية
+        translate_texts.set_spend_limit(self.budget_tokens, self.budget_usd)
+
+        flusher = asyncio.create_task(translate_texts.flush_telemetry_periodically())
+        emitter = asyncio.create_task(self.emit(done))
+        # المراحل متداخلة: المدة كلها مرحلة ترجمة (أساس السرعة في check_progress.py)
+        translate_texts.start_translation_timer()
+        try:
+            await asyncio.gather(
+                self.scan(items),
+                self.group(items, units),
+                *(self.translate(units, limiter, adaptive) for _ in range(self.concurrency)),
+            )
+        finally:
+            translate_texts.stop_translation_timer()
+            done.set()
+            await emitter
+            flusher.cancel()
+            if translate_texts.backend is not None:
+                await translate_texts.backend.aclose()
+
+        if int(adaptive.limit) < self.concurrency:
+            print(f"📉 التوازي في نهاية التشغيل: {int(adaptive.limit)} من {self.concurrency}")
+
+    def run(self):
+        started = time.perf_counter()
+        asyncio.run(self.run_async())
+        self.flush()
+        print(f"\n⚡ اكتمل خط الإنتاج في {time.perf_counter() - started:.2f} ثانية "
+              f"({translate_texts.run_stats['items']} نص مكتمل)")
+
+    def print_summary(self):
+        """الذاكرة والقياسات والتكلفة والميزانية"""
+        if translate_texts.memory is not None:
+            print_memory_stats(translate_texts.memory)
+
+        print_telemetry_summary(translate_texts.telemetry)
+
+        run_stats = translate_texts.run_stats
+        cost = translate_texts.token_cost(run_stats['input_tokens'], run_stats['output_tokens'],
+                                          run_stats['cache_write_tokens'], run_stats['cache_read_tokens'])
+        print(f"\n💰 توكنات هذا التشغيل: {run_stats['input_tokens']} مدخلات + "
+              f"{run_stats['output_tokens']} مخرجات ≈ ${cost:.4f}")
+        translate_texts.print_cache_usage()
+        translate_texts.print_budget_reached(self.plan)
+
+    def close(self):
+        """حفظ الاستخراج والسجل والترجمات (أيضاً عند الإيقاف)"""
+        translate_texts.save_json_atomic(self.extracted, EXTRACTED_FILE)
+        save_manifest(self.manifest)
+        self.key_index.save()
+        if translate_texts.journal is not None:
+            translate_texts.journal.close()
+        translate_texts.save_dead_letters()
+        translate_texts.telemetry.flush()
+        if translate_texts.memory is not None:
+            translate_texts.memory.close()
+        if translate_texts.backend is not None:
+            translate_texts.backend.close()
+
+# ============================================
+# التشغيل
+# ============================================
+
+def parse_args():
+    """قراءة خيارات سطر الأوامر"""
+    parser = argparse.ArgumentParser(
+        description="استخراج وترجمة وكتابة ملفات اللغات في خط إنتاج واحد متدفق")
+    parser.add_argument('--budget-usd', type=float, default=translate_texts.BUDGET_USD,
+                        help="ميزانية التشغيل بالدولار (0 = بدون حد)")
+    parser.add_argument('--budget-tokens', type=int, default=translate_texts.BUDGET_TOKENS,
+                        help="ميزانية التشغيل بالتوكنات")
+    parser.add_argument('--concurrency', type=int, default=translate_texts.MAX_CONCURRENCY,
+                        help="عدد الطلبات المتزامنة")
+    parser.add_argument('--rpm', type=int, default=translate_texts.REQUESTS_PER_MINUTE,
+                        help="حد الطلبات في الدقيقة")
+    parser.add_argument('--tpm', type=int, default=translate_texts.TOKENS_PER_MINUTE,
+                        help="حد التوكنات في الدقيقة")
+    parser.add_argument('--batched', action='store_true',
+                        help="إرسال عدة نصوص وكل لغاتها في طلب واحد")
+    parser.add_argument('--batch-size', type=int, default=translate_texts.BATCH_MAX_ITEMS,
+                        help="الحد الأقصى للنصوص في الطلب المجمّع")
+    parser.add_argument('--emit-every', type=float, default=EMIT_EVERY,
+                        help="الفترة بين تحديثات ملفات اللغات بالثواني")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="تعطيل ذاكرة الترجمة")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=translate_texts.BACKEND,
+                        help="مزوّد الترجمة")
+    parser.add_argument('--base-url', default=translate_texts.BASE_URL,
+                        help="عنوان بديل لـ Messages API (مثلاً خادم fake_anthropic_server.py)")
+    add_output_arguments(parser)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if not os.path.isdir(PAGES_DIR):
+        print(f"❌ المجلد غير موجود: {PAGES_DIR}")
+        exit(1)
+
+    if args.no_cache:
+        translate_texts.TRANSLATION_MEMORY_FILE = None
+    translate_texts.BACKEND = args.backend
+    translate_texts.BASE_URL = args.base_url
+    try:
+        translate_texts.get_backend()
+    except BackendError as e:
+        print(f"❌ خطأ: {e}")
+        print("   قم بتشغيل: export ANTHROPIC_API_KEY='your-key-here'")
+        print("   أو استخدم خادم الاختبار المحلي: --base-url http://127.0.0.1:8765")
+        exit(1)
+
+    budget_usd = args.budget_usd or None
+    budget_tokens = args.budget_tokens or None
+    translate_texts.run_stats['budget_usd'] = budget_usd
+    translate_texts.run_stats['budget_tokens'] = budget_tokens
+
+    pipeline = Pipeline(
+        budget_tokens=budget_tokens,
+        budget_usd=budget_usd,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        batched=args.batched,
+        batch_size=args.batch_size,
+        emit_every=args.emit_every,
+        output=output_options(args),
+    )
+
+    print("🚀 بدء خط الإنتاج: استخراج ← ترجمة ← كتابة\n")
+    pipeline.load()
+    try:
+        pipeline.run()
+    except KeyboardInterrupt:
+        print("\n⚠️  تم الإيقاف، الترجمات المكتملة محفوظة")
+        print("   شغّل السكريبت مرة أخرى للمتابعة")
+        pipeline.close()
+        exit(130)
+
+    pipeline.print_summary()
+    pipeline.close()
+    print(f"\n✅ تم حفظ النتائج في: {translate_texts.OUTPUT_FILE} و {EXTRACTED_FILE}")
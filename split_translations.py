@@ -1,93 +1,329 @@
 #!/usr/bin/env python3
 """
-سكريبت تقسيم translations.jsx إلى ملفات منفصلة لكل لغة
+سكريبت كتابة ملفات الترجمة لكل لغة في src/locales
+يكتب مباشرة من translations_final.json بمرور واحد (بدون المرور عبر translations_GENERATED.jsx)
 """
 
-import re
+import argparse
+import gzip
+import json
 import os
 
-INPUT_FILE = "translations_GENERATED.jsx"
+from translation_store import TranslationStore
+
+# اختياري: ضغط Brotli (pip install brotli)
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+INPUT_FILE = "translations_final.json"
 OUTPUT_DIR = "src/locales"
 
+# وضع التقسيم حسب الفئة: ملف لكل (لغة، فئة) + manifest.json + loader.js
+MANIFEST_NAME = "manifest.json"
+LOADER_NAME = "loader.js"
+
+# حجم ذاكرة الكتابة المؤقتة لكل ملف
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# صيغ الإخراج: js (كائن JavaScript) أو json (أسرع في JSON.parse وأصغر حجماً)
+FORMATS = ('js', 'json')
+# ملفات مضغوطة مسبقاً بجانب كل ملف لغة (ليقدمها الـ CDN كما هي)
+COMPRESSIONS = ('gz', 'br')
+
+LANGUAGES = {
+    'ar': 'العربية',
+    'en': 'English',
+    'fr': 'Français',
+    'zh': '中文'
+}
+
 def ensure_dir(directory):
     """إنشاء المجلد إذا لم يكن موجوداً"""
     if not os.path.exists(directory):
         os.makedirs(directory)
         print(f"✅ تم إنشاء المجلد: {directory}")
 
-def split_translations():
-    """تقسيم الترجمات إلى ملفات منفصلة"""
+def js_string(value):
+    """تحويل نص إلى سلسلة JavaScript صالحة"""
+    # JSON صالح في JS ما عدا فواصل الأسطر U+2028 و U+2029 في المحركات القديمة
+    return json.dumps(value, ensure_ascii=False).replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+
+def js_key(key):
+    """اسم خاصية JavaScript: بدون علامات تنصيص إذا كان معرّفاً صالحاً"""
+    return key if key.isidentifier() else js_string(key)
+
+def json_text(value, minify=False):
+    """نص JSON بمفاتيح مرتبة (فروقات ثابتة بين التشغيلات)"""
+    if minify:
+        return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, indent=2) + '\n'
+
+def precompress(path, compress=()):
+    """كتابة نسخ .gz و .br بجانب الملف"""
+    if not compress:
+        return
     
-    print("🚀 بدء تقسيم ملف الترجمات...\n")
+    with open(path, 'rb') as f:
+        raw = f.read()
     
-    # قراءة الملف
-    if not os.path.exists(INPUT_FILE):
-        print(f"❌ الملف غير موجود: {INPUT_FILE}")
-        return
+    if 'gz' in compress:
+        # mtime=0 ليبقى الناتج متطابقاً بين التشغيلات
+        with open(f"{path}.gz", 'wb') as f:
+            f.write(gzip.compress(raw, compresslevel=9, mtime=0))
     
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        content = f.read()
+    if 'br' in compress and brotli is not None:
+        with open(f"{path}.br", 'wb') as f:
+            f.write(brotli.compress(raw, quality=11))
+
+def language_view(category_data, lang):
+    """قيم لغة واحدة لفئة: {key: value}"""
+    return {key: item.get(lang, '') for key, item in category_data.items()}
+
+def write_json_locales(data, output_dir=OUTPUT_DIR, languages=LANGUAGES, minify=False):
+    """كتابة ملف JSON لكل لغة: {category: {key: value}}"""
+    for lang, lang_name in languages.items():
+        payload = {
+            category_name: language_view(category_data, lang)
+            for category_name, category_data in data.items()
+        }
+        with open(f"{output_dir}/{lang}.json", 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            f.write(json_text(payload, minify))
+        
+        count = sum(1 for values in payload.values() for value in values.values() if value)
+        print(f"   ✅ {output_dir}/{lang}.json - {lang_name} ({count} ترجمة)")
+
+def write_locales(data, output_dir=OUTPUT_DIR, languages=LANGUAGES, fmt='js',
+                  minify=False, compress=()):
+    """كتابة ملف لكل لغة (js أو json)"""
+    ensure_dir(output_dir)
     
-    # استخراج كل لغة
-    languages = {
-        'ar': 'العربية',
-        'en': 'English',
-        'fr': 'Français',
-        'zh': '中文'
-    }
+    if fmt == 'json':
+        write_json_locales(data, output_dir, languages, minify)
+    else:
+        write_js_locales(data, output_dir, languages, minify)
+    
+    for lang in languages:
+        precompress(f"{output_dir}/{lang}.{fmt}", compress)
     
-    # إنشاء المجلدات
-    ensure_dir(OUTPUT_DIR)
+    # إنشاء ملف index.js
+    create_index_file(output_dir, languages, fmt)
+
+def write_js_locales(data, output_dir=OUTPUT_DIR, languages=LANGUAGES, minify=False):
+    """كتابة ملف JavaScript لكل لغة بمرور واحد على بيانات الترجمة"""
+    # minify: بدون مسافات وأسطر وتعليقات
+    nl, indent, sp = ('', '', '') if minify else ('\n', '  ', ' ')
+    files = {
+        lang: open(f"{output_dir}/{lang}.js", 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+        for lang in languages
+    }
+    counts = dict.fromkeys(languages, 0)
     
-    for lang_code, lang_name in languages.items():
-        print(f"📝 معالجة {lang_name} ({lang_code})...")
+    try:
+        for lang, f in files.items():
+            if not minify:
+                f.write(f"// {languages[lang]} translations\n")
+            f.write(f"export const {lang}{sp}={sp}{{{nl}")
         
-        # البحث عن قسم اللغة
-        pattern = rf'{lang_code}:\s*\{{(.*?)\n  \}},'
-        match = re.search(pattern, content, re.DOTALL)
+        for category_name, category_data in sorted(data.items()):
+            header = f"{indent}{js_key(category_name)}:{sp}{{{nl}"
+            for f in files.values():
+                f.write(header)
+            
+            for key, item in sorted(category_data.items()):
+                prop = js_key(key)
+                for lang, f in files.items():
+                    value = item.get(lang, '')
+                    f.write(f"{indent * 2}{prop}:{sp}{js_string(value)},{nl}")
+                    if value:
+                        counts[lang] += 1
+            
+            for f in files.values():
+                f.write(f"{indent}}},{nl}")
         
-        if not match:
-            print(f"   ⚠️  لم يتم العثور على {lang_name}")
+        for f in files.values():
+            f.write("};\n")
+    finally:
+        for f in files.values():
+            f.close()
+    
+    for lang, lang_name in languages.items():
+        print(f"   ✅ {output_dir}/{lang}.js - {lang_name} ({counts[lang]} ترجمة)")
+
+def write_chunk(path, category_data, lang, fmt='js', minify=False):
+    """كتابة ملف فئة واحدة للغة واحدة"""
+    with open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        if fmt == 'json':
+            f.write(json_text(language_view(category_data, lang), minify))
+            return
+        if minify:
+            f.write("export default{")
+            f.write(','.join(f"{js_key(key)}:{js_string(item.get(lang, ''))}"
+                             for key, item in sorted(category_data.items())))
+            f.write("};\n")
+            return
+        f.write("export default {\n")
+        for key, item in sorted(category_data.items()):
+            f.write(f"  {js_key(key)}: {js_string(item.get(lang, ''))},\n")
+        f.write("};\n")
+
+def page_namespaces(data):
+    """الفئات التي تحتاجها كل صفحة حسب source_file"""
+    pages = {}
+    for category_name, category_data in data.items():
+        for item in category_data.values():
+            pages.setdefault(item.get('source_file', ''), set()).add(category_name)
+    pages.pop('', None)
+    return {page: sorted(categories) for page, categories in sorted(pages.items())}
+
+def write_locale_chunks(data, output_dir=OUTPUT_DIR, languages=LANGUAGES, categories=None,
+                        fmt='js', minify=False, compress=()):
+    """كتابة ملف لكل (لغة، فئة) مع manifest.json و loader.js للتحميل عند الحاجة
+    
+    categories: إعادة كتابة هذه الفئات فقط (None = الكل)
+    """
+    for lang in languages:
+        ensure_dir(f"{output_dir}/{lang}")
+    
+    written = 0
+    for category_name, category_data in sorted(data.items()):
+        if categories is not None and category_name not in categories:
             continue
-        
-        lang_content = match.group(1)
-        
-        # إنشاء ملف اللغة
-        output_file = f"{OUTPUT_DIR}/{lang_code}.js"
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(f"// {lang_name} translations\n")
-            f.write(f"export const {lang_code} = {{\n")
-            f.write(lang_content)
-            f.write("\n};\n")
-        
-        # حساب عدد الأسطر
-        lines = lang_content.count('\n')
-        print(f"   ✅ تم حفظ {output_file} ({lines} سطر)\n")
+        for lang in languages:
+            path = f"{output_dir}/{lang}/{category_name}.{fmt}"
+            write_chunk(path, category_data, lang, fmt, minify)
+            precompress(path, compress)
+            written += 1
     
-    # إنشاء ملف index.js
-    create_index_file()
+    print(f"   ✅ {written} ملف في {output_dir}/<lang>/<category>.{fmt}")
+    
+    removed = remove_stale_chunks(data, output_dir, languages, fmt)
+    if removed:
+        print(f"   🗑️  حذف {removed} ملف قديم لم يعد في manifest.json")
+    
+    write_chunk_manifest(data, output_dir, languages, fmt)
+
+def remove_stale_chunks(data, output_dir=OUTPUT_DIR, languages=LANGUAGES, fmt='js'):
+    """حذف ملفات الفئات المحذوفة (أو بصيغة أخرى) مع نسخها المضغوطة"""
+    removed = 0
+    for lang in languages:
+        directory = f"{output_dir}/{lang}"
+        for name in os.listdir(directory):
+            base = name
+            for compression in COMPRESSIONS:
+                base = base.removesuffix(f".{compression}")
+            category_name, dot, ext = base.rpartition('.')
+            if not dot or ext not in FORMATS:
+                continue
+            if ext == fmt and category_name in data:
+                continue
+            os.remove(f"{directory}/{name}")
+            removed += 1
+    return removed
+
+def write_chunk_manifest(data, output_dir=OUTPUT_DIR, languages=LANGUAGES, fmt='js'):
+    """كتابة manifest.json و loader.js"""
+    namespaces = sorted(data)
+    pages = page_namespaces(data)
+    
+    manifest = {
+        'languages': list(languages),
+        'namespaces': namespaces,
+        'pages': pages,
+        'chunks': {
+            lang: {ns: f"./{lang}/{ns}.{fmt}" for ns in namespaces}
+            for lang in languages
+        },
+    }
+    with open(f"{output_dir}/{MANIFEST_NAME}", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    
+    # مسارات import() ثابتة ليقسمها الـ bundler إلى ملفات منفصلة
+    chunks = ''.join(
+        f"  {lang}: {{\n"
+        + ''.join(f"    {js_key(ns)}: () => import('./{lang}/{ns}.{fmt}'),\n" for ns in namespaces)
+        + "  },\n"
+        for lang in languages
+    )
+    
+    loader_content = f"""// Auto-generated lazy locale loader
+const chunks = {{
+{chunks}}};
+
+export const pageNamespaces = {json.dumps(pages, ensure_ascii=False, indent=2)};
+
+const loaded = {{}};
+
+// تحميل الفئات المطلوبة فقط (مرة واحدة لكل فئة)
+export async function loadNamespaces(lang, namespaces) {{
+  const cache = loaded[lang] || (loaded[lang] = {{}});
+  const missing = namespaces.filter((ns) => !(ns in cache) && chunks[lang] && chunks[lang][ns]);
+  await Promise.all(missing.map(async (ns) => {{
+    cache[ns] = (await chunks[lang][ns]()).default;
+  }}));
+  return cache;
+}}
+
+// تحميل ترجمات صفحة حسب اسم ملفها (source_file)
+export function loadPage(lang, page) {{
+  return loadNamespaces(lang, pageNamespaces[page] || []);
+}}
+"""
+    
+    with open(f"{output_dir}/{LOADER_NAME}", 'w', encoding='utf-8') as f:
+        f.write(loader_content)
+    
+    print(f"✅ تم إنشاء {output_dir}/{MANIFEST_NAME} و {output_dir}/{LOADER_NAME}")
+
+def write_output(data, output_dir=OUTPUT_DIR, chunks=False, fmt='js', minify=False,
+                 compress=(), categories=None):
+    """كتابة ملفات الترجمة حسب الخيارات المطلوبة"""
+    if chunks:
+        write_locale_chunks(data, output_dir, categories=categories, fmt=fmt,
+                            minify=minify, compress=compress)
+    else:
+        write_locales(data, output_dir, fmt=fmt, minify=minify, compress=compress)
+
+def split_translations(input_file=INPUT_FILE, output_dir=OUTPUT_DIR, chunks=False, **options):
+    """كتابة ملفات الترجمة لكل لغة من ملف JSON
+    
+    chunks: ملف لكل (لغة، فئة) مع تحميل عند الحاجة بدلاً من ملف لكل لغة
+    options: fmt و minify و compress (انظر write_output)
+    """
+    
+    print("🚀 بدء كتابة ملفات الترجمات...\n")
     
-    print("✨ تم الانتهاء من التقسيم!")
+    # قراءة الملف
+    if not os.path.exists(input_file):
+        print(f"❌ الملف غير موجود: {input_file}")
+        print("   شغّل translate_texts.py أولاً")
+        return
+    
+    # قراءة متدفقة في المخزن المضغوط بدلاً من json.load
+    data = TranslationStore.load(input_file)
+    
+    write_output(data, output_dir, chunks, **options)
+    
+    print("\n✨ تم الانتهاء من التقسيم!")
+    return data
 
-def create_index_file():
+def create_index_file(output_dir=OUTPUT_DIR, languages=LANGUAGES, fmt='js'):
     """إنشاء ملف index.js لتجميع كل الترجمات"""
     
-    index_content = """// Auto-generated translations index
-import { ar } from './ar';
-import { en } from './en';
-import { fr } from './fr';
-import { zh } from './zh';
-
-export const translations = {
-  ar,
-  en,
-  fr,
-  zh,
-};
+    if fmt == 'json':
+        imports = ''.join(f"import {lang} from './{lang}.json';\n" for lang in languages)
+    else:
+        imports = ''.join(f"import {{ {lang} }} from './{lang}';\n" for lang in languages)
+    entries = ''.join(f"  {lang},\n" for lang in languages)
+    
+    index_content = f"""// Auto-generated translations index
+{imports}
+export const translations = {{
+{entries}}};
 """
     
-    index_file = f"{OUTPUT_DIR}/index.js"
+    index_file = f"{output_dir}/index.js"
     
     with open(index_file, 'w', encoding='utf-8') as f:
         f.write(index_content)
@@ -127,8 +363,57 @@ def update_language_context():
         print("   إلى:")
         print(f"      {new_import}")
 
+def add_output_arguments(parser):
+    """خيارات الإخراج المشتركة بين السكريبتات"""
+    parser.add_argument('--chunks', action='store_true',
+                        help="ملف لكل (لغة، فئة) مع loader.js للتحميل عند الحاجة")
+    parser.add_argument('--format', choices=FORMATS, default='js',
+                        help="صيغة ملفات اللغات")
+    parser.add_argument('--minify', action='store_true',
+                        help="ملفات مضغوطة بدون مسافات وأسطر (js أو json)")
+    parser.add_argument('--compress', default='',
+                        help="نسخ مضغوطة مسبقاً بجانب كل ملف: gz أو br أو gz,br")
+
+def output_options(args):
+    """تحويل خيارات سطر الأوامر إلى معاملات write_output"""
+    compress = tuple(c for c in args.compress.split(',') if c)
+    for c in compress:
+        if c not in COMPRESSIONS:
+            raise SystemExit(f"❌ ضغط غير معروف: {c} (المتاح: {', '.join(COMPRESSIONS)})")
+    if 'br' in compress and brotli is None:
+        print("⚠️  مكتبة brotli غير مثبتة، لن تُكتب ملفات .br (pip install brotli)")
+    return {'chunks': args.chunks, 'fmt': args.format, 'minify': args.minify, 'compress': compress}
+
+def parse_args():
+    """قراءة خيارات سطر الأوامر"""
+    parser = argparse.ArgumentParser(description="كتابة ملفات الترجمة في src/locales")
+    add_output_arguments(parser)
+    return parser.parse_args()
+
+def print_chunks_summary(data, args):
+    """طباعة ملخص وضع التقسيم حسب الفئة"""
+    print("\n" + "="*50)
+    print("📊 النتيجة:")
+    print("="*50)
+    print(f"✅ تم تقسيم الترجمات إلى {len(data)} فئة لكل لغة:")
+    print(f"   • {OUTPUT_DIR}/<lang>/<category>.{args.format}")
+    print(f"   • {OUTPUT_DIR}/{MANIFEST_NAME}")
+    print(f"   • {OUTPUT_DIR}/{LOADER_NAME}")
+    print("\n💡 الاستخدام:")
+    print("   import { loadPage } from '../locales/loader';")
+    print("   const t = await loadPage(lang, 'Home');  // فئات الصفحة فقط")
+    print("="*50)
+
 if __name__ == "__main__":
-    split_translations()
+    args = parse_args()
+    
+    data = split_translations(**output_options(args))
+    
+    if args.chunks:
+        if data:
+            print_chunks_summary(data, args)
+        exit(0)
+    
     update_language_context()
     
     print("\n" + "="*50)
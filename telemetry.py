@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+قياسات الترجمة لكل طلب
+زمن الاستجابة (histogram) والتوكنات وإعادة المحاولات وإصابات الذاكرة وسرعة الترجمة لكل زوج لغات،
+وتُكتب في تقرير JSON وملف Prometheus (textfile collector) في نهاية التشغيل وعلى فترات أثناءه
+"""
+
+import json
+import os
+import threading
+import time
+
+# ============================================
+# الإعدادات
+# ============================================
+
+REPORT_FILE = "translations_final.telemetry.json"
+PROMETHEUS_FILE = "translations_final.prom"
+
+# الكتابة الدورية أثناء التشغيل (بالثواني، انظر flush_telemetry_periodically في translate_texts.py)
+FLUSH_EVERY = 30
+
+# حدود فئات زمن الاستجابة بالثواني
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+
+# اسم الهدف في الطلبات المجمّعة (عدة لغات في طلب واحد)
+BATCH_TARGET = "*"
+
+# ============================================
+# المقاييس
+# ============================================
+
+class Histogram:
+    """histogram تراكمي بحدود ثابتة مثل Prometheus"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """إضافة قيمة"""
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """تقدير الـ percentile من الفئات (الحد الأعلى للفئة)
+        
+        فئة ما فوق آخر حد تُرجع '+Inf' كما في Prometheus (float('inf') ليس JSON صالحاً)
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else '+Inf'
+        return '+Inf'
+
+    def cumulative(self):
+        """العدد التراكمي لكل حد (le)"""
+        total = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            yield bound, total
+
+def new_pair_stats():
+    """عدادات زوج لغات واحد"""
+    return {
+        'requests': 0,
+        'errors': 0,
+        'retries': 0,
+        'cache_hits': 0,
+        'strings': 0,
+        'input_tokens': 0,
+        'output_tokens': 0,
+        'cache_write_tokens': 0,
+        'cache_read_tokens': 0,
+        'latency': Histogram(),
+    }
+
+class Telemetry:
+    """تجميع القياسات لكل زوج لغات (المصدر، الهدف) وكتابتها"""
+
+    def __init__(self, report_file=REPORT_FILE, prometheus_file=PROMETHEUS_FILE):
+        self.report_file = report_file
+        self.prometheus_file = prometheus_file
+        self.started = time.time()
+        self.pairs = {}
+        # الطلبات غير المتزامنة في خيط واحد، لكن الكتابة قد تأتي من خيط آخر
+        self.lock = threading.Lock()
+
+    def pair(self, source_lang, target_lang):
+        """عدادات زوج لغات (تُنشأ عند أول استخدام)"""
+        key = (source_lang, target_lang)
+        if key not in self.pairs:
+            self.pairs[key] = new_pair_stats()
+        return self.pairs[key]
+
+    def observe_request(self, source_lang, target_lang, seconds, response=None):
+        """تسجيل طلب واحد: زمنه وتوكناته، أو خطأ إذا لم يوجد رد
+        
+        seconds=None: زمن غير معروف (نتائج Message Batches) فلا يدخل في الـ histogram
+        """
+        with self.lock:
+            stats = self.pair(source_lang, target_lang)
+            stats['requests'] += 1
+            if seconds is not None:
+                stats['latency'].observe(seconds)
+            if response is None:
+                stats['errors'] += 1
+            else:
+                for name in ('input_tokens', 'output_tokens', 'cache_write_tokens', 'cache_read_tokens'):
+                    stats[name] += response.get(name, 0)
+
+    def record_retry(self, source_lang, target_lang=BATCH_TARGET):
+        """تسجيل إعادة محاولة"""
+        with self.lock:
+            self.pair(source_lang, target_lang)['retries'] += 1
+
+    def record_translation(self, source_lang, target_lang, cached=False):
+        """تسجيل نص تُرجم (من الـ API أو من الذاكرة)"""
+        with self.lock:
+            stats = self.pair(source_lang, target_lang)
+            stats['strings'] += 1
+            if cached:
+                stats['cache_hits'] += 1
+
+    def snapshot(self):
+        """كل القياسات كقاموس قابل للتحويل إلى JSON"""
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            pairs = {}
+            for (source_lang, target_lang), stats in sorted(self.pairs.items()):
+                latency = stats['latency']
+                pairs[f"{source_lang}->{target_lang}"] = {
+                    'requests': stats['requests'],
+                    'errors': stats['errors'],
+                    'retries': stats['retries'],
+                    'cache_hits': stats['cache_hits'],
+                    'strings': stats['strings'],
+                    'strings_per_second': round(stats['strings'] / elapsed, 3),
+                    'input_tokens': stats['input_tokens'],
+                    'output_tokens': stats['output_tokens'],
+                    'cache_write_tokens': stats['cache_write_tokens'],
+                    'cache_read_tokens': stats['cache_read_tokens'],
+                    'latency': {
+                        'count': latency.count,
+                        'mean': round(latency.sum / latency.count, 4) if latency.count else None,
+                        'p50': latency.quantile(0.5),
+                        'p90': latency.quantile(0.9),
+                        'p99': latency.quantile(0.99),
+                        'buckets': {str(bound): count for bound, count in latency.cumulative()},
+                    },
+                }
+
+            totals = {
+                name: sum(stats[name] for stats in self.pairs.values())
+                for name in ('requests', 'errors', 'retries', 'cache_hits', 'strings',
+                             'input_tokens', 'output_tokens', 'cache_write_tokens', 'cache_read_tokens')
+            }
+            totals['strings_per_second'] = round(totals['strings'] / elapsed, 3)
+
+            return {
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'seconds': round(elapsed, 1),
+                'totals': totals,
+                'pairs': pairs,
+                'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+
+    def prometheus_text(self):
+        """القياسات بصيغة Prometheus exposition"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            items = sorted(self.pairs.items())
+
+            def samples(field, extra=None):
+                return [
+                    ({'source': source, 'target': target, **(extra or {})}, stats[field])
+                    for (source, target), stats in items
+                ]
+
+            histogram = []
+            for (source, target), stats in items:
+                latency = stats['latency']
+                for bound, count in latency.cumulative():
+                    histogram.append(({'source': source, 'target': target, 'le': bound}, count))
+            metric('translate_request_duration_seconds', 'histogram',
+                   "Latency of translation API requests", [])
+            for labels, value in histogram:
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"translate_request_duration_seconds_bucket{{{label_text}}} {value}")
+            for (source, target), stats in items:
+                labels = f'source="{source}",target="{target}"'
+                lines.append(f"translate_request_duration_seconds_sum{{{labels}}} {stats['latency'].sum:.6f}")
+                lines.append(f"translate_request_duration_seconds_count{{{labels}}} {stats['latency'].count}")
+
+            metric('translate_requests_total', 'counter', "Translation API requests", samples('requests'))
+            metric('translate_request_errors_total', 'counter', "Failed translation API requests",
+                   samples('errors'))
+            metric('translate_retries_total', 'counter', "Translation request retries", samples('retries'))
+            metric('translate_cache_hits_total', 'counter', "Translations served from translation memory",
+                   samples('cache_hits'))
+            metric('translate_strings_total', 'counter', "Strings translated", samples('strings'))
+            metric('translate_tokens_total', 'counter', "Tokens used by translation requests",
+                   samples('input_tokens', {'direction': 'input'}) +
+                   samples('output_tokens', {'direction': 'output'}) +
+                   samples('cache_write_tokens', {'direction': 'cache_write'}) +
+                   samples('cache_read_tokens', {'direction': 'cache_read'}))
+            metric('translate_strings_per_second', 'gauge', "Strings translated per second in this run",
+                   [({'source': source, 'target': target}, round(stats['strings'] / elapsed, 3))
+                    for (source, target), stats in items])
+
+        lines.append("# HELP translate_run_duration_seconds Duration of the current translation run")
+        lines.append("# TYPE translate_run_duration_seconds gauge")
+        lines.append(f"translate_run_duration_seconds {elapsed:.1f}")
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """كتابة التقرير وملف Prometheus (استبدال ذري حتى لا يُقرأ ملف ناقص)"""
+        outputs = []
+        if self.report_file:
+            outputs.append((self.report_file, json.dumps(self.snapshot(), ensure_ascii=False, indent=2)))
+        if self.prometheus_file:
+            outputs.append((self.prometheus_file, self.prometheus_text()))
+
+        for path, content in outputs:
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+
+def print_telemetry_summary(telemetry):
+    """ملخص القياسات لكل زوج لغات"""
+    report = telemetry.snapshot()
+    if not report['pairs']:
+        return
+
+    print("\n" + "="*50)
+    print("⏱️  قياسات الطلبات:")
+    print("="*50)
+    for name, stats in report['pairs'].items():
+        latency = stats['latency']
+        mean = f"{latency['mean']:.2f}s" if latency['mean'] is not None else "-"
+        if latency['p90'] is None:
+            p90 = "-"
+        elif latency['p90'] == '+Inf':
+            p90 = f">{LATENCY_BUCKETS[-1]}s"
+        else:
+            p90 = f"≤{latency['p90']}s"
+        print(f"{name:<8} {stats['strings']:>5} نص ({stats['strings_per_second']:.2f}/ث)  "
+              f"طلبات {stats['requests']} (أخطاء {stats['errors']}، إعادة {stats['retries']})  "
+              f"ذاكرة {stats['cache_hits']}  زمن {mean} p90 {p90}")
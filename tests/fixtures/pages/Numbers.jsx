@@ -0,0 +1,13 @@
+export default function Numbers() {
+  const phone = "+966 50 123 4567";
+  const year = '2024';
+  return (
+    <table>
+      <tr><td>12,500 ريال</td><td>٢٠٢٤/٠٥/١٠</td></tr>
+      <tr><td>Price: $49.99</td><td>99.5%</td></tr>
+      <tr><td>{phone}</td><td>{year}</td></tr>
+      <tr><td>FAQ</td><td>WhatsApp</td><td>Français</td></tr>
+      <tr><td>Version 2.0 released</td><td>1234567</td></tr>
+    </table>
+  );
+}
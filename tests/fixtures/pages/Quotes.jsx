@@ -0,0 +1,18 @@
+import React from 'react';
+
+export default function Quotes() {
+  const title = "Welcome to our website";
+  const subtitle = 'مرحباً بكم في موقعنا';
+  return (
+    <div className="page-header" onClick={() => setOpen(true)}>
+      <h1>{title}</h1>
+      <p>He said "Hello there" and left</p>
+      <p>قال المعلم "اقرأ الكتاب" ثم خرج</p>
+      <p>Don't forget to subscribe</p>
+      <input placeholder="Search the library..." aria-label='Search books' />
+      <span title="It's a 'quoted' title">Hover me please</span>
+      <button>إرسال الرسالة</button>
+      <a href="https://example.com/about">Read more about us</a>
+    </div>
+  );
+}
@@ -0,0 +1,14 @@
+export default function Templates({ user, count }) {
+  const greeting = `Hello ${user.name}, welcome back`;
+  const message = `لديك ${count} رسائل جديدة`;
+  const mixed = `Total: ${count > 1 ? "Many items" : 'Single item'}`;
+  return (
+    <section>
+      <h2>{`Your Profile Page`}</h2>
+      <p>{greeting}</p>
+      <p>{count > 0 ? "You have new messages" : "No new messages yet"}</p>
+      <p>{t('already.translated')}</p>
+      <p>{message} and {mixed}</p>
+    </section>
+  );
+}
@@ -0,0 +1,12 @@
+export default function Quran() {
+  return (
+    <article>
+      <h3>آية اليوم</h3>
+      <p className="verse">بِسْمِ اللَّهِ الرَّحْمَٰنِ الرَّحِيمِ</p>
+      <p>"الْحَمْدُ لِلَّهِ رَبِّ الْعَالَمِينَ"</p>
+      <p>قال تعالى: إِنَّ مَعَ الْعُسْرِ يُسْرًا</p>
+      <p>سورة البقرة، الآية ٢٥٥</p>
+      <footer>صدق الله العظيم</footer>
+    </article>
+  );
+}
@@ -0,0 +1,100 @@
+"""
+اختبار الماسح في extract_texts.py مقابل الاستخراج القديم
+على ملفات tests/fixtures/pages (تنصيص داخل JSX، قوالب نصية، آيات، أرقام)
+"""
+
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from extract_texts import (
+    IGNORE_PATTERNS, PATTERNS, classify_text, clean_text, extract_texts_from_content,
+)
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures' / 'pages'
+FIXTURE_FILES = sorted(FIXTURES_DIR.rglob('*.jsx'))
+
+# ============================================
+# الاستخراج القديم (re.findall لكل نمط) كما كان قبل الماسح
+# ============================================
+
+def extract_texts_legacy(content):
+    """الاستخراج القديم، مرجع للمقارنة فقط"""
+    texts = set()
+    for pattern in PATTERNS.values():
+        for match in re.findall(pattern, content):
+            text = clean_text(match)
+            if len(text.strip()) < 3 or any(re.match(p, text.strip()) for p in IGNORE_PATTERNS):
+                continue
+            if re.compile(r'[\u0600-\u06FF]').search(text) or (len(text) > 5 and text[0].isupper()):
+                texts.add(text)
+    return list(texts)
+
+def extract_fixture(name):
+    """نصوص ملف من ملفات الاختبار بالماسح"""
+    return extract_texts_from_content((FIXTURES_DIR / name).read_text(encoding='utf-8'))
+
+# ============================================
+# الاختبارات
+# ============================================
+
+@pytest.mark.parametrize('path', FIXTURE_FILES, ids=lambda path: path.relative_to(FIXTURES_DIR).as_posix())
+def test_scanner_matches_legacy(path):
+    """الماسح يعطي نفس نصوص الاستخراج القديم لكل ملف"""
+    content = path.read_text(encoding='utf-8')
+    assert set(extract_texts_from_content(content)) == set(extract_texts_legacy(content))
+
+def test_scanner_output_is_stable():
+    """ترتيب الظهور الأول بدون تكرار"""
+    texts = extract_fixture('Quotes.jsx')
+    assert len(texts) == len(set(texts))
+    assert texts[:2] == ['Welcome to our website', 'مرحباً بكم في موقعنا']
+
+def test_quotes_inside_jsx():
+    """النص الكامل والجزء المقتبس داخله كلاهما يُستخرج"""
+    texts = extract_fixture('Quotes.jsx')
+    assert 'He said "Hello there" and left' in texts
+    assert 'Hello there' in texts
+    assert 'قال المعلم "اقرأ الكتاب" ثم خرج' in texts
+    assert "Don't forget to subscribe" in texts
+    assert "It's a 'quoted' title" in texts
+    # أسماء الخصائص والروابط لا تُستخرج
+    assert not any(text.startswith('http') or text == 'page-header' for text in texts)
+
+def test_template_literals():
+    """القوالب النصية لا تُستخرج، والنصوص المنصصة داخل ${} تُستخرج"""
+    texts = extract_fixture('Templates.jsx')
+    assert not any('${' in text or 'welcome back' in text for text in texts)
+    assert 'Many items' in texts
+    assert 'No new messages yet' in texts
+    assert not any('already.translated' in text for text in texts)
+
+def test_quranic_strings():
+    """الآيات تُستخرج وتُصنف quranic، والنص العادي بجوارها يُترجم"""
+    kinds = {text: classify_text(text)[0] for text in extract_fixture('nested/Quran.jsx')}
+    assert kinds['بِسْمِ اللَّهِ الرَّحْمَٰنِ الرَّحِيمِ'] == 'quranic'
+    assert kinds['الْحَمْدُ لِلَّهِ رَبِّ الْعَالَمِينَ'] == 'quranic'
+    assert kinds['آية اليوم'] == 'text'
+
+def test_number_strings():
+    """الأرقام اللاتينية تُتجاهل عند الاستخراج، والعربية تُصنف numeric"""
+    texts = extract_fixture('Numbers.jsx')
+    assert not {'2024', '1234567', '+966 50 123 4567', '99.5%'} & set(texts)
+    assert classify_text('٢٠٢٤/٠٥/١٠') == ('numeric', 'numeric')
+    assert classify_text('12,500 ريال') == ('text', '')
+
+def test_target_language_strings():
+    """أسماء اللغات بلغتها، والنص غير العربي المكتوب بحروف فرنسية أو صينية، يُنسخ كما هو"""
+    assert classify_text('Français') == ('native_name', 'native_name')
+    assert classify_text('English') == ('native_name', 'native_name')
+    assert classify_text('Crème brûlée maison') == ('already_target', 'already_target')
+    assert classify_text('Bienvenue à tous') == ('already_target', 'already_target')
+    assert classify_text('Contact 联系我们') == ('already_target', 'already_target')
+    assert classify_text('Welcome to our website') == ('text', '')
+    # المصدر العربي يُترجم ولو احتوى حروفاً فرنسية
+    assert classify_text('مقهى Café') == ('text', '')
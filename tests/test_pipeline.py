@@ -0,0 +1,120 @@
+"""
+اختبار خط الإنتاج (pipeline.py) على ملفات tests/fixtures/pages بمزوّد وهمي:
+التشغيل الأول يترجم ويكتب ملفات اللغات، والتشغيل الثاني بدون تغيير لا يرسل ولا يكتب شيئاً
+"""
+
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import translate_texts
+from pipeline import Pipeline
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures' / 'pages'
+
+# ============================================
+# أدوات مساعدة
+# ============================================
+
+class FakeBackend:
+    """مزوّد وهمي يعدّ الطلبات ويرد بترجمة ثابتة"""
+
+    def __init__(self):
+        self.requests = 0
+
+    async def complete_async(self, prompt, max_tokens, system=None, cache_system=False):
+        self.requests += 1
+        return {'text': f"translation {self.requests}", 'input_tokens': 50,
+                'output_tokens': 10, 'cache_write_tokens': 0, 'cache_read_tokens': 0}
+
+    async def aclose(self):
+        pass
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """مشروع مؤقت فيه src/pages من ملفات الاختبار، بدون ذاكرة ترجمة"""
+    shutil.copytree(FIXTURES_DIR, tmp_path / 'src' / 'pages')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(translate_texts, 'TRANSLATION_MEMORY_FILE', None)
+    monkeypatch.setattr(translate_texts, 'memory', None)
+    monkeypatch.setattr(translate_texts, 'journal', None)
+    monkeypatch.setattr(translate_texts, 'dead_letters', [])
+    monkeypatch.setattr(translate_texts, 'run_stats', {
+        **translate_texts.run_stats,
+        'items': 0, 'translated': 0, 'translate_seconds': 0.0, 'translate_started': None,
+        'input_tokens': 0, 'output_tokens': 0, 'cache_write_tokens': 0, 'cache_read_tokens': 0,
+        'budget_reached': False, 'budget_stopped': 0,
+    })
+    monkeypatch.setattr(translate_texts, 'spend_limit', {'tokens': None, 'usd': None})
+    backend = FakeBackend()
+    monkeypatch.setattr(translate_texts, 'backend', backend)
+    return backend
+
+def run_pipeline():
+    """تشغيل كامل كما في pipeline.py من سطر الأوامر"""
+    translate_texts.reset_run_counters()
+    pipeline = Pipeline(pages_dir=Path('src/pages'), concurrency=2,
+                        requests_per_minute=100000, tokens_per_minute=100000000)
+    pipeline.load()
+    pipeline.run()
+    pipeline.close()
+    return pipeline
+
+def locale_files():
+    """محتوى ملفات اللغات ووقت تعديلها"""
+    return {
+        path.as_posix(): (path.stat().st_mtime_ns, path.read_bytes())
+        for path in sorted(Path('src/locales').rglob('*')) if path.is_file()
+    }
+
+# ============================================
+# الاختبارات
+# ============================================
+
+def test_first_run_translates_and_emits(project):
+    """التشغيل الأول يترجم كل النصوص ويكتب ملف كل لغة"""
+    run_pipeline()
+
+    data = json.loads(Path(translate_texts.OUTPUT_FILE).read_text(encoding='utf-8'))
+    items = [item for category in data.values() for item in category.values()]
+    assert items
+    assert project.requests > 0
+    assert not any(item['needs_translation'] for item in items)
+    assert {'ar.js', 'en.js', 'fr.js', 'zh.js'} <= {path.name for path in Path('src/locales').iterdir()}
+    assert not Path(translate_texts.JOURNAL_FILE).exists()
+
+def test_second_run_is_noop(project):
+    """التشغيل الثاني بدون تغيير في الصفحات: بدون طلبات ولا فئات متغيرة ولا كتابة"""
+    run_pipeline()
+    requests = project.requests
+    translations = Path(translate_texts.OUTPUT_FILE).read_text(encoding='utf-8')
+    before = locale_files()
+
+    pipeline = run_pipeline()
+
+    assert project.requests == requests
+    assert translate_texts.run_stats['items'] == 0
+    assert pipeline.dirty == set()
+    assert locale_files() == before
+    assert Path(translate_texts.OUTPUT_FILE).read_text(encoding='utf-8') == translations
+
+def test_new_text_translates_only_its_category(project):
+    """نص جديد بعد التشغيل الأول: طلبات لغاته فقط"""
+    run_pipeline()
+    requests = project.requests
+
+    page = Path('src/pages/Quotes.jsx')
+    page.write_text(page.read_text(encoding='utf-8') + '\n<p>صفحة جديدة للاختبار فقط</p>\n', encoding='utf-8')
+    run_pipeline()
+
+    assert project.requests == requests + 3
+    assert translate_texts.run_stats['items'] == 1
@@ -0,0 +1,249 @@
+"""
+اختبار التخطيط والميزانية والاستئناف في translate_texts.py:
+تسعير الطلبات المجمّعة (--batched)، والتوقف عند بلوغ الإنفاق الفعلي الميزانية،
+وذاكرة الترجمة للقراءة فقط في --dry-run، واستعادة السجل بعد الانقطاع
+"""
+
+import asyncio
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import translate_texts
+from translate_texts import estimate_batched_request, estimate_request, pack_batches, plan_jobs
+from translation_memory import TranslationMemory
+
+TEXTS = [
+    'مرحباً بكم في موقعنا',
+    'تسجيل الدخول إلى حسابك',
+    'ابحث عن الكتب والمقالات',
+    'تواصل معنا عبر البريد',
+    'سياسة الخصوصية وشروط الاستخدام',
+]
+
+# ============================================
+# أدوات مساعدة
+# ============================================
+
+def make_item(text):
+    """عنصر عربي يحتاج ترجمة"""
+    return {'ar': text, 'en': '', 'fr': '', 'zh': '', 'needs_translation': True,
+            'kind': 'text', 'skip_reason': ''}
+
+def make_jobs(texts=TEXTS):
+    """عمل لكل نص (كما يبنيها build_jobs) إلى اللغات الثلاث"""
+    return [
+        {
+            'id': f"common.key_{index}",
+            'members': [('common', f"key_{index}", make_item(text))],
+            'text': text,
+            'source_lang': 'ar',
+            'targets': ['en', 'fr', 'zh'],
+        }
+        for index, text in enumerate(texts)
+    ]
+
+def new_batch():
+    return {'placed': set(), 'requests': 0, 'items': 0, 'tokens': 0}
+
+class FakeBackend:
+    """مزوّد وهمي: كل رد يكلف usage المحدد ويُعدّ الطلبات"""
+
+    def __init__(self, input_tokens):
+        self.input_tokens = input_tokens
+        self.requests = 0
+
+    async def complete_async(self, prompt, max_tokens, system=None, cache_system=False):
+        self.requests += 1
+        return {'text': f"translation {self.requests}", 'input_tokens': self.input_tokens,
+                'output_tokens': 10, 'cache_write_tokens': 0, 'cache_read_tokens': 0}
+
+    async def aclose(self):
+        pass
+
+@pytest.fixture
+def run_state(tmp_path, monkeypatch):
+    """حالة تشغيل نظيفة: بدون ذاكرة ترجمة ولا سجل، والملفات في مجلد مؤقت"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(translate_texts, 'TRANSLATION_MEMORY_FILE', None)
+    monkeypatch.setattr(translate_texts, 'memory', None)
+    monkeypatch.setattr(translate_texts, 'journal', None)
+    monkeypatch.setattr(translate_texts, 'dead_letters', [])
+    monkeypatch.setattr(translate_texts, 'run_stats', {
+        **translate_texts.run_stats,
+        'items': 0, 'translated': 0, 'translate_seconds': 0.0, 'translate_started': None,
+        'input_tokens': 0, 'output_tokens': 0, 'cache_write_tokens': 0, 'cache_read_tokens': 0,
+        'budget_reached': False, 'budget_stopped': 0,
+    })
+    monkeypatch.setattr(translate_texts, 'spend_limit', {'tokens': None, 'usd': None})
+    return tmp_path
+
+# ============================================
+# تسعير الطلبات المجمّعة
+# ============================================
+
+def test_batched_plan_counts_packed_requests(run_state):
+    """الخطة المجمّعة تعدّ طلباً لكل حزمة كما يحزمها pack_batches، لا طلباً لكل نص ولغة"""
+    jobs = make_jobs()
+    _, single = plan_jobs(jobs)
+    _, batched = plan_jobs(jobs, batch_size=2)
+
+    assert single['requests'] == len(jobs) * 3
+    assert batched['requests'] == len(pack_batches(jobs, max_items=2)) == 3
+    # القالب والتعليمات الثابتة تُدفع مرة لكل طلب مجمّع
+    assert batched['cost_usd'] < single['cost_usd']
+    assert sum(counts['requests'] for counts in batched['categories'].values()) == 3
+
+def test_batched_request_charges_template_once(run_state):
+    """أول نص في الطلب يتحمل القالب، والنص المحزوم لا يُحزم مرة ثانية للغته التالية"""
+    first, second = make_jobs()[:2]
+    batch = new_batch()
+
+    opening_tokens, _ = estimate_batched_request(first, 'en', batch, batch_size=2)
+    joining_tokens, _ = estimate_batched_request(second, 'en', batch, batch_size=2)
+    again_tokens, _ = estimate_batched_request(first, 'fr', batch, batch_size=2)
+
+    assert batch['requests'] == 1
+    assert batch['placed'] == {first['id'], second['id']}
+    assert opening_tokens > joining_tokens > again_tokens
+    # لغة إضافية لنص محزوم: مخرجاتها فقط، أقل من طلب منفصل
+    assert again_tokens < estimate_request(first, 'fr')[0]
+
+def test_batched_plan_defers_and_repacks(run_state):
+    """ما لا يدخل في الميزانية يُؤجل ويُعدّ كطلبات مجمّعة جديدة للتشغيل التالي"""
+    jobs = make_jobs()
+    _, full = plan_jobs(jobs, batch_size=2)
+    planned, plan = plan_jobs(jobs, budget_usd=full['cost_usd'] / 2, batch_size=2)
+
+    assert plan['budget_reached']
+    assert 0 < plan['requests'] < full['requests']
+    assert plan['deferred_requests'] >= 1
+    assert plan['cost_usd'] <= full['cost_usd'] / 2
+    assert planned
+
+# ============================================
+# الميزانية الفعلية
+# ============================================
+
+def test_budget_stops_on_real_spend(run_state, monkeypatch):
+    """الطلبات الجديدة تتوقف عندما يبلغ الإنفاق الفعلي الميزانية ولو كانت الخطة أرخص"""
+    # كل رد يكلف ~$3 بينما تقدير الخطة أجزاء من السنت
+    backend = FakeBackend(input_tokens=1_000_000)
+    monkeypatch.setattr(translate_texts, 'backend', backend)
+    data = {'common': {f"key_{index}": make_item(text) for index, text in enumerate(TEXTS[:3])}}
+
+    asyncio.run(translate_texts.translate_batch_async(
+        data, budget_usd=1.0, concurrency=1,
+        requests_per_minute=100000, tokens_per_minute=100000000,
+    ))
+
+    assert backend.requests == 1
+    assert translate_texts.run_stats['budget_reached']
+    assert translate_texts.run_stats['budget_stopped'] == 3 * 3 - 1
+    # ما أوقفته الميزانية يبقى معلقاً وليس فشلاً
+    assert all(item['needs_translation'] for item in data['common'].values())
+    assert translate_texts.dead_letters == []
+
+def test_unlimited_budget_translates_everything(run_state, monkeypatch):
+    """بدون ميزانية لا يتوقف أي طلب"""
+    backend = FakeBackend(input_tokens=1_000_000)
+    monkeypatch.setattr(translate_texts, 'backend', backend)
+    data = {'common': {f"key_{index}": make_item(text) for index, text in enumerate(TEXTS[:3])}}
+
+    asyncio.run(translate_texts.translate_batch_async(
+        data, concurrency=1, requests_per_minute=100000, tokens_per_minute=100000000,
+    ))
+
+    assert backend.requests == 3 * 3
+    assert translate_texts.run_stats['budget_stopped'] == 0
+    assert not any(item['needs_translation'] for item in data['common'].values())
+
+# ============================================
+# --dry-run
+# ============================================
+
+def test_read_only_memory_does_not_write(tmp_path):
+    """ذاكرة الترجمة للقراءة فقط تجد الترجمات بدون تحديث last_used ولا حفظ جديد"""
+    path = str(tmp_path / 'memory.sqlite')
+    tm = TranslationMemory(path)
+    tm.put('مرحباً', 'ar', 'en', 'model', 1, 'Hello')
+    tm.close()
+
+    def snapshot():
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT key, last_used FROM entries ORDER BY key").fetchall()
+        finally:
+            conn.close()
+
+    before = snapshot()
+    tm = TranslationMemory(path, read_only=True)
+    assert tm.get('مرحباً', 'ar', 'en', 'model', 1) == 'Hello'
+    tm.put('وداعاً', 'ar', 'en', 'model', 1, 'Goodbye')
+    tm.close()
+
+    assert snapshot() == before
+
+# ============================================
+# السجل: الانقطاع والاستئناف
+# ============================================
+
+def test_journal_resumes_after_crash(run_state, monkeypatch):
+    """بعد انقطاع مفاجئ يستعيد load_data كل لغة وصلت، ولا يُعاد طلب ما دُفع"""
+    extracted = {'common': {f"key_{index}": make_item(text) for index, text in enumerate(TEXTS[:3])}}
+    translate_texts.save_json_atomic(extracted, 'extracted.json')
+
+    data = translate_texts.load_data('extracted.json', 'final.json', 'final.journal.jsonl')
+    journal = translate_texts.TranslationJournal(data, 'final.journal.jsonl', 'final.json', compact_every=100)
+    monkeypatch.setattr(translate_texts, 'journal', journal)
+
+    # الأول اكتمل، والثاني وصلت ترجمته الإنجليزية فقط قبل الانقطاع
+    done = {'members': [('common', 'key_0', data['common']['key_0'])]}
+    for lang, text in (('en', 'Welcome'), ('fr', 'Bienvenue'), ('zh', '欢迎')):
+        translate_texts.apply_translation(done, lang, text)
+    translate_texts.mark_done('common', 'key_0', data['common']['key_0'], translated=True)
+    translate_texts.apply_translation({'members': [('common', 'key_1', data['common']['key_1'])]},
+                                      'en', 'Sign in to your account')
+    # انقطاع: بدون compact ولا close، وآخر سطر مقطوع
+    journal.file.close()
+    with open('final.journal.jsonl', 'a', encoding='utf-8') as f:
+        f.write('{"category": "common", "key": "key_2", "item": {"ar"')
+    assert not Path('final.json').exists()
+
+    resumed = translate_texts.load_data('extracted.json', 'final.json', 'final.journal.jsonl')
+
+    assert resumed['common']['key_0']['needs_translation'] is False
+    assert resumed['common']['key_0']['zh'] == '欢迎'
+    assert resumed['common']['key_1']['en'] == 'Sign in to your account'
+    assert resumed['common']['key_1']['needs_translation'] is True
+    assert resumed['common']['key_2']['en'] == ''
+
+    # المعلق بعد الاستئناف: اللغات الناقصة فقط
+    jobs = translate_texts.build_jobs(translate_texts.collect_pending(resumed))
+    assert {job['id']: job['targets'] for job in jobs} == {
+        'common.key_1': ['fr', 'zh'],
+        'common.key_2': ['en', 'fr', 'zh'],
+    }
+
+def test_journal_compaction_writes_snapshot(run_state):
+    """compact يكتب نسخة كاملة ويفرغ السجل، والاستئناف يقرأ النسخة"""
+    extracted = {'common': {'key_0': make_item(TEXTS[0])}}
+    translate_texts.save_json_atomic(extracted, 'extracted.json')
+    data = translate_texts.load_data('extracted.json', 'final.json', 'final.journal.jsonl')
+    journal = translate_texts.TranslationJournal(data, 'final.journal.jsonl', 'final.json', compact_every=1)
+
+    item = data['common']['key_0']
+    item.update({'en': 'Welcome', 'fr': 'Bienvenue', 'zh': '欢迎'})
+    item['needs_translation'] = False
+    journal.record('common', 'key_0', item)
+    journal.file.close()
+
+    assert Path('final.journal.jsonl').read_text(encoding='utf-8') == ''
+    resumed = translate_texts.load_data('extracted.json', 'final.json', 'final.journal.jsonl')
+    assert resumed['common']['key_0']['fr'] == 'Bienvenue'
+    assert resumed['common']['key_0']['needs_translation'] is False
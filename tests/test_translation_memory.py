@@ -0,0 +1,90 @@
+"""
+اختبار البحث التقريبي في ذاكرة الترجمة (translation_memory.py) وحدوده في translate_texts.py:
+إعادة الاستخدام عند FUZZY_REUSE_THRESHOLD، والمرجع مع الطلب عند FUZZY_REFERENCE_THRESHOLD
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import translate_texts
+from translation_memory import TranslationMemory
+
+SOURCE = 'مرحباً بكم في موقعنا الجديد'
+TRANSLATION = 'Welcome to our new website'
+# نفس النص بالتشكيل وعلامة ترقيم: تشابه 1.0
+SAME_WITH_TASHKEEL = 'مَرْحَباً بِكُمْ فِي مَوْقِعِنَا الجَدِيدِ!'
+# كلمة مختلفة: تشابه ~0.92
+NEAR = 'مرحباً بكم في موقعنا القديم'
+UNRELATED = 'سياسة الخصوصية وشروط الاستخدام'
+
+@pytest.fixture
+def tm(tmp_path, monkeypatch):
+    """ذاكرة ترجمة مؤقتة فيها ترجمة SOURCE إلى الإنجليزية"""
+    memory = TranslationMemory(str(tmp_path / 'memory.sqlite'))
+    memory.put(SOURCE, 'ar', 'en', translate_texts.MODEL, translate_texts.PROMPT_VERSION, TRANSLATION)
+    monkeypatch.setattr(translate_texts, 'memory', memory)
+    monkeypatch.setattr(translate_texts, 'FUZZY_REUSE_THRESHOLD', 1.0)
+    monkeypatch.setattr(translate_texts, 'FUZZY_REFERENCE_THRESHOLD', 0.7)
+    yield memory
+    memory.close()
+
+# ============================================
+# البحث التقريبي
+# ============================================
+
+def test_similar_ignores_tashkeel_and_punctuation(tm):
+    """التشكيل والترقيم لا يغيران التشابه"""
+    score, source, translation = tm.similar(
+        SAME_WITH_TASHKEEL, 'ar', 'en', translate_texts.MODEL, translate_texts.PROMPT_VERSION,
+    )
+    assert score == 1.0
+    assert (source, translation) == (SOURCE, TRANSLATION)
+
+def test_similar_is_per_language_pair_and_model(tm):
+    """لا تطابق بين أزواج لغات أو نماذج أو نسخ طلب مختلفة"""
+    assert tm.similar(NEAR, 'ar', 'fr', translate_texts.MODEL, translate_texts.PROMPT_VERSION) is None
+    assert tm.similar(NEAR, 'ar', 'en', 'other-model', translate_texts.PROMPT_VERSION) is None
+    assert tm.similar(NEAR, 'ar', 'en', translate_texts.MODEL, translate_texts.PROMPT_VERSION + 1) is None
+
+# ============================================
+# الحدود في translate_texts.py
+# ============================================
+
+def test_reuse_at_threshold(tm):
+    """نص لا يختلف إلا في التشكيل يُعاد استخدام ترجمته، والشبيه فقط لا يُعاد"""
+    assert translate_texts.recall_translation(SAME_WITH_TASHKEEL, 'ar', 'en') == TRANSLATION
+    assert translate_texts.recall_translation(NEAR, 'ar', 'en') is None
+    assert tm.stats()['fuzzy']['reused'] == 1
+
+def test_lower_reuse_threshold(tm, monkeypatch):
+    """خفض FUZZY_REUSE_THRESHOLD يعيد استخدام ترجمة النص الشبيه"""
+    monkeypatch.setattr(translate_texts, 'FUZZY_REUSE_THRESHOLD', 0.9)
+    assert translate_texts.recall_translation(NEAR, 'ar', 'en') == TRANSLATION
+
+def test_reuse_disabled(tm, monkeypatch):
+    """FUZZY_REUSE_THRESHOLD = None: التطابق التام فقط"""
+    monkeypatch.setattr(translate_texts, 'FUZZY_REUSE_THRESHOLD', None)
+    assert translate_texts.recall_translation(SAME_WITH_TASHKEEL, 'ar', 'en') is None
+    assert translate_texts.recall_translation(SOURCE, 'ar', 'en') == TRANSLATION
+
+def test_reference_threshold(tm, monkeypatch):
+    """النص الشبيه يُرسل مع ترجمته كمرجع، وغير الشبيه أو ما تحت الحد لا"""
+    assert translate_texts.find_reference(NEAR, 'ar', 'en') == (SOURCE, TRANSLATION)
+    assert translate_texts.find_reference(UNRELATED, 'ar', 'en') is None
+
+    monkeypatch.setattr(translate_texts, 'FUZZY_REFERENCE_THRESHOLD', 0.95)
+    assert translate_texts.find_reference(NEAR, 'ar', 'en') is None
+
+    fuzzy = tm.stats()['fuzzy']
+    assert fuzzy['referenced'] == 1
+    assert fuzzy['unmatched'] == 2
+
+def test_reference_in_prompt(tm):
+    """المرجع يظهر في نص الطلب"""
+    prompt = translate_texts.build_prompt(NEAR, 'ar', 'en', translate_texts.find_reference(NEAR, 'ar', 'en'))
+    assert SOURCE in prompt and TRANSLATION in prompt
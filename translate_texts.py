@@ -3,10 +3,25 @@
 سكريبت ترجمة النصوص المستخرجة باستخدام Claude API
 """
 
+import argparse
+import asyncio
 import json
 import os
+import random
+import threading
 import time
-from anthropic import Anthropic
+import unicodedata
+
+from extract_texts import classify_text
+from split_translations import (
+    OUTPUT_DIR, add_output_arguments, js_key, js_string, output_options, write_output,
+)
+from translation_backends import BACKENDS, DEFAULT_BACKEND, BackendError, create_backend
+from translation_memory import (
+    MEMORY_FILE, TranslationMemory, minhash_bands, print_memory_stats, similarity,
+)
+from translation_store import TranslationStore, json_default
+from telemetry import BATCH_TARGET, FLUSH_EVERY, Telemetry, print_telemetry_summary
 
 # ============================================
 # الإعدادات
@@ -14,170 +29,1647 @@ from anthropic import Anthropic
 
 INPUT_FILE = "translations_extracted.json"
 OUTPUT_FILE = "translations_final.json"
+# الملف المجمّع القديم (اختياري: --jsx)
+JSX_FILE = "translations_GENERATED.jsx"
+
+# سجل الترجمات المكتملة (يُلحق به كل ترجمة فور انتهائها)
+JOURNAL_FILE = "translations_final.journal.jsonl"
+# عدد السجلات قبل كتابة نسخة كاملة وتفريغ السجل
+COMPACT_EVERY = 200
+
+# تحميل البيانات في المخزن المضغوط (translation_store.py) بدلاً من القواميس المتداخلة
+# (ذاكرة أقل بنحو 40%: ~90 MB بدلاً من ~150 MB مع 200 ألف نص)
+COMPACT_STORE = True
+
+# ملف إحصائيات صغير يُحدَّث مع كل نسخة (يقرؤه check_progress.py فوراً)
+STATS_FILE = "translations_final.stats.json"
+
+# قياسات الطلبات: تقرير JSON + ملف Prometheus (textfile collector)
+TELEMETRY_FILE = "translations_final.telemetry.json"
+PROMETHEUS_FILE = "translations_final.prom"
+
+# النموذج المستخدم
+MODEL = "claude-sonnet-4-20250514"
+MAX_TOKENS = 1000
+
+# الأسعار بالدولار لكل مليون توكن (Claude Sonnet 4)
+PRICE_INPUT_PER_MTOK = 3.0
+PRICE_OUTPUT_PER_MTOK = 15.0
+# كتابة الكاش 1.25× سعر المدخلات، والقراءة منه 0.1×
+PRICE_CACHE_WRITE_PER_MTOK = 3.75
+PRICE_CACHE_READ_PER_MTOK = 0.30
+
+# نسخة صيغة الطلب: غيّرها عند تعديل التعليمات لتجاهل الترجمات القديمة في الذاكرة
+# 2: التعليمات والمصطلحات في system prompt مع prompt caching
+PROMPT_VERSION = 2
+
+# تخزين التعليمات الثابتة (system prompt) في كاش الـ API
+# (أقل من 1024 توكن لا يُخزَّن في Sonnet، لذلك تُرسل مع قاموس المصطلحات)
+PROMPT_CACHING = True
+
+# ذاكرة الترجمة (None لتعطيلها)
+TRANSLATION_MEMORY_FILE = MEMORY_FILE
+
+# البحث التقريبي في الذاكرة (التشابه بعد حذف التشكيل والترقيم، 1.0 = متطابقان)
+# إعادة استخدام الترجمة مباشرة بدون طلب (None لتعطيله)
+FUZZY_REUSE_THRESHOLD = 1.0
+# إرسال ترجمة النص المشابه كمرجع مع الطلب (None لتعطيله)
+FUZZY_REFERENCE_THRESHOLD = 0.7
+
+# التوازي وحدود المعدل (بدلاً من time.sleep الثابت)
+# عدد الطلبات المتزامنة
+MAX_CONCURRENCY = 8
+# حد الطلبات في الدقيقة
+REQUESTS_PER_MINUTE = 50
+# حد التوكنات في الدقيقة (مدخلات + مخرجات تقديرياً)
+TOKENS_PER_MINUTE = 40000
+
+# ميزانية كل تشغيل (None = بدون حد): يُرسل الأهم أولاً حتى تنفد
+# (--budget-usd / --budget-tokens، و --dry-run لعرض الخطة بدون إرسال)
+BUDGET_USD = 1.0
+BUDGET_TOKENS = None
+
+# الأولويات: مجموع أولوية الفئة + الصفحة (source_file) + اللغة، الأعلى يُترجم أولاً
+# الفئات والصفحات غير المذكورة أولويتها 0
+CATEGORY_PRIORITY = {
+    'home': 100,
+    'common': 80,
+    'auth': 70,
+    'search': 60,
+    'contact': 50,
+    'learn_islam': 40,
+    'repentance': 40,
+    'fatwa': 30,
+    'courses': 30,
+    'reconciliation': 20,
+    'profile': 10,
+}
+# مثال: {'Home': 50, 'Donate': 40}
+PAGE_PRIORITY = {}
+LANG_PRIORITY = {
+    'ar': 30,
+    'en': 30,
+    'fr': 20,
+    'zh': 10,
+}
+
+# الوضع المجمّع: عدة نصوص وعدة لغات في طلب واحد
+# الحد الأقصى للنصوص في الطلب الواحد
+BATCH_MAX_ITEMS = 25
+# max_tokens للطلب المجمّع (يُحزم الطلب ليبقى تحته)
+BATCH_MAX_TOKENS = 4096
+
+# إعادة المحاولة عند الأخطاء المؤقتة (429 / 529 / 5xx / انقطاع الاتصال)
+MAX_RETRIES = 5
+# التأخير الأساسي والأقصى بالثواني (يتضاعف مع كل محاولة + عشوائية)
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+# النصوص التي فشلت بعد كل المحاولات (تبقى معلقة وتُعاد في التشغيل التالي)
+DEAD_LETTER_FILE = "translations_final.failed.json"
+
+# Message Batches API (--batch-api): نصف السعر مقابل نتائج خلال ساعات بدل ثوانٍ
+# أرقام الدفعات المرسلة (لمتابعتها بعد إعادة التشغيل)
+BATCHES_FILE = "translations_final.batches.json"
+# الحد الأقصى للطلبات في الدفعة الواحدة
+BATCH_API_MAX_REQUESTS = 10000
+# فترة فحص حالة الدفعة بالثواني (تتضاعف حتى الحد الأقصى)
+BATCH_POLL_MIN = 10
+BATCH_POLL_MAX = 300
+# نسبة السعر مقارنة بالطلبات العادية
+BATCH_API_DISCOUNT = 0.5
+
+# أنواع النصوص (kind من extract_texts.py) التي تُنسخ كما هي لكل اللغات بدون ترجمة
+# (الآيات القرآنية تبقى بلغتها الأصلية فقط)
+COPY_KINDS = {'numeric', 'brand', 'acronym', 'native_name', 'already_target'}
 
 # Claude API
 # ضع API Key الخاص بك هنا أو في متغير بيئة
 API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 
-if not API_KEY:
-    print("❌ خطأ: يجب تعيين ANTHROPIC_API_KEY")
-    print("   قم بتشغيل: export ANTHROPIC_API_KEY='your-key-here'")
-    exit(1)
+# مزوّد الترجمة (انظر translation_backends.py)
+BACKEND = DEFAULT_BACKEND
+# عنوان بديل لـ Messages API، مثلاً خادم الاختبار المحلي:
+# python fake_anthropic_server.py ثم BASE_URL = "http://127.0.0.1:8765"
+BASE_URL = None
+
+LANG_NAMES = {
+    'ar': 'Arabic',
+    'en': 'English',
+    'fr': 'French',
+    'zh': 'Simplified Chinese'
+}
 
-client = Anthropic(api_key=API_KEY)
+# اللغات المستهدفة حسب اللغة المصدر
+TARGET_LANGS = {
+    'ar': ['en', 'fr', 'zh'],
+    'en': ['ar', 'fr', 'zh'],
+}
 
 # ============================================
-# دوال الترجمة
+# ذاكرة الترجمة
 # ============================================
 
-def is_quranic_verse(text):
-    """فحص إذا كان النص آية قرآنية"""
-    # كلمات قرآنية مميزة
-    quranic_indicators = [
-        'قُلْ', 'إِنَّ', 'وَ', 'الَّذِينَ', 'يَا عِبَادِيَ',
-        'لَا تَقْنَطُوا', 'رَّحْمَةِ', 'اللَّهِ', 'يُحِبُّ',
-        'التَّوَّابِينَ', 'الْمُتَطَهِّرِينَ'
-    ]
+memory = None
+
+def get_memory():
+    """فتح ذاكرة الترجمة عند أول استخدام"""
+    global memory
+    if memory is None and TRANSLATION_MEMORY_FILE:
+        memory = TranslationMemory(TRANSLATION_MEMORY_FILE)
+    return memory
+
+def recall_translation(text, source_lang, target_lang, repeat=False):
+    """البحث عن ترجمة سابقة لنفس النص، أو لنص شبه مطابق (FUZZY_REUSE_THRESHOLD)
     
-    # فحص التشكيل الكثيف (الآيات تحتوي تشكيل كامل)
-    tashkeel_count = sum(1 for char in text if char in 'ًٌٍَُِّْ')
-    text_length = len(text)
+    repeat: النص بُحث عنه في build_jobs (لا يُحسب الإخفاق مرتين في الإحصائيات)
+    """
+    tm = get_memory()
+    if tm is None:
+        return None
+    cached = tm.get(text, source_lang, target_lang, MODEL, PROMPT_VERSION, repeat)
+    if cached is None and FUZZY_REUSE_THRESHOLD is not None:
+        match = tm.similar(text, source_lang, target_lang, MODEL, PROMPT_VERSION)
+        if match is not None and match[0] >= FUZZY_REUSE_THRESHOLD:
+            tm.record_match('reused', match[0])
+            cached = match[2]
+    if cached is not None:
+        telemetry.record_translation(source_lang, target_lang, cached=True)
+    return cached
+
+def find_reference(text, source_lang, target_lang):
+    """ترجمة نص مشابه لإرسالها كمرجع مع الطلب: (النص، الترجمة) أو None"""
+    tm = get_memory()
+    if tm is None or FUZZY_REFERENCE_THRESHOLD is None:
+        return None
+    match = tm.similar(text, source_lang, target_lang, MODEL, PROMPT_VERSION)
+    score = match[0] if match is not None else 0.0
+    if score >= FUZZY_REFERENCE_THRESHOLD:
+        tm.record_match('referenced', score)
+        return match[1], match[2]
+    tm.record_match('unmatched', score)
+    return None
+
+def job_references(job):
+    """مراجع نص عمل لكل لغة (تُحسب مرة واحدة حتى عند إعادة المحاولة أو تقسيم الدفعة)"""
+    if 'references' not in job:
+        job['references'] = {}
+        for lang in job['targets']:
+            reference = find_reference(job['text'], job['source_lang'], lang)
+            if reference is not None:
+                job['references'][lang] = {'source': reference[0], 'translation': reference[1]}
+    return job['references']
+
+def remember_translation(text, source_lang, target_lang, translation):
+    """حفظ ترجمة جديدة في الذاكرة"""
+    tm = get_memory()
+    if tm is not None:
+        tm.put(text, source_lang, target_lang, MODEL, PROMPT_VERSION, translation)
+
+# ============================================
+# مزوّد الترجمة
+# ============================================
+
+# يُنشأ عند أول طلب (الاستيراد لا يحتاج مفتاحاً ولا اتصالاً)
+backend = None
+
+def get_backend():
+    """إنشاء مزوّد الترجمة عند أول استخدام"""
+    global backend
+    if backend is None:
+        # إعادة المحاولة هنا وليس في الـ SDK (لنحترم retry-after ونخفض التوازي)
+        backend = create_backend(BACKEND, model=MODEL, api_key=API_KEY, base_url=BASE_URL,
+                                 max_retries=0)
+    return backend
+
+# قياسات الطلبات لكل زوج لغات
+telemetry = Telemetry(TELEMETRY_FILE, PROMETHEUS_FILE)
+
+async def request_translation_async(prompt, max_tokens, source_lang, target_lang):
+    """طلب غير متزامن مع قياس الزمن والتوكنات"""
+    start = time.perf_counter()
+    try:
+        response = await get_backend().complete_async(prompt, max_tokens, SYSTEM_PROMPT, PROMPT_CACHING)
+    except Exception:
+        telemetry.observe_request(source_lang, target_lang, time.perf_counter() - start)
+        raise
+    telemetry.observe_request(source_lang, target_lang, time.perf_counter() - start, response)
+    record_usage(response)
+    return response
+
+async def flush_telemetry_periodically(interval=FLUSH_EVERY):
+    """كتابة القياسات على فترات أثناء التشغيل"""
+    while True:
+        await asyncio.sleep(interval)
+        telemetry.flush()
+
+def flush_telemetry_in_thread(stop, interval=FLUSH_EVERY):
+    """كتابة القياسات على فترات من خيط منفصل حتى stop (للمسار المتزامن: Message Batches)"""
+    while not stop.wait(interval):
+        telemetry.flush()
+
+def call_with_retries(operation):
+    """استدعاء متزامن مع إعادة المحاولة عند الأخطاء المؤقتة"""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return operation()
+        except BackendError as e:
+            if not is_retryable(e) or attempt == MAX_RETRIES:
+                raise
+            delay = retry_delay(attempt, e.retry_after)
+            print(f"   🔁 {describe_error(e)}: إعادة المحاولة بعد {delay:.1f} ثانية ({attempt + 1}/{MAX_RETRIES})")
+            time.sleep(delay)
+
+async def request_with_retries_async(prompt, max_tokens, source_lang, target_lang, cost,
+                                     limiter, concurrency):
+    """طلب غير متزامن مع حدود المعدل وإعادة المحاولة وخفض التوازي عند الضغط الزائد"""
+    for attempt in range(MAX_RETRIES + 1):
+        async with concurrency:
+            await limiter.acquire(cost)
+            # الفحص قبل الإرسال مباشرة: الطلبات المنتظرة لا تتجاوز ما أُنفق فعلاً
+            if budget_exhausted():
+                run_stats['budget_reached'] = True
+                run_stats['budget_stopped'] += 1
+                raise BudgetExhausted()
+            started = time.monotonic()
+            try:
+                response = await request_translation_async(prompt, max_tokens, source_lang, target_lang)
+            except BackendError as e:
+                error = e
+            else:
+                concurrency.on_success()
+                return response
+        
+        # الانتظار خارج الخانة حتى تستمر الطلبات الأخرى
+        if not is_retryable(error) or attempt == MAX_RETRIES:
+            raise error
+        if error.status in OVERLOAD_STATUSES:
+            concurrency.on_overload(started)
+        delay = retry_delay(attempt, error.retry_after)
+        if error.retry_after:
+            # الخادم طلب التوقف: كل الطلبات تنتظر وليس هذا الطلب فقط
+            limiter.pause(delay)
+        telemetry.record_retry(source_lang, target_lang)
+        print(f"   🔁 {describe_error(error)}: إعادة المحاولة بعد {delay:.1f} ثانية ({attempt + 1}/{MAX_RETRIES})")
+        await asyncio.sleep(delay)
+
+# ============================================
+# الحفظ الآمن والاستئناف
+# ============================================
+
+def save_json_atomic(data, path):
+    """حفظ JSON في ملف مؤقت ثم استبداله دفعة واحدة"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=json_default)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class TranslationJournal:
+    """سجل إلحاقي للترجمات المكتملة مع نسخ كاملة دورية"""
+
+    def __init__(self, data, path=JOURNAL_FILE, snapshot_file=OUTPUT_FILE,
+                 compact_every=COMPACT_EVERY):
+        self.data = data
+        self.path = path
+        self.snapshot_file = snapshot_file
+        self.compact_every = compact_every
+        self.records = 0
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def record(self, category_name, key, item, partial=False):
+        """تسجيل عنصر فوراً على القرص
+        
+        partial: عنصر لم تكتمل لغاته بعد؛ يُسجل حتى لا تضيع لغاته المدفوعة عند الانقطاع،
+        ولا يُحسب في compact_every (العنصر يُسجل مرة أخرى عند اكتماله)
+        """
+        entry = {'category': category_name, 'key': key, 'item': item}
+        self.file.write(json.dumps(entry, ensure_ascii=False, default=json_default) + '\n')
+        self.file.flush()
+        if partial:
+            return
+        self.records += 1
+        
+        if self.records >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """كتابة نسخة كاملة ثم تفريغ السجل"""
+        save_json_atomic(self.data, self.snapshot_file)
+        save_stats(self.data)
+        self.file.close()
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.records = 0
+
+    def close(self):
+        """نسخة أخيرة وحذف السجل"""
+        self.compact()
+        self.file.close()
+        os.remove(self.path)
+
+def replay_journal(data, path=JOURNAL_FILE):
+    """تطبيق السجل فوق البيانات وإرجاع عدد العناصر المستعادة"""
+    if not os.path.exists(path):
+        return 0
+    
+    restored = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # سطر مقطوع عند الانقطاع
+                continue
+            data.setdefault(entry['category'], {})[entry['key']] = entry['item']
+            restored += 1
+    
+    return restored
+
+def read_translations(path):
+    """قراءة ملف ترجمات كمخزن مضغوط أو قواميس عادية حسب COMPACT_STORE"""
+    if COMPACT_STORE:
+        return TranslationStore.load(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def merge_extracted(data, extracted):
+    """إضافة النصوص المستخرجة الجديدة وحذف ما لم يعد موجوداً
     
-    # إذا كان أكثر من 30% من النص تشكيل → غالباً آية
-    if text_length > 0 and (tashkeel_count / text_length) > 0.3:
-        return True
+    يرجع (الفئة، المفتاح) لكل نص مضاف، وعدد المحذوف، والفئات المتغيرة
+    """
+    added = []
+    retired = 0
+    changed = set()
     
-    # إذا كان يحتوي كلمات قرآنية مميزة
-    for indicator in quranic_indicators:
-        if indicator in text:
-            return True
+    for category_name, category_data in extracted.items():
+        target = data.setdefault(category_name, {})
+        for key, item in category_data.items():
+            if key not in target:
+                # نسخة: الترجمة لا تعدّل ناتج الاستخراج (وضع المراقبة يحتفظ به في الذاكرة)
+                target[key] = dict(item)
+                added.append((category_name, key))
+                changed.add(category_name)
+            elif 'kind' in item:
+                # التصنيف من آخر استخراج
+                target[key]['kind'] = item['kind']
+                target[key]['skip_reason'] = item['skip_reason']
     
-    return False
+    for category_name in list(data):
+        current = extracted.get(category_name, {})
+        for key in [key for key in data[category_name] if key not in current]:
+            del data[category_name][key]
+            retired += 1
+            changed.add(category_name)
+        if not data[category_name]:
+            del data[category_name]
+    
+    return added, retired, changed
 
-def translate_text(text, source_lang, target_lang):
-    """ترجمة نص واحد باستخدام Claude"""
+def load_data(input_file=INPUT_FILE, output_file=OUTPUT_FILE, journal_file=JOURNAL_FILE):
+    """قراءة آخر نتائج محفوظة + النصوص الجديدة + السجل"""
+    extracted = read_translations(input_file)
     
-    # تحديد اللغة المصدر
-    lang_names = {
-        'ar': 'Arabic',
-        'en': 'English',
-        'fr': 'French',
-        'zh': 'Simplified Chinese'
+    if not os.path.exists(output_file):
+        data = extracted
+    else:
+        data = read_translations(output_file)
+        
+        added, retired, _ = merge_extracted(data, extracted)
+        print(f"🔁 استئناف من {output_file} (+{len(added)} نص جديد، -{retired} نص محذوف)")
+    
+    restored = replay_journal(data, journal_file)
+    if restored:
+        print(f"🔁 تمت استعادة {restored} ترجمة من السجل {journal_file}")
+    
+    return data
+
+journal = None
+
+# ============================================
+# الإحصائيات
+# ============================================
+
+# عدادات التشغيل الحالي
+run_stats = {
+    # كل العناصر المكتملة (مع المتخطى والمستعاد من الذاكرة)
+    'items': 0,
+    # العناصر التي اكتملت بترجمة من الـ API فقط: أساس السرعة والوقت المتبقي
+    'translated': 0,
+    # مدة مراحل الترجمة فقط (بدون الاستخراج والتحميل والتخطيط وانتظار وضع المراقبة)
+    'translate_seconds': 0.0,
+    'translate_started': None,
+    'input_tokens': 0,
+    'output_tokens': 0,
+    'cache_write_tokens': 0,
+    'cache_read_tokens': 0,
+    'budget_usd': None,
+    'budget_tokens': None,
+    'budget_reached': False,
+    # طلبات لم تُرسل لأن الإنفاق الفعلي بلغ الميزانية
+    'budget_stopped': 0,
+}
+
+# حد الإنفاق الفعلي للترجمة الجارية (انظر set_spend_limit)، None = بدون حد
+spend_limit = {'tokens': None, 'usd': None}
+
+class BudgetExhausted(Exception):
+    """الإنفاق الفعلي بلغ الميزانية: الطلب لم يُرسل ويبقى النص معلقاً"""
+
+def record_usage(response):
+    """إضافة توكنات رد واحد إلى عدادات التشغيل"""
+    run_stats['input_tokens'] += response.get('input_tokens', 0)
+    run_stats['output_tokens'] += response.get('output_tokens', 0)
+    run_stats['cache_write_tokens'] += response.get('cache_write_tokens', 0)
+    run_stats['cache_read_tokens'] += response.get('cache_read_tokens', 0)
+
+def token_cost(input_tokens, output_tokens, cache_write_tokens=0, cache_read_tokens=0):
+    """التكلفة بالدولار (input_tokens بدون توكنات الكاش)"""
+    return (input_tokens * PRICE_INPUT_PER_MTOK + output_tokens * PRICE_OUTPUT_PER_MTOK +
+            cache_write_tokens * PRICE_CACHE_WRITE_PER_MTOK +
+            cache_read_tokens * PRICE_CACHE_READ_PER_MTOK) / 1_000_000
+
+def run_spend():
+    """التوكنات والتكلفة الفعلية لكل الطلبات في هذا التشغيل"""
+    tokens = (run_stats['input_tokens'] + run_stats['output_tokens'] +
+              run_stats['cache_write_tokens'] + run_stats['cache_read_tokens'])
+    cost = token_cost(run_stats['input_tokens'], run_stats['output_tokens'],
+                      run_stats['cache_write_tokens'], run_stats['cache_read_tokens'])
+    return tokens, cost
+
+def set_spend_limit(budget_tokens=None, budget_usd=None):
+    """ميزانية الإنفاق الفعلي ابتداءً من الآن (وضع المراقبة يترجم عدة مرات في نفس التشغيل)"""
+    tokens, cost = run_spend()
+    spend_limit['tokens'] = tokens + budget_tokens if budget_tokens else None
+    spend_limit['usd'] = cost + budget_usd if budget_usd else None
+    run_stats['budget_stopped'] = 0
+
+def budget_exhausted():
+    """هل بلغ الإنفاق الفعلي حد الميزانية؟"""
+    tokens, cost = run_spend()
+    return ((spend_limit['tokens'] is not None and tokens >= spend_limit['tokens']) or
+            (spend_limit['usd'] is not None and cost >= spend_limit['usd']))
+
+def start_translation_timer():
+    """بداية مرحلة الترجمة (الإرسال والانتظار)"""
+    run_stats['translate_started'] = time.perf_counter()
+
+def stop_translation_timer():
+    """نهاية مرحلة الترجمة: إضافة مدتها إلى المجموع"""
+    if run_stats['translate_started'] is not None:
+        run_stats['translate_seconds'] += time.perf_counter() - run_stats['translate_started']
+        run_stats['translate_started'] = None
+
+def translation_seconds():
+    """مدة مراحل الترجمة حتى الآن (مع المرحلة الجارية)"""
+    seconds = run_stats['translate_seconds']
+    if run_stats['translate_started'] is not None:
+        seconds += time.perf_counter() - run_stats['translate_started']
+    return seconds
+
+def reset_run_counters():
+    """تصفير العناصر والمدة لدورة جديدة (وضع المراقبة)؛ التوكنات تبقى لمجاميع التكلفة"""
+    run_stats['items'] = 0
+    run_stats['translated'] = 0
+    run_stats['translate_seconds'] = 0.0
+    run_stats['translate_started'] = None
+
+def load_previous_stats(stats_file=STATS_FILE):
+    """الإحصائيات التراكمية من التشغيلات السابقة"""
+    if not os.path.exists(stats_file):
+        return {}
+    try:
+        with open(stats_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def compute_progress(data):
+    """عدّ النصوص حسب الفئة واللغة"""
+    categories = {}
+    languages = {lang: {'filled': 0, 'missing': 0} for lang in LANG_NAMES}
+    
+    for category_name, category_data in data.items():
+        pending = sum(1 for item in category_data.values() if item.get('needs_translation', True))
+        categories[category_name] = {'total': len(category_data), 'pending': pending}
+        for item in category_data.values():
+            for lang, counts in languages.items():
+                counts['filled' if item.get(lang) else 'missing'] += 1
+    
+    total = sum(c['total'] for c in categories.values())
+    pending = sum(c['pending'] for c in categories.values())
+    return {
+        'total': total,
+        'completed': total - pending,
+        'pending': pending,
+        'categories': categories,
+        'languages': languages,
     }
+
+def save_stats(data, stats_file=STATS_FILE):
+    """كتابة ملف الإحصائيات (تقدم + توكنات + تكلفة + سرعة القياس)"""
+    previous = run_stats.setdefault('previous', load_previous_stats(stats_file).get('totals', {}))
+    elapsed = translation_seconds()
+    
+    totals = {
+        name: previous.get(name, 0) + run_stats[name]
+        for name in ('input_tokens', 'output_tokens', 'cache_write_tokens', 'cache_read_tokens')
+    }
+    totals['cost_usd'] = round(token_cost(**totals), 4)
+    
+    stats = compute_progress(data)
+    stats.update({
+        'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'totals': totals,
+        'run': {
+            'items': run_stats['items'],
+            'translated': run_stats['translated'],
+            'seconds': round(elapsed, 1),
+            'items_per_second': round(run_stats['translated'] / elapsed, 3) if elapsed > 0 else 0,
+            'input_tokens': run_stats['input_tokens'],
+            'output_tokens': run_stats['output_tokens'],
+            'cache_write_tokens': run_stats['cache_write_tokens'],
+            'cache_read_tokens': run_stats['cache_read_tokens'],
+            'budget_usd': run_stats['budget_usd'],
+            'budget_tokens': run_stats['budget_tokens'],
+            'budget_reached': run_stats['budget_reached'],
+        },
+    })
     
-    prompt = f"""Translate the following {lang_names.get(source_lang, 'text')} to {lang_names[target_lang]}.
+    save_json_atomic(stats, stats_file)
+
+def mark_done(category_name, key, item, translated=False):
+    """تعليم عنصر كمكتمل وتسجيله في السجل (translated: اكتمل بترجمة من الـ API)"""
+    item['needs_translation'] = False
+    run_stats['items'] += 1
+    if translated:
+        run_stats['translated'] += 1
+    if journal is not None:
+        journal.record(category_name, key, item)
+
+def record_partial(category_name, key, item):
+    """تسجيل لغات عنصر لم يكتمل بعد في السجل"""
+    if journal is not None:
+        journal.record(category_name, key, item, partial=True)
+
+# النصوص التي فشلت ترجمتها في هذا التشغيل
+dead_letters = []
+
+def record_dead_letter(job, missing, error, reason='retries'):
+    """تسجيل نص فشلت ترجمته (يبقى معلقاً)
+    
+    reason: 'retries' بعد استنفاد إعادة المحاولة، أو 'batch' خطأ داخل Message Batch (بدون إعادة محاولة)
+    """
+    dead_letters.append({
+        'keys': [f"{category_name}.{key}" for category_name, key, _ in job['members']],
+        'source_lang': job['source_lang'],
+        'text': job['text'],
+        'missing': missing,
+        'reason': reason,
+        'error': str(error) if error else "",
+    })
+
+def save_dead_letters(path=DEAD_LETTER_FILE):
+    """كتابة قائمة الفشل (أو حذف القائمة القديمة إذا لم يفشل شيء)"""
+    if dead_letters:
+        save_json_atomic(dead_letters, path)
+        retried = sum(1 for entry in dead_letters if entry['reason'] == 'retries')
+        in_batch = len(dead_letters) - retried
+        if retried:
+            print(f"\n⚠️  فشلت ترجمة {retried} نص بعد {MAX_RETRIES} محاولات، بقيت معلقة")
+        if in_batch:
+            print(f"\n⚠️  فشلت ترجمة {in_batch} نص داخل Message Batch (بدون إعادة محاولة)، بقيت معلقة")
+        print(f"   التفاصيل في: {path} — شغّل السكريبت مرة أخرى لإعادة المحاولة")
+    elif os.path.exists(path):
+        os.remove(path)
+
+# ============================================
+# محدد المعدل (Token Bucket)
+# ============================================
+
+class TokenBucket:
+    """دلو توكنات يمتلئ بمعدل ثابت في الدقيقة"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """الوقت اللازم حتى يتوفر المقدار المطلوب"""
+        self._refill()
+        # طلب أكبر من سعة الدلو ينتظر امتلاءه فقط
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """حد للطلبات في الدقيقة وللتوكنات في الدقيقة معاً"""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE,
+                 tokens_per_minute=TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.resume_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """إيقاف كل الطلبات مؤقتاً (retry-after من الخادم)"""
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
 
-Important guidelines:
+    async def acquire(self, tokens):
+        """انتظار حتى يسمح الدلوان بطلب بحجم tokens"""
+        async with self._lock:
+            while True:
+                delay = max(self.resume_at - time.monotonic(),
+                            self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+
+
+class AdaptiveConcurrency:
+    """حد توازي متكيف (AIMD): يزيد ببطء مع كل نجاح وينخفض للنصف عند الضغط الزائد"""
+
+    def __init__(self, maximum=MAX_CONCURRENCY, minimum=1):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self.decreased_at = 0.0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        """زيادة جمعية: +1 بعد كل نافذة كاملة من الطلبات الناجحة"""
+        if self.limit < self.maximum:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_overload(self, started):
+        """خفض للنصف، مرة واحدة لكل الطلبات التي بدأت قبل آخر خفض"""
+        if started < self.decreased_at or self.limit <= self.minimum:
+            return
+        self.decreased_at = time.monotonic()
+        previous = int(self.limit)
+        self.limit = max(self.minimum, self.limit / 2)
+        if int(self.limit) < previous:
+            print(f"   📉 ضغط زائد على الخادم: خفض التوازي إلى {int(self.limit)}")
+
+# رموز HTTP المؤقتة التي تستحق إعادة المحاولة
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+# رموز الضغط الزائد التي تخفض التوازي
+OVERLOAD_STATUSES = {429, 529}
+
+def is_retryable(error):
+    """هل الخطأ مؤقت (بدون رمز = انقطاع اتصال)"""
+    return isinstance(error, BackendError) and (error.status is None or error.status in RETRYABLE_STATUSES)
+
+def retry_delay(attempt, retry_after=None):
+    """الانتظار قبل المحاولة التالية: retry-after من الخادم، أو تضاعف أسي مع عشوائية"""
+    if retry_after:
+        return retry_after + random.uniform(0, RETRY_BASE_DELAY)
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+    # نصف ثابت + نصف عشوائي حتى لا تعود كل الطلبات الفاشلة معاً
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def describe_error(error):
+    """وصف قصير للخطأ في الرسائل"""
+    status = getattr(error, 'status', None)
+    return f"HTTP {status}" if status else "انقطاع الاتصال"
+
+def estimate_tokens(text):
+    """تقدير تقريبي لعدد التوكنات في نص"""
+    # العربية والصينية أكثف في التوكنات من الإنجليزية
+    return len(text) // 3 + 1
+
+# ============================================
+# دوال الترجمة
+# ============================================
+
+GUIDELINES = """Important guidelines:
 - Maintain Islamic terminology accurately
 - Keep the tone formal and respectful
-- For religious terms, use standard translations
-- Return ONLY the translation, no explanations
+- For religious terms, use standard translations"""
 
+# المصطلحات الإسلامية المعتمدة: (العربية، الإنجليزية، الفرنسية، الصينية)
+GLOSSARY = [
+    ('الله', 'Allah', 'Allah', '真主'),
+    ('النبي', 'the Prophet', 'le Prophète', '先知'),
+    ('الرسول', 'the Messenger', 'le Messager', '使者'),
+    ('صلى الله عليه وسلم', 'peace and blessings be upon him (ﷺ)', "que la prière d'Allah et Son salut soient sur lui (ﷺ)", '愿主福安之（ﷺ）'),
+    ('القرآن الكريم', 'the Noble Quran', 'le Noble Coran', '尊贵的古兰经'),
+    ('سورة', 'Surah', 'sourate', '章'),
+    ('آية', 'verse (ayah)', 'verset', '节（阿耶）'),
+    ('الحديث', 'Hadith', 'le hadith', '圣训'),
+    ('السنة', 'the Sunnah', 'la Sunna', '圣行'),
+    ('التفسير', 'exegesis (tafsir)', "l'exégèse (tafsîr)", '经注'),
+    ('الإسلام', 'Islam', "l'islam", '伊斯兰教'),
+    ('مسلم', 'Muslim', 'musulman', '穆斯林'),
+    ('الإيمان', 'faith (iman)', 'la foi (îmân)', '信仰（伊玛尼）'),
+    ('التوحيد', 'monotheism (tawhid)', "l'unicité divine (tawhîd)", '认主独一'),
+    ('الشرك', 'associating partners with Allah (shirk)', "l'association (shirk)", '以物配主'),
+    ('التوبة', 'repentance (tawbah)', 'le repentir (tawba)', '忏悔（讨白）'),
+    ('المغفرة', 'forgiveness', 'le pardon', '饶恕'),
+    ('الرحمة', 'mercy', 'la miséricorde', '慈悯'),
+    ('الصلاة', 'prayer (salah)', 'la prière (salât)', '礼拜'),
+    ('صلاة الجمعة', "Friday prayer (Jumu'ah)", 'la prière du vendredi', '主麻拜'),
+    ('الوضوء', "ablution (wudu')", "les ablutions (wudû')", '小净'),
+    ('الغسل', 'ritual bath (ghusl)', 'le grand lavage (ghusl)', '大净'),
+    ('القبلة', 'the Qiblah', 'la qibla', '朝向（格卜莱）'),
+    ('الصيام', 'fasting (sawm)', 'le jeûne (sawm)', '斋戒'),
+    ('رمضان', 'Ramadan', 'le Ramadan', '斋月'),
+    ('الزكاة', 'obligatory charity (zakat)', "l'aumône légale (zakât)", '天课'),
+    ('الصدقة', 'voluntary charity (sadaqah)', "l'aumône (sadaqa)", '施舍'),
+    ('الحج', 'pilgrimage (Hajj)', 'le pèlerinage (hajj)', '朝觐'),
+    ('العمرة', "Umrah", "la 'omra", '副朝'),
+    ('الكعبة', 'the Kaaba', 'la Kaaba', '克尔白'),
+    ('مكة المكرمة', 'Makkah', 'La Mecque', '麦加'),
+    ('المدينة المنورة', 'Madinah', 'Médine', '麦地那'),
+    ('المسجد', 'mosque', 'la mosquée', '清真寺'),
+    ('الإمام', 'imam', "l'imam", '伊玛目'),
+    ('عيد الفطر', 'Eid al-Fitr', "l'Aïd al-Fitr", '开斋节'),
+    ('عيد الأضحى', 'Eid al-Adha', "l'Aïd al-Adha", '宰牲节（古尔邦节）'),
+    ('الشريعة', 'Islamic law (Shariah)', 'la charia', '伊斯兰教法'),
+    ('الفقه', 'jurisprudence (fiqh)', 'le fiqh (jurisprudence)', '教法学'),
+    ('الفتوى', 'fatwa (religious ruling)', 'la fatwa (avis juridique)', '法特瓦（教法裁决）'),
+    ('العلماء', 'scholars', 'les savants', '学者（乌勒玛）'),
+    ('الدعوة', "da'wah (inviting to Islam)", "la da'wa (appel à l'islam)", '宣教'),
+    ('الذكر', 'remembrance of Allah (dhikr)', "l'évocation d'Allah (dhikr)", '记主'),
+    ('الدعاء', "supplication (du'a)", "l'invocation (du'â)", '祈祷（杜阿）'),
+    ('العبادة', "worship ('ibadah)", "l'adoration ('ibâda)", '功修'),
+    ('الجنة', 'Paradise (Jannah)', 'le Paradis', '乐园'),
+    ('النار', 'the Hellfire', "l'Enfer", '火狱'),
+    ('يوم القيامة', 'the Day of Resurrection', 'le Jour de la Résurrection', '复生日'),
+    ('الملائكة', 'the angels', 'les anges', '天使'),
+    ('الحسنات', 'good deeds', 'les bonnes actions', '善功'),
+    ('الذنوب', 'sins', 'les péchés', '罪过'),
+    ('الصلح', 'reconciliation', 'la réconciliation', '和解'),
+    ('بسم الله الرحمن الرحيم', 'In the name of Allah, the Most Gracious, the Most Merciful', "Au nom d'Allah, le Tout Miséricordieux, le Très Miséricordieux", '奉至仁至慈的真主之名'),
+    ('الحمد لله', 'All praise is due to Allah', "Louange à Allah", '一切赞颂全归真主'),
+    ('إن شاء الله', "God willing (in sha' Allah)", "si Allah le veut (in shâ' Allah)", '如果真主意欲'),
+    ('السلام عليكم', 'Peace be upon you', 'Que la paix soit sur vous', '愿你平安'),
+    ('جزاك الله خيرا', 'May Allah reward you with good', "Qu'Allah te récompense par le bien", '愿真主回赐你'),
+    ('الهجري', 'Hijri', 'hégirien', '伊斯兰历'),
+]
+
+def build_system_prompt():
+    """التعليمات الثابتة المشتركة بين كل الطلبات (تُخزَّن في كاش الـ API)"""
+    header = ' | '.join(LANG_NAMES[lang] for lang in ('ar', 'en', 'fr', 'zh'))
+    rows = '\n'.join(' | '.join(terms) for terms in GLOSSARY)
+    return f"""You are a professional translator for an Islamic educational website (repentance, fatwas, learning Islam, reconciliation).
+You translate user interface strings and short content between Arabic, English, French and Simplified Chinese.
+
+{GUIDELINES}
+- Use the glossary below for these terms; keep transliterations in parentheses where the glossary has them
+- Never translate or paraphrase Quranic verses; keep them exactly as written
+- Keep placeholders, numbers, URLs, HTML/JSX tags and punctuation such as {{name}} or %s unchanged
+- Keep the length close to the source: these strings appear in buttons, menus and headings
+- Use Modern Standard Arabic, formal French (vous) and Simplified Chinese characters
+- Do not add quotes, notes or alternatives around the translation
+
+Glossary ({header}):
+{rows}"""
+
+SYSTEM_PROMPT = build_system_prompt()
+
+def build_prompt(text, source_lang, target_lang, reference=None):
+    """بناء نص الطلب لترجمة نص واحد (reference: ترجمة نص مشابه من الذاكرة)"""
+    hint = ""
+    if reference is not None:
+        hint = f"""- A similar text was translated before; keep its wording and terminology where the meaning is the same, but translate the text below exactly:
+{reference[0]}
+=> {reference[1]}
+"""
+    return f"""Translate the following {LANG_NAMES.get(source_lang, 'text')} to {LANG_NAMES[target_lang]}.
+- Return ONLY the translation, no explanations
+{hint}
 Text to translate:
 {text}
 
 Translation:"""
 
+async def translate_text_async(text, source_lang, target_lang, limiter, concurrency):
+    """ترجمة نص واحد بشكل غير متزامن مع احترام حدود المعدل (يرفع الخطأ إذا فشلت كل المحاولات)"""
+
+    # build_jobs بحث في الذاكرة قبل الجدولة؛ بحث ثانٍ هنا لما تُرجم منذ ذلك الحين
+    # (نص شبه مطابق أو مكرر في نفس التشغيل)
+    cached = recall_translation(text, source_lang, target_lang, repeat=True)
+    if cached is not None:
+        return cached
+
+    prompt = build_prompt(text, source_lang, target_lang,
+                          find_reference(text, source_lang, target_lang))
+    # المدخلات + تقدير للمخرجات
+    cost = estimate_tokens(prompt) + estimate_tokens(text) * 2
+
+    response = await request_with_retries_async(
+        prompt, MAX_TOKENS, source_lang, target_lang, cost, limiter, concurrency,
+    )
+    translation = response['text'].strip()
+    if not translation:
+        raise BackendError("رد فارغ")
+    remember_translation(text, source_lang, target_lang, translation)
+    telemetry.record_translation(source_lang, target_lang)
+    return translation
+
+def apply_translation(job, lang, translation):
+    """كتابة ترجمة لغة واحدة في عناصر العمل وتسجيلها فوراً (قبل اكتمال بقية اللغات)"""
+    for category_name, key, item in job['members']:
+        if not item[lang]:
+            item[lang] = translation
+            record_partial(category_name, key, item)
+
+async def translate_job_language_async(job, lang, limiter, concurrency):
+    """ترجمة نص عمل إلى لغة واحدة وكتابتها في عناصره فور وصولها"""
+    translation = await translate_text_async(job['text'], job['source_lang'], lang, limiter, concurrency)
+    apply_translation(job, lang, translation)
+    return translation
+
+async def translate_languages_async(job, languages, limiter, concurrency):
+    """ترجمة نص عمل إلى عدة لغات بطلب لكل لغة: (الترجمات الناجحة، أول خطأ)"""
+    results = await asyncio.gather(*(
+        translate_job_language_async(job, lang, limiter, concurrency)
+        for lang in languages
+    ), return_exceptions=True)
+    
+    translations = {}
+    error = None
+    stopped = None
+    for lang, result in zip(languages, results):
+        if isinstance(result, BudgetExhausted):
+            stopped = result
+        elif isinstance(result, BaseException):
+            error = error or result
+            print(f"❌ خطأ في الترجمة ({lang}): {result}")
+        else:
+            translations[lang] = result
+    return translations, error or stopped
+
+def batch_entry(job):
+    """وصف نص واحد داخل الطلب المجمّع (بدون المراجع)"""
+    return {'id': job['id'], 'source': job['source_lang'], 'text': job['text'], 'targets': job['targets']}
+
+def build_batch_prompt(jobs):
+    """بناء طلب واحد لعدة نصوص وعدة لغات"""
+    entries = []
+    for job in jobs:
+        entry = batch_entry(job)
+        references = job_references(job)
+        if references:
+            entry['references'] = references
+        entries.append(entry)
+    codes = ', '.join(f"{code} = {name}" for code, name in LANG_NAMES.items())
+    hint = ""
+    if any('references' in entry for entry in entries):
+        hint = '- "references" are earlier translations of similar texts: keep their wording and terminology where the meaning is the same\n'
+    
+    return f"""Translate each entry of the JSON array below from its "source" language into every language listed in its "targets".
+Language codes: {codes}.
+- Return ONLY a JSON object mapping each entry "id" to an object of {{language code: translation}}, no explanations
+{hint}
+Entries:
+{json.dumps(entries, ensure_ascii=False, indent=1)}
+
+JSON:"""
+
+def estimate_output_tokens(job):
+    """تقدير توكنات المخرجات لنص مترجم لكل لغاته"""
+    # الترجمة قد تكون أطول من الأصل + مفاتيح JSON
+    return len(job['targets']) * (estimate_tokens(job['text']) * 2 + 8) + estimate_tokens(job['id'])
+
+def pack_batches(jobs, max_items=BATCH_MAX_ITEMS, max_tokens=BATCH_MAX_TOKENS):
+    """تحزيم الأعمال في طلبات حسب الحجم التقديري"""
+    batches = []
+    current = []
+    current_tokens = 0
+    
+    for job in jobs:
+        job_tokens = estimate_output_tokens(job)
+        if current and (len(current) >= max_items or current_tokens + job_tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(job)
+        current_tokens += job_tokens
+    
+    if current:
+        batches.append(current)
+    
+    return batches
+
+def parse_batch_response(text, jobs):
+    """قراءة رد JSON وإرجاع الترجمات الصالحة فقط، أو None عند فشل التحليل"""
+    start = text.find('{')
+    end = text.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    
     try:
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1000,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        translation = message.content[0].text.strip()
-        return translation
+        parsed = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
     
-    except Exception as e:
-        print(f"❌ خطأ في الترجمة: {e}")
-        return ""
+    if not isinstance(parsed, dict):
+        return None
+    
+    results = {}
+    for job in jobs:
+        translations = parsed.get(job['id'])
+        if not isinstance(translations, dict):
+            continue
+        if all(isinstance(translations.get(lang), str) and translations[lang].strip()
+               for lang in job['targets']):
+            results[job['id']] = {lang: translations[lang].strip() for lang in job['targets']}
+    
+    return results
 
-def translate_batch(data, max_translations=50):
-    """ترجمة مجموعة من النصوص"""
+def batch_source_lang(jobs):
+    """اللغة المصدر لطلب مجمّع (للقياسات)"""
+    languages = {job['source_lang'] for job in jobs}
+    return languages.pop() if len(languages) == 1 else BATCH_TARGET
+
+async def request_batch_async(jobs, limiter, concurrency):
+    """إرسال طلب مجمّع واحد وإرجاع الترجمات المحللة"""
+    prompt = build_batch_prompt(jobs)
+    cost = estimate_tokens(prompt) + sum(estimate_output_tokens(job) for job in jobs)
     
-    translated_count = 0
-    total_count = sum(
-        len(category) for category in data.values()
+    response = await request_with_retries_async(
+        prompt, BATCH_MAX_TOKENS, batch_source_lang(jobs), BATCH_TARGET, cost, limiter, concurrency,
     )
     
-    print(f"\n🌐 بدء الترجمة ({total_count} نص)...\n")
+    return parse_batch_response(response['text'], jobs)
+
+def apply_job_result(job, translations, error=None):
+    """كتابة ترجمات عمل في كل العناصر التي تشترك في نصه؛ إذا نقصت لغة يبقى العنصر معلقاً"""
+    missing = [lang for lang in job['targets'] if not translations.get(lang)]
+    
+    for category_name, key, item in job['members']:
+        written = False
+        for lang in job['targets']:
+            if not item[lang] and translations.get(lang):
+                item[lang] = translations[lang]
+                written = True
+        # الميزانية قد تؤجل بعض لغات العنصر إلى تشغيل لاحق
+        if all(item[lang] for lang in TARGET_LANGS[job['source_lang']]):
+            mark_done(category_name, key, item, translated=True)
+            print(f"   • [{category_name}] {key[:30]}...")
+        elif written:
+            record_partial(category_name, key, item)
     
+    # ما أوقفته الميزانية ليس فشلاً: يبقى معلقاً للتشغيل التالي
+    if missing and not isinstance(error, BudgetExhausted):
+        record_dead_letter(job, missing, error)
+
+async def translate_jobs_batched(jobs, limiter, concurrency):
+    """ترجمة مجموعة أعمال بطلب واحد، مع التقسيم إلى نصفين عند فشل JSON"""
+    try:
+        results = await request_batch_async(jobs, limiter, concurrency)
+    except BudgetExhausted as e:
+        for job in jobs:
+            apply_job_result(job, {}, e)
+        return
+    except Exception as e:
+        print(f"❌ خطأ في الترجمة ({len(jobs)} نص): {e}")
+        for job in jobs:
+            apply_job_result(job, {}, e)
+        return
+    
+    if results is None:
+        results = {}
+    
+    for job in jobs:
+        if job['id'] in results:
+            for lang, translation in results[job['id']].items():
+                remember_translation(job['text'], job['source_lang'], lang, translation)
+                telemetry.record_translation(job['source_lang'], lang)
+            apply_job_result(job, results[job['id']])
+    
+    missing = [job for job in jobs if job['id'] not in results]
+    if not missing:
+        return
+    
+    telemetry.record_retry(batch_source_lang(missing))
+    
+    if len(missing) < len(jobs):
+        # إعادة محاولة الناقص فقط
+        await translate_jobs_batched(missing, limiter, concurrency)
+    elif len(missing) > 1:
+        print(f"   ⚠️  فشل تحليل JSON، تقسيم الدفعة ({len(missing)} نص)")
+        half = len(missing) // 2
+        await asyncio.gather(
+            translate_jobs_batched(missing[:half], limiter, concurrency),
+            translate_jobs_batched(missing[half:], limiter, concurrency),
+        )
+    else:
+        # نص واحد فشل تحليله: طلب منفصل لكل لغة
+        job = missing[0]
+        translations, error = await translate_languages_async(job, job['targets'], limiter, concurrency)
+        apply_job_result(job, translations, error)
+
+def get_source(item):
+    """تحديد النص واللغة المصدر لعنصر"""
+    source_lang = 'ar' if item['ar'] else 'en'
+    return item[source_lang], source_lang
+
+def iter_pending(data):
+    """(الفئة، المفتاح، العنصر) لكل نص يحتاج ترجمة"""
+    if isinstance(data, TranslationStore):
+        # فحص بت الحالة فقط بدون قراءة بقية الحقول
+        yield from data.iter_pending()
+        return
     for category_name, category_data in data.items():
-        print(f"📂 الفئة: {category_name}")
-        
         for key, item in category_data.items():
-            # تخطي إذا تمت الترجمة
-            if not item.get('needs_translation', True):
-                continue
-            
-            # تحديد اللغة المصدر
-            source_text = item['ar'] if item['ar'] else item['en']
-            source_lang = 'ar' if item['ar'] else 'en'
-            
-            if not source_text:
-                continue
-            
-            # تخطي الآيات القرآنية
-            if source_lang == 'ar' and is_quranic_verse(source_text):
-                print(f"   ⏭️  تخطي آية قرآنية: {source_text[:30]}...")
-                item['needs_translation'] = False
+            if item.get('needs_translation', True):
+                yield category_name, key, item
+
+def select_pending(entries):
+    """تصفية (الفئة، المفتاح، العنصر): تخطي الفارغ وما لا يُترجم، وتمرير الباقي"""
+    for category_name, key, item in entries:
+        source_text, source_lang = get_source(item)
+        
+        if not source_text:
+            continue
+        
+        # تخطي ما صنّفه الاستخراج (آيات، أرقام، علامات تجارية، اختصارات)
+        skip_reason = skip_reason_of(item, source_text)
+        if skip_reason:
+            skip_item(category_name, key, item, source_text, source_lang, skip_reason)
+            continue
+        
+        yield category_name, key, item
+
+def collect_pending(data):
+    """جمع العناصر التي تحتاج ترجمة بترتيب الملف"""
+    return list(select_pending(iter_pending(data)))
+
+def skip_reason_of(item, source_text):
+    """سبب تخطي الترجمة من الاستخراج، أو تصنيف النص الآن لملفات استخراج قديمة"""
+    if 'skip_reason' in item:
+        return item['skip_reason']
+    return classify_text(source_text)[1]
+
+def skip_item(category_name, key, item, source_text, source_lang, skip_reason):
+    """تعليم نص لا يُترجم كمكتمل (ونسخه للغات الأخرى إذا كان رقماً أو اسماً أو مكتوباً بلغة هدف)"""
+    if skip_reason == 'quranic':
+        print(f"   ⏭️  تخطي آية قرآنية: {source_text[:30]}...")
+    elif skip_reason in COPY_KINDS:
+        for lang in TARGET_LANGS[source_lang]:
+            if not item[lang]:
+                item[lang] = source_text
+    mark_done(category_name, key, item)
+
+async def translate_job_async(job, limiter, concurrency):
+    """ترجمة نص واحد لكل لغاته الناقصة بالتوازي"""
+    if 'anchor' in job:
+        # نص شبه مطابق لنص آخر في نفس التشغيل: بعد ترجمته تجده الذاكرة التقريبية
+        await job['anchor']['done'].wait()
+    try:
+        translations, error = await translate_languages_async(job, job['targets'], limiter, concurrency)
+        apply_job_result(job, translations, error)
+    finally:
+        if 'done' in job:
+            job['done'].set()
+
+def normalize_source(text):
+    """توحيد النص المصدر لاكتشاف التكرار"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+def build_jobs(pending):
+    """تجميع العناصر المعلقة حسب النص المصدر: كل نص فريد عمل واحد"""
+    groups = {}
+    for category_name, key, item in pending:
+        source_text, source_lang = get_source(item)
+        group_key = (source_lang, normalize_source(source_text))
+        groups.setdefault(group_key, []).append((category_name, key, item))
+    
+    jobs = []
+    saved = 0
+    for (source_lang, source_text), members in groups.items():
+        # كل لغة ناقصة في أي عنصر من المجموعة
+        missing = [
+            lang for lang in TARGET_LANGS[source_lang]
+            if any(not item[lang] for _, _, item in members)
+        ]
+        
+        targets = []
+        for lang in missing:
+            cached = recall_translation(source_text, source_lang, lang)
+            if cached is None:
+                targets.append(lang)
                 continue
-            
-            print(f"   • {key[:30]}...")
-            
-            # ترجمة للغات المطلوبة
-            if source_lang == 'ar':
-                # ترجمة من العربية
-                if not item['en']:
-                    item['en'] = translate_text(source_text, 'ar', 'en')
-                    time.sleep(1)  # سرعة متوسطة
-                
-                if not item['fr']:
-                    item['fr'] = translate_text(source_text, 'ar', 'fr')
-                    time.sleep(1)
-                
-                if not item['zh']:
-                    item['zh'] = translate_text(source_text, 'ar', 'zh')
-                    time.sleep(1)
-            
-            else:
-                # ترجمة من الإنجليزية
-                if not item['ar']:
-                    item['ar'] = translate_text(source_text, 'en', 'ar')
-                    time.sleep(1)
-                
-                if not item['fr']:
-                    item['fr'] = translate_text(source_text, 'en', 'fr')
-                    time.sleep(1)
-                
-                if not item['zh']:
-                    item['zh'] = translate_text(source_text, 'en', 'zh')
-                    time.sleep(1)
-            
-            item['needs_translation'] = False
-            translated_count += 1
-            
-            # حد أقصى للترجمات في كل تشغيل
-            if max_translations and translated_count >= max_translations:
-                print(f"\n⚠️  تم الوصول للحد الأقصى ({max_translations} نص)")
-                print(f"   شغّل السكريبت مرة أخرى لإكمال الترجمة")
-                return data
+            for _, _, item in members:
+                if not item[lang]:
+                    item[lang] = cached
+        
+        if not targets:
+            for category_name, key, item in members:
+                mark_done(category_name, key, item)
+            continue
+        
+        # الطلبات التي كانت ستُرسل لكل نسخة مكررة على حدة
+        saved += sum(
+            1 for _, _, item in members for lang in targets if not item[lang]
+        ) - len(targets)
         
-        print()
+        category_name, key, _ = members[0]
+        jobs.append({
+            'id': f"{category_name}.{key}",
+            'members': members,
+            'text': source_text,
+            'source_lang': source_lang,
+            'targets': targets,
+        })
+    
+    if len(groups) < len(pending):
+        print(f"♻️  إزالة التكرار: {len(groups)} نص فريد من {len(pending)} "
+              f"(توفير {saved} طلب ترجمة)\n")
+    
+    return jobs
+
+def link_similar_jobs(jobs):
+    """ربط كل نص شبه مطابق لنص سابق في القائمة به، ليُترجم بعده ويستفيد من ترجمته"""
+    thresholds = [t for t in (FUZZY_REUSE_THRESHOLD, FUZZY_REFERENCE_THRESHOLD) if t is not None]
+    if get_memory() is None or not thresholds:
+        return 0
+    
+    # فهرس LSH مؤقت للنصوص التي لا تنتظر غيرها (فلا تتكون سلاسل انتظار)
+    bands = {}
+    linked = 0
+    for job in jobs:
+        # الأشرطة تشمل اللغة المصدر، فالمرشحون من نفس اللغة
+        job_bands = minhash_bands(job['text'], job['source_lang'], '')
+        candidates = {id(anchor): anchor for band in job_bands for anchor in bands.get(band, ())}
+        score, best = max(
+            ((similarity(job['text'], anchor['text']), anchor) for anchor in candidates.values()),
+            default=(0.0, None), key=lambda scored: scored[0],
+        )
+        if best is not None and score >= min(thresholds):
+            job['anchor'] = best
+            best.setdefault('done', asyncio.Event())
+            linked += 1
+            continue
+        for band in job_bands:
+            bands.setdefault(band, []).append(job)
+    
+    if linked:
+        print(f"🔗 {linked} نص شبه مطابق لنص آخر: يُترجم بعده بمساعدة ترجمته\n")
+    return linked
+
+# ============================================
+# الجدولة حسب الأولوية والميزانية
+# ============================================
+
+def job_priority(job, lang):
+    """أولوية ترجمة نص إلى لغة (أعلى أولوية بين العناصر التي تشترك فيه)"""
+    location = max(
+        CATEGORY_PRIORITY.get(category_name, 0) + PAGE_PRIORITY.get(item.get('source_file'), 0)
+        for category_name, _, item in job['members']
+    )
+    return location + LANG_PRIORITY.get(lang, 0)
+
+def estimate_request(job, lang, price_factor=1.0):
+    """التوكنات والتكلفة التقديرية لطلب ترجمة نص إلى لغة واحدة"""
+    input_tokens = estimate_tokens(build_prompt(job['text'], job['source_lang'], lang))
+    output_tokens = estimate_tokens(job['text']) * 2 + 8
+    system_tokens = estimate_tokens(SYSTEM_PROMPT)
+    # التعليمات الثابتة تُقرأ من الكاش في كل طلب بعد الأول
+    if PROMPT_CACHING:
+        cost = token_cost(input_tokens, output_tokens, cache_read_tokens=system_tokens)
+    else:
+        cost = token_cost(input_tokens + system_tokens, output_tokens)
+    return input_tokens + output_tokens + system_tokens, cost * price_factor
+
+def estimate_batched_request(job, lang, batch, batch_size, price_factor=1.0):
+    """التوكنات والتكلفة الإضافية لترجمة نص إلى لغة داخل طلب مجمّع
+    
+    batch: حالة التحزيم حتى الآن {'placed': معرفات النصوص، 'requests'، 'items'، 'tokens'}؛ يُحزم كل نص
+    عند أول لغة له كما يفعل pack_batches، ويتحمل أول نص في كل طلب القالب والتعليمات الثابتة
+    """
+    input_tokens = 0
+    output_tokens = estimate_tokens(job['text']) * 2 + 8
+    system_tokens = 0
+    if job['id'] not in batch['placed']:
+        job_tokens = estimate_output_tokens(job)
+        if batch['items'] and (batch['items'] >= batch_size or
+                               batch['tokens'] + job_tokens > BATCH_MAX_TOKENS):
+            batch['items'] = 0
+            batch['tokens'] = 0
+        if not batch['items']:
+            batch['requests'] += 1
+            input_tokens += estimate_tokens(build_batch_prompt([]))
+            system_tokens = estimate_tokens(SYSTEM_PROMPT)
+        batch['placed'].add(job['id'])
+        batch['items'] += 1
+        batch['tokens'] += job_tokens
+        input_tokens += estimate_tokens(json.dumps(batch_entry(job), ensure_ascii=False, indent=1))
+        output_tokens += estimate_tokens(job['id'])
+    if PROMPT_CACHING:
+        cost = token_cost(input_tokens, output_tokens, cache_read_tokens=system_tokens)
+    else:
+        cost = token_cost(input_tokens + system_tokens, output_tokens)
+    return input_tokens + output_tokens + system_tokens, cost * price_factor
+
+def plan_jobs(jobs, budget_tokens=None, budget_usd=None, price_factor=1.0, cache_write=True,
+              batch_size=None):
+    """ترتيب الطلبات حسب الأولوية واختيار ما يدخل في الميزانية
+    
+    يرجع الأعمال المختارة (بلغاتها المختارة فقط) وملخص الخطة
+    cache_write: احتساب كتابة التعليمات في الكاش (False إذا كُتبت في خطة سابقة من نفس التشغيل)
+    batch_size: التسعير كطلبات مجمّعة (--batched) بدلاً من طلب لكل نص ولغة
+    """
+    tasks = []
+    for index, job in enumerate(jobs):
+        for lang in job['targets']:
+            # النص المشترك بين عناصر كثيرة أولاً عند التساوي، ثم ترتيب الملف
+            tasks.append((-job_priority(job, lang), -len(job['members']), index, lang))
+    tasks.sort()
+    
+    plan = {
+        'requests': 0, 'tokens': 0, 'cost_usd': 0.0,
+        'deferred_requests': 0, 'deferred_tokens': 0, 'deferred_cost_usd': 0.0,
+        'budget_reached': False, 'categories': {},
+    }
+    # أول طلب يكتب التعليمات في الكاش (1.25× بدل قراءتها بـ 0.1×)
+    cache_write_cost = 0.0
+    if PROMPT_CACHING and cache_write:
+        system_tokens = estimate_tokens(SYSTEM_PROMPT)
+        cache_write_cost = token_cost(0, 0, system_tokens, -system_tokens) * price_factor
+    
+    batch = {'placed': set(), 'requests': 0, 'items': 0, 'tokens': 0}
+    selected = {}
+    for _, _, index, lang in tasks:
+        if batch_size:
+            # الطلب هو الطلب المجمّع: يُحسب مرة واحدة عند أول نص فيه
+            opened = batch['requests']
+            tokens, cost = estimate_batched_request(jobs[index], lang, batch, batch_size, price_factor)
+            requests = batch['requests'] - opened
+        else:
+            tokens, cost = estimate_request(jobs[index], lang, price_factor)
+            requests = 1
+        if not selected:
+            cost += cache_write_cost
+        over_tokens = budget_tokens and plan['tokens'] + tokens > budget_tokens
+        over_usd = budget_usd and plan['cost_usd'] + cost > budget_usd
+        # التوقف عند أول طلب لا يدخل حتى لا يسبق الأقل أهمية الأهم
+        if plan['budget_reached'] or over_tokens or over_usd:
+            if batch_size and not plan['budget_reached']:
+                # المؤجل يُحزم من جديد في التشغيل التالي
+                batch = {'placed': set(), 'requests': 0, 'items': 0, 'tokens': 0}
+                tokens, cost = estimate_batched_request(jobs[index], lang, batch, batch_size, price_factor)
+                requests = batch['requests']
+            plan['budget_reached'] = True
+            plan['deferred_requests'] += requests
+            plan['deferred_tokens'] += tokens
+            plan['deferred_cost_usd'] += cost
+            continue
+        
+        plan['requests'] += requests
+        plan['tokens'] += tokens
+        plan['cost_usd'] += cost
+        selected.setdefault(index, []).append(lang)
+        
+        category_name = jobs[index]['members'][0][0]
+        counts = plan['categories'].setdefault(category_name, {'requests': 0, 'tokens': 0, 'cost_usd': 0.0})
+        counts['requests'] += requests
+        counts['tokens'] += tokens
+        counts['cost_usd'] += cost
+    
+    # selected بترتيب أول ظهور في القائمة المرتبة: الأهم يُرسل أولاً
+    planned = [
+        {**jobs[index], 'targets': [lang for lang in jobs[index]['targets'] if lang in langs]}
+        for index, langs in selected.items()
+    ]
+    return planned, plan
+
+def print_plan(plan, budget_tokens=None, budget_usd=None):
+    """ملخص الخطة: الطلبات والتوكنات والتكلفة التقديرية"""
+    limits = []
+    if budget_usd:
+        limits.append(f"${budget_usd:g}")
+    if budget_tokens:
+        limits.append(f"{budget_tokens} توكن")
+    
+    print("\n" + "="*50)
+    print(f"🧮 خطة الترجمة (الميزانية: {' / '.join(limits) or 'بدون حد'}):")
+    print("="*50)
+    for category_name, counts in sorted(plan['categories'].items(),
+                                        key=lambda entry: -CATEGORY_PRIORITY.get(entry[0], 0)):
+        print(f"  • {category_name:<16} {counts['requests']:>5} طلب  "
+              f"{counts['tokens']:>8} توكن  ≈ ${counts['cost_usd']:.4f}")
+    print(f"المجموع: {plan['requests']} طلب، {plan['tokens']} توكن ≈ ${plan['cost_usd']:.4f}")
+    if plan['budget_reached']:
+        print(f"⏸️  مؤجل لتشغيل لاحق: {plan['deferred_requests']} طلب، "
+              f"{plan['deferred_tokens']} توكن ≈ ${plan['deferred_cost_usd']:.4f}")
+    print("="*50 + "\n")
+
+def schedule(data, budget_tokens=None, budget_usd=None, price_factor=1.0, pending=None,
+             batch_size=None):
+    """العناصر المعلقة ← أعمال بلا تكرار ← المختار منها حسب الأولوية والميزانية
+    
+    pending: (الفئة، المفتاح، العنصر) لترجمة هذه العناصر فقط بدلاً من كل المعلق في data
+    batch_size: تسعير الطلبات المجمّعة (انظر plan_jobs)
+    """
+    if pending is None:
+        jobs = build_jobs(collect_pending(data))
+    else:
+        jobs = build_jobs(list(select_pending(pending)))
+    planned, plan = plan_jobs(jobs, budget_tokens, budget_usd, price_factor, batch_size=batch_size)
+    print_plan(plan, budget_tokens, budget_usd)
+    run_stats['budget_reached'] = plan['budget_reached']
+    return planned, plan
+
+def print_budget_reached(plan):
+    """تنبيه عند تأجيل طلبات بسبب الميزانية (في الخطة أو أثناء التشغيل)"""
+    if plan['budget_reached']:
+        print(f"\n⚠️  تم الوصول للميزانية: أُجل {plan['deferred_requests']} طلب "
+              f"(≈ ${plan['deferred_cost_usd']:.4f})")
+    if run_stats['budget_stopped']:
+        print(f"\n⚠️  الإنفاق الفعلي بلغ الميزانية: لم يُرسل {run_stats['budget_stopped']} طلب من الخطة")
+    if plan['budget_reached'] or run_stats['budget_stopped']:
+        print(f"   شغّل السكريبت مرة أخرى لإكمال الترجمة، أو ارفع --budget-usd / --budget-tokens")
+
+async def translate_batch_async(data, budget_tokens=None, budget_usd=None,
+                                concurrency=MAX_CONCURRENCY,
+                                requests_per_minute=REQUESTS_PER_MINUTE,
+                                tokens_per_minute=TOKENS_PER_MINUTE,
+                                batched=False,
+                                batch_size=BATCH_MAX_ITEMS,
+                                pending=None):
+    """ترجمة مجموعة من النصوص بالتوازي (pending: عناصر محددة فقط، انظر schedule)"""
+    
+    if pending is None:
+        total_count = sum(
+            len(category) for category in data.values()
+        )
+    else:
+        pending = list(pending)
+        total_count = len(pending)
+    
+    print(f"\n🌐 بدء الترجمة ({total_count} نص، {concurrency} طلب متزامن)...\n")
+    
+    flusher = asyncio.create_task(flush_telemetry_periodically())
+    
+    jobs, plan = schedule(data, budget_tokens, budget_usd, pending=pending,
+                          batch_size=batch_size if batched else None)
+    # الخطة تقديرية: الطلبات الجديدة تتوقف أيضاً عندما يبلغ الإنفاق الفعلي الميزانية
+    set_spend_limit(budget_tokens, budget_usd)
+    
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    # يبدأ من --concurrency وينخفض تلقائياً عند 429 / 529
+    adaptive = AdaptiveConcurrency(concurrency)
+    
+    start_translation_timer()
+    try:
+        if batched:
+            batches = pack_batches(jobs, max_items=batch_size)
+            print(f"📦 {len(jobs)} نص في {len(batches)} طلب مجمّع\n")
+            await asyncio.gather(*(
+                translate_jobs_batched(batch, limiter, adaptive)
+                for batch in batches
+            ))
+        else:
+            link_similar_jobs(jobs)
+            await asyncio.gather(*(
+                translate_job_async(job, limiter, adaptive)
+                for job in jobs
+            ))
+    finally:
+        stop_translation_timer()
+    
+    flusher.cancel()
+    if backend is not None:
+        await backend.aclose()
+    
+    print(f"\n✅ اكتملت ترجمة {run_stats['items']} نص")
+    if int(adaptive.limit) < concurrency:
+        print(f"📉 التوازي في نهاية التشغيل: {int(adaptive.limit)} من {concurrency}")
+    
+    if memory is not None:
+        print_memory_stats(memory)
+    
+    print_telemetry_summary(telemetry)
+    
+    cost = token_cost(run_stats['input_tokens'], run_stats['output_tokens'],
+                      run_stats['cache_write_tokens'], run_stats['cache_read_tokens'])
+    print(f"\n💰 توكنات هذا التشغيل: {run_stats['input_tokens']} مدخلات + "
+          f"{run_stats['output_tokens']} مخرجات ≈ ${cost:.4f}")
+    print_cache_usage()
+    print_budget_reached(plan)
     
-    print(f"✅ تمت ترجمة {translated_count} نص")
     return data
 
+def print_cache_usage():
+    """توكنات كاش التعليمات في هذا التشغيل والتوفير مقارنة بإرسالها كاملة"""
+    written = run_stats['cache_write_tokens']
+    read = run_stats['cache_read_tokens']
+    if written or read:
+        saved = (read * (PRICE_INPUT_PER_MTOK - PRICE_CACHE_READ_PER_MTOK) -
+                 written * (PRICE_CACHE_WRITE_PER_MTOK - PRICE_INPUT_PER_MTOK)) / 1_000_000
+        print(f"🗄️  كاش التعليمات: كتابة {written} + قراءة {read} توكن (توفير ≈ ${saved:.4f})")
+    elif PROMPT_CACHING and run_stats['input_tokens']:
+        print("⚠️  لم يُستخدم كاش التعليمات (قد تكون أقصر من الحد الأدنى للنموذج)")
+
+def translate_batch(data, budget_tokens=None, budget_usd=None, **options):
+    """ترجمة مجموعة من النصوص"""
+    return asyncio.run(translate_batch_async(data, budget_tokens, budget_usd, **options))
+
 # ============================================
-# توليد ملف translations.jsx
+# Message Batches API
 # ============================================
 
-def generate_translations_jsx(data):
-    """توليد ملف translations.jsx من البيانات"""
+def load_batch_state(path=BATCHES_FILE):
+    """الدفعات المرسلة التي لم تُدمج نتائجها بعد"""
+    if not os.path.exists(path):
+        return {'batches': []}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_batch_state(state, path=BATCHES_FILE):
+    """حفظ الدفعات المعلقة (أو حذف الملف إذا لم يبق شيء)"""
+    if state['batches']:
+        save_json_atomic(state, path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+def build_batch_requests(jobs):
+    """طلب لكل نص ولغة: {custom_id: وصف الطلب}"""
+    requests = {}
+    for index, job in enumerate(jobs):
+        for lang in job['targets']:
+            # المفاتيح الحقيقية قد تتجاوز حد custom_id (64 حرفاً) أو تحتوي على نقاط
+            requests[f"j{index}-{lang}"] = {
+                'text': job['text'],
+                'source_lang': job['source_lang'],
+                'target_lang': lang,
+                'members': [[category_name, key] for category_name, key, _ in job['members']],
+            }
+    return requests
+
+def submit_batches(state, jobs):
+    """إرسال الأعمال في دفعات وحفظ أرقامها فوراً"""
+    requests = list(build_batch_requests(jobs).items())
+    
+    for start in range(0, len(requests), BATCH_API_MAX_REQUESTS):
+        chunk = dict(requests[start:start + BATCH_API_MAX_REQUESTS])
+        # الطلبات تُبنى مرة واحدة خارج إعادة المحاولة (البحث عن المراجع يُحسب في الإحصائيات)
+        prompts = [
+            (custom_id, build_prompt(request['text'], request['source_lang'], request['target_lang'],
+                                     find_reference(request['text'], request['source_lang'],
+                                                    request['target_lang'])),
+             MAX_TOKENS)
+            for custom_id, request in chunk.items()
+        ]
+        batch_id = call_with_retries(lambda: get_backend().submit_batch(
+            prompts, SYSTEM_PROMPT, PROMPT_CACHING,
+        ))
+        state['batches'].append({
+            'id': batch_id,
+            'submitted_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'requests': chunk,
+        })
+        # الحفظ بعد كل دفعة: إذا توقف السكريبت لا تُرسل مرة ثانية
+        save_batch_state(state)
+        print(f"📤 أُرسلت الدفعة {batch_id} ({len(chunk)} طلب)")
+
+def wait_for_batch(batch_id):
+    """فحص حالة الدفعة بفترات متزايدة حتى تنتهي"""
+    delay = BATCH_POLL_MIN
+    while True:
+        status = call_with_retries(lambda: get_backend().retrieve_batch(batch_id))
+        counts = status['counts']
+        if status['status'] == 'ended':
+            return counts
+        print(f"   ⏳ {batch_id}: {counts['processing']} قيد المعالجة، "
+              f"{counts['succeeded']} نجح، {counts['errored']} فشل — الفحص بعد {delay:.0f} ثانية")
+        time.sleep(delay)
+        delay = min(BATCH_POLL_MAX, delay * 2)
+
+def merge_batch_results(data, batch):
+    """دمج نتائج دفعة منتهية في البيانات (آمن عند التكرار بعد توقف مفاجئ)"""
+    requests = batch['requests']
+    failures = {}
+    touched = {}
     
-    output = "export const translations = {\n"
+    for custom_id, response, error in get_backend().batch_results(batch['id']):
+        request = requests.get(custom_id)
+        if request is None:
+            continue
+        
+        text = response['text'].strip() if response else ""
+        telemetry.observe_request(request['source_lang'], request['target_lang'], None, response)
+        if response:
+            record_usage(response)
+        if not text:
+            failures.setdefault((request['text'], request['source_lang']), (request, []))[1].append(
+                (request['target_lang'], error or "رد فارغ")
+            )
+            continue
+        
+        lang = request['target_lang']
+        remember_translation(request['text'], request['source_lang'], lang, text)
+        telemetry.record_translation(request['source_lang'], lang)
+        for category_name, key in request['members']:
+            # العنصر قد يكون حُذف من الملف بعد إرسال الدفعة
+            item = data.get(category_name, {}).get(key)
+            if item is None:
+                continue
+            if not item[lang]:
+                item[lang] = text
+            touched[(category_name, key)] = item
+    
+    for (category_name, key), item in touched.items():
+        _, source_lang = get_source(item)
+        if item.get('needs_translation', True) and all(item[lang] for lang in TARGET_LANGS[source_lang]):
+            mark_done(category_name, key, item, translated=True)
+    
+    for request, errors in failures.values():
+        members = [
+            (category_name, key, data[category_name][key])
+            for category_name, key in request['members']
+            if key in data.get(category_name, {})
+        ]
+        job = {'members': members, 'text': request['text'], 'source_lang': request['source_lang']}
+        record_dead_letter(job, [lang for lang, _ in errors], errors[0][1], reason='batch')
+    
+    return len(touched)
+
+def translate_with_batch_api(data, budget_tokens=None, budget_usd=None):
+    """الترجمة عبر Message Batches API: إرسال، انتظار، دمج (ويمكن المتابعة بعد إعادة التشغيل)"""
+    state = load_batch_state()
+    
+    if state['batches']:
+        print(f"♻️  متابعة {len(state['batches'])} دفعة مرسلة سابقاً\n")
+        plan = {'budget_reached': False}
+    else:
+        jobs, plan = schedule(data, budget_tokens, budget_usd, BATCH_API_DISCOUNT)
+        if not jobs:
+            print("✅ لا توجد نصوص تحتاج ترجمة")
+            return data
+        print(f"\n📦 إرسال {len(jobs)} نص إلى Message Batches API...\n")
+        submit_batches(state, jobs)
+    
+    print("\n⏳ انتظار النتائج (قد يستغرق حتى 24 ساعة؛ يمكن الإيقاف والمتابعة لاحقاً)...")
+    stop_flushing = threading.Event()
+    threading.Thread(target=flush_telemetry_in_thread, args=(stop_flushing,), daemon=True).start()
+    start_translation_timer()
+    try:
+        while state['batches']:
+            batch = state['batches'][0]
+            counts = wait_for_batch(batch['id'])
+            print(f"📥 انتهت الدفعة {batch['id']}: {counts['succeeded']} نجح، {counts['errored']} فشل، "
+                  f"{counts['expired']} انتهت صلاحيته")
+            merged = merge_batch_results(data, batch)
+            print(f"   ✓ دمج ترجمات {merged} عنصر")
+            state['batches'].pop(0)
+            # نسخة كاملة (مع اللغات الجزئية) قبل حذف الدفعة من الملف
+            journal.compact()
+            save_batch_state(state)
+    finally:
+        stop_translation_timer()
+        stop_flushing.set()
+    
+    if memory is not None:
+        print_memory_stats(memory)
+    
+    print_telemetry_summary(telemetry)
+    
+    cost = token_cost(run_stats['input_tokens'], run_stats['output_tokens'],
+                      run_stats['cache_write_tokens'], run_stats['cache_read_tokens']) * BATCH_API_DISCOUNT
+    print(f"\n💰 توكنات هذا التشغيل: {run_stats['input_tokens']} مدخلات + "
+          f"{run_stats['output_tokens']} مخرجات ≈ ${cost:.4f} (بسعر Batches API)")
+    print_cache_usage()
+    print_budget_reached(plan)
+    
+    return data
+
+# ============================================
+# توليد ملف translations.jsx
+# ============================================
+
+def iter_translations_jsx(data):
+    """أجزاء ملف translations.jsx بالترتيب (للكتابة المتدفقة)"""
     
     languages = ['ar', 'en', 'fr', 'zh']
     lang_comments = {
@@ -187,33 +1679,107 @@ def generate_translations_jsx(data):
         'zh': 'Chinese (Simplified)'
     }
     
+    yield "export const translations = {\n"
+    
     for lang in languages:
-        output += f"  // ============================================\n"
-        output += f"  // {lang_comments[lang]}\n"
-        output += f"  // ============================================\n"
-        output += f"  {lang}: {{\n"
+        yield "  // ============================================\n"
+        yield f"  // {lang_comments[lang]}\n"
+        yield "  // ============================================\n"
+        yield f"  {lang}: {{\n"
         
         for category_name, category_data in sorted(data.items()):
-            output += f"    // ============ {category_name} ============\n"
-            output += f"    {category_name}: {{\n"
+            yield f"    // ============ {category_name} ============\n"
+            yield f"    {js_key(category_name)}: {{\n"
             
             for key, item in sorted(category_data.items()):
-                value = item.get(lang, '').replace('\\', '\\\\').replace('"', '\\"')
-                output += f'      {key}: "{value}",\n'
+                yield f"      {js_key(key)}: {js_string(item.get(lang, ''))},\n"
             
-            output += f"    }},\n\n"
+            yield "    },\n\n"
         
-        output += f"  }},\n\n"
+        yield "  },\n\n"
     
-    output += "};\n"
-    
-    return output
+    yield "};\n"
+
+def generate_translations_jsx(data):
+    """توليد ملف translations.jsx من البيانات"""
+    return ''.join(iter_translations_jsx(data))
+
+def write_translations_jsx(data, path=JSX_FILE):
+    """كتابة ملف translations.jsx المجمّع مباشرة على القرص"""
+    with open(path, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+        f.writelines(iter_translations_jsx(data))
 
 # ============================================
 # التشغيل
 # ============================================
 
+def parse_args():
+    """قراءة خيارات سطر الأوامر"""
+    parser = argparse.ArgumentParser(description="ترجمة النصوص المستخرجة باستخدام Claude API")
+    parser.add_argument('--budget-usd', type=float, default=BUDGET_USD,
+                        help="ميزانية التشغيل بالدولار (0 = بدون حد)")
+    parser.add_argument('--budget-tokens', type=int, default=BUDGET_TOKENS,
+                        help="ميزانية التشغيل بالتوكنات")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="عرض الخطة والتكلفة التقديرية فقط بدون إرسال أي طلب")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY,
+                        help="عدد الطلبات المتزامنة")
+    parser.add_argument('--rpm', type=int, default=REQUESTS_PER_MINUTE,
+                        help="حد الطلبات في الدقيقة")
+    parser.add_argument('--tpm', type=int, default=TOKENS_PER_MINUTE,
+                        help="حد التوكنات في الدقيقة")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="تعطيل ذاكرة الترجمة")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=BACKEND,
+                        help="مزوّد الترجمة")
+    parser.add_argument('--base-url', default=BASE_URL,
+                        help="عنوان بديل لـ Messages API (مثلاً خادم fake_anthropic_server.py)")
+    add_output_arguments(parser)
+    parser.add_argument('--jsx', action='store_true',
+                        help=f"كتابة الملف المجمّع {JSX_FILE} أيضاً")
+    parser.add_argument('--batched', action='store_true',
+                        help="إرسال عدة نصوص وكل لغاتها في طلب واحد")
+    parser.add_argument('--batch-size', type=int, default=BATCH_MAX_ITEMS,
+                        help="الحد الأقصى للنصوص في الطلب المجمّع")
+    parser.add_argument('--batch-api', action='store_true',
+                        help="استخدام Message Batches API (نصف السعر، النتائج خلال ساعات)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    
+    if args.no_cache:
+        TRANSLATION_MEMORY_FILE = None
+    BACKEND = args.backend
+    BASE_URL = args.base_url
+    budget_usd = args.budget_usd or None
+    budget_tokens = args.budget_tokens or None
+    
+    # الخطة فقط: بدون مفتاح ولا اتصال ولا كتابة ملفات
+    if args.dry_run:
+        if not os.path.exists(INPUT_FILE):
+            print(f"❌ الملف غير موجود: {INPUT_FILE}")
+            exit(1)
+        # ذاكرة الترجمة للقراءة فقط: لا تُنشأ ولا يُحدَّث last_used في وضع الخطة
+        if TRANSLATION_MEMORY_FILE and not os.path.exists(TRANSLATION_MEMORY_FILE):
+            TRANSLATION_MEMORY_FILE = None
+        elif TRANSLATION_MEMORY_FILE:
+            memory = TranslationMemory(TRANSLATION_MEMORY_FILE, read_only=True)
+        schedule(load_data(), budget_tokens, budget_usd,
+                 BATCH_API_DISCOUNT if args.batch_api else 1.0,
+                 batch_size=args.batch_size if args.batched and not args.batch_api else None)
+        if memory is not None:
+            memory.close()
+        exit(0)
+    
+    try:
+        get_backend()
+    except BackendError as e:
+        print(f"❌ خطأ: {e}")
+        print("   قم بتشغيل: export ANTHROPIC_API_KEY='your-key-here'")
+        print("   أو استخدم خادم الاختبار المحلي: --base-url http://127.0.0.1:8765")
+        exit(1)
+    
     print("🚀 بدء ترجمة النصوص...\n")
     
     # قراءة البيانات
@@ -222,26 +1788,52 @@ if __name__ == "__main__":
         print(f"   قم بتشغيل extract_texts.py أولاً")
         exit(1)
     
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # ترجمة النصوص
-    # غيّر max_translations=None لترجمة كل شيء
-    translated_data = translate_batch(data, max_translations=200)
+    translated_data = load_data()
+    journal = TranslationJournal(translated_data)
+    run_stats['budget_usd'] = budget_usd
+    run_stats['budget_tokens'] = budget_tokens
     
-    # حفظ النتائج
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(translated_data, f, ensure_ascii=False, indent=2)
+    # ترجمة النصوص (الأهم أولاً حتى تنفد الميزانية)
+    # استخدم --budget-usd 0 لترجمة كل شيء
+    try:
+        if args.batch_api:
+            translate_with_batch_api(translated_data, budget_tokens, budget_usd)
+        else:
+            translate_batch(
+                translated_data,
+                budget_tokens=budget_tokens,
+                budget_usd=budget_usd,
+                concurrency=args.concurrency,
+                requests_per_minute=args.rpm,
+                tokens_per_minute=args.tpm,
+                batched=args.batched,
+                batch_size=args.batch_size,
+            )
+    except KeyboardInterrupt:
+        print("\n⚠️  تم الإيقاف، الترجمات المكتملة محفوظة")
+        if args.batch_api:
+            print(f"   الدفعات المرسلة محفوظة في {BATCHES_FILE}")
+        print("   شغّل السكريبت مرة أخرى للمتابعة")
+        exit(130)
+    finally:
+        # حفظ النتائج
+        journal.close()
+        save_dead_letters()
+        telemetry.flush()
+        if memory is not None:
+            memory.close()
+        backend.close()
     
     print(f"\n✅ تم حفظ النتائج في: {OUTPUT_FILE}")
     
-    # توليد ملف translations.jsx
-    jsx_content = generate_translations_jsx(translated_data)
-    
-    with open("translations_GENERATED.jsx", 'w', encoding='utf-8') as f:
-        f.write(jsx_content)
+    # كتابة ملفات اللغات مباشرة
+    print(f"\n📝 كتابة ملفات الترجمة في {OUTPUT_DIR}:")
+    write_output(translated_data, **output_options(args))
     
-    print(f"✅ تم توليد: translations_GENERATED.jsx")
+    # الملف المجمّع القديم عند الطلب فقط
+    if args.jsx:
+        write_translations_jsx(translated_data)
+        print(f"✅ تم توليد: {JSX_FILE}")
     
     # صوت تنبيه عند الانتهاء
     print('\a')  # Bell sound
@@ -249,6 +1841,6 @@ if __name__ == "__main__":
     print('\a')
     
     print(f"\n📝 الخطوة التالية:")
-    print(f"   1. راجع ملف translations_GENERATED.jsx")
-    print(f"   2. انسخه إلى src/components/translations.jsx")
+    print(f"   1. راجع ملفات {OUTPUT_DIR}")
+    print(f"   2. شغّل: python check_progress.py")
     print(f"   3. شغّل السكريبت مرة أخرى إذا بقيت ترجمات")
\ No newline at end of file
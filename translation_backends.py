@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+مزوّدات الترجمة (Backends)
+واجهة موحّدة يستخدمها translate_texts.py بدلاً من عميل Anthropic مباشرة،
+حتى يمكن توجيه الطلبات إلى خادم محلي (fake_anthropic_server.py) لقياس الأداء بدون مفتاح أو إنترنت
+"""
+
+import os
+
+# ============================================
+# الإعدادات
+# ============================================
+
+# المزوّد الافتراضي
+DEFAULT_BACKEND = "anthropic"
+
+# مفتاح وهمي يُستخدم مع --base-url إذا لم يوجد مفتاح (الخادم المحلي لا يتحقق منه)
+OFFLINE_API_KEY = "offline"
+
+# ============================================
+# الواجهة
+# ============================================
+
+class BackendError(Exception):
+    """خطأ من المزوّد مع رمز HTTP ومدة الانتظار المقترحة إن وجدت"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class TranslationBackend:
+    """الواجهة التي يطبقها كل مزوّد
+
+    complete_async ترجع قاموساً:
+    {'text': ..., 'input_tokens': ..., 'output_tokens': ..., 'cache_write_tokens': ..., 'cache_read_tokens': ...}
+    وترفع BackendError عند الفشل. system: تعليمات ثابتة، cache_system: تخزينها في كاش المزوّد إن دعمه
+    """
+
+    name = None
+
+    def __init__(self, model):
+        self.model = model
+
+    async def complete_async(self, prompt, max_tokens, system=None, cache_system=False):
+        """طلب غير متزامن"""
+        raise NotImplementedError
+
+    async def aclose(self):
+        """إغلاق الاتصالات غير المتزامنة (في نهاية كل حلقة asyncio)"""
+
+    def close(self):
+        """إغلاق الاتصالات"""
+
+    # الطلبات المؤجلة (Batches): اختيارية
+
+    def submit_batch(self, requests, system=None, cache_system=False):
+        """إرسال دفعة [(custom_id, prompt, max_tokens)] وإرجاع رقمها"""
+        raise BackendError(f"المزوّد {self.name} لا يدعم Batches API")
+
+    def retrieve_batch(self, batch_id):
+        """حالة الدفعة: {'status': 'in_progress' | 'canceling' | 'ended', 'counts': {...}}"""
+        raise BackendError(f"المزوّد {self.name} لا يدعم Batches API")
+
+    def batch_results(self, batch_id):
+        """نتائج دفعة منتهية: (custom_id، الرد الموحّد أو None، رسالة الخطأ)"""
+        raise BackendError(f"المزوّد {self.name} لا يدعم Batches API")
+
+# ============================================
+# Anthropic
+# ============================================
+
+class AnthropicBackend(TranslationBackend):
+    """Claude عبر Messages API (أو أي خادم متوافق معها عبر base_url)"""
+
+    name = "anthropic"
+
+    def __init__(self, model, api_key=None, base_url=None, max_retries=None):
+        super().__init__(model)
+        self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY", "")
+        if not self.api_key and base_url:
+            self.api_key = OFFLINE_API_KEY
+        if not self.api_key:
+            raise BackendError("يجب تعيين ANTHROPIC_API_KEY")
+        self.base_url = base_url
+        self.max_retries = max_retries
+        # العملاء يُنشؤون عند أول طلب
+        self._client = None
+        self._async_client = None
+
+    def _client_options(self):
+        """خيارات إنشاء العميل"""
+        options = {'api_key': self.api_key}
+        if self.base_url:
+            options['base_url'] = self.base_url
+        if self.max_retries is not None:
+            options['max_retries'] = self.max_retries
+        return options
+
+    @property
+    def client(self):
+        """العميل المتزامن (Batches API)"""
+        if self._client is None:
+            from anthropic import Anthropic
+            self._client = Anthropic(**self._client_options())
+        return self._client
+
+    @property
+    def async_client(self):
+        """العميل غير المتزامن"""
+        if self._async_client is None:
+            from anthropic import AsyncAnthropic
+            self._async_client = AsyncAnthropic(**self._client_options())
+        return self._async_client
+
+    def _request(self, prompt, max_tokens, system=None, cache_system=False):
+        """معاملات الطلب"""
+        request = {
+            'model': self.model,
+            'max_tokens': max_tokens,
+            'messages': [
+                {"role": "user", "content": prompt}
+            ],
+        }
+        if system:
+            block = {"type": "text", "text": system}
+            if cache_system:
+                # كل الطلبات التالية بنفس التعليمات تقرأها من الكاش
+                block["cache_control"] = {"type": "ephemeral"}
+            request['system'] = [block]
+        return request
+
+    @staticmethod
+    def _response(message):
+        """تحويل رد الـ SDK إلى القاموس الموحّد"""
+        usage = getattr(message, 'usage', None)
+        return {
+            'text': ''.join(block.text for block in message.content if getattr(block, 'type', '') == 'text'),
+            'input_tokens': getattr(usage, 'input_tokens', 0) or 0,
+            'output_tokens': getattr(usage, 'output_tokens', 0) or 0,
+            'cache_write_tokens': getattr(usage, 'cache_creation_input_tokens', 0) or 0,
+            'cache_read_tokens': getattr(usage, 'cache_read_input_tokens', 0) or 0,
+        }
+
+    @staticmethod
+    def _error(error):
+        """تحويل أخطاء الـ SDK إلى BackendError"""
+        import anthropic
+
+        if isinstance(error, anthropic.APIStatusError):
+            retry_after = None
+            value = error.response.headers.get('retry-after')
+            if value:
+                try:
+                    retry_after = float(value)
+                except ValueError:
+                    pass
+            return BackendError(str(error), status=error.status_code, retry_after=retry_after)
+        return BackendError(str(error))
+
+    async def complete_async(self, prompt, max_tokens, system=None, cache_system=False):
+        """طلب غير متزامن"""
+        import anthropic
+
+        try:
+            message = await self.async_client.messages.create(
+                **self._request(prompt, max_tokens, system, cache_system)
+            )
+        except anthropic.APIError as e:
+            raise self._error(e) from e
+        return self._response(message)
+
+    def submit_batch(self, requests, system=None, cache_system=False):
+        """إرسال دفعة [(custom_id, prompt, max_tokens)] وإرجاع رقمها"""
+        import anthropic
+
+        try:
+            batch = self.client.messages.batches.create(requests=[
+                {'custom_id': custom_id, 'params': self._request(prompt, max_tokens, system, cache_system)}
+                for custom_id, prompt, max_tokens in requests
+            ])
+        except anthropic.APIError as e:
+            raise self._error(e) from e
+        return batch.id
+
+    def retrieve_batch(self, batch_id):
+        """حالة الدفعة: {'status': 'in_progress' | 'canceling' | 'ended', 'counts': {...}}"""
+        import anthropic
+
+        try:
+            batch = self.client.messages.batches.retrieve(batch_id)
+        except anthropic.APIError as e:
+            raise self._error(e) from e
+        counts = batch.request_counts
+        return {
+            'status': batch.processing_status,
+            'counts': {
+                name: getattr(counts, name, 0)
+                for name in ('processing', 'succeeded', 'errored', 'canceled', 'expired')
+            },
+        }
+
+    def batch_results(self, batch_id):
+        """نتائج دفعة منتهية: (custom_id، الرد الموحّد أو None، رسالة الخطأ)"""
+        import anthropic
+
+        try:
+            for entry in self.client.messages.batches.results(batch_id):
+                result = entry.result
+                if result.type == 'succeeded':
+                    yield entry.custom_id, self._response(result.message), None
+                elif result.type == 'errored':
+                    yield entry.custom_id, None, f"{result.error.error.type}: {result.error.error.message}"
+                else:
+                    yield entry.custom_id, None, result.type
+        except anthropic.APIError as e:
+            raise self._error(e) from e
+
+    async def aclose(self):
+        """إغلاق العميل غير المتزامن (مرتبط بحلقة asyncio الحالية)"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    def close(self):
+        """إغلاق الاتصالات"""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+# ============================================
+# السجل
+# ============================================
+
+# أضف مزوّداً جديداً هنا ليظهر في --backend
+BACKENDS = {
+    AnthropicBackend.name: AnthropicBackend,
+}
+
+def create_backend(name=DEFAULT_BACKEND, **options):
+    """إنشاء مزوّد بالاسم"""
+    if name not in BACKENDS:
+        raise BackendError(f"مزوّد غير معروف: {name} (المتاح: {', '.join(BACKENDS)})")
+    return BACKENDS[name](**options)
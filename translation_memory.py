@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+ذاكرة ترجمة دائمة على القرص (SQLite)
+كل ترجمة مفتاحها بصمة النص المصدر + اللغتين + النموذج + نسخة الطلب
+مع فهرس تقريبي (MinHash-LSH على مقاطع الحروف) للعثور على ترجمات نصوص شبه مطابقة
+"""
+
+import difflib
+import hashlib
+import os
+import random
+import sqlite3
+import time
+import unicodedata
+
+# ============================================
+# الإعدادات
+# ============================================
+
+MEMORY_FILE = "translation_memory.sqlite"
+
+# الحجم الأقصى للذاكرة (بايت) قبل حذف الأقدم استخداماً
+MAX_MEMORY_BYTES = 200 * 1024 * 1024
+
+# عدد الإضافات قبل حفظ التغييرات على القرص
+COMMIT_EVERY = 50
+
+# البحث التقريبي: مقاطع من NGRAM_SIZE حروف، وتوقيع MinHash من BANDS × ROWS قيمة
+# نصان يصبحان مرشحين إذا تطابق شريط واحد من مقاطعهما
+# (احتمال ~65% عند تشابه جاكارد 0.4 للمقاطع، ~98% عند 0.6)
+NGRAM_SIZE = 3
+MINHASH_BANDS = 16
+MINHASH_ROWS = 3
+# أقصى عدد مرشحين (الأكثر أشرطة مشتركة) يُقارنون بالنص لكل بحث
+MAX_CANDIDATES = 50
+
+# معاملات ثابتة بين التشغيلات (الأشرطة محفوظة على القرص)
+MASK64 = (1 << 64) - 1
+_rng = random.Random(20240501)
+MINHASH_PARAMS = [
+    (_rng.getrandbits(64) | 1, _rng.getrandbits(64))
+    for _ in range(MINHASH_BANDS * MINHASH_ROWS)
+]
+
+# ============================================
+# التشابه التقريبي
+# ============================================
+
+def normalize_fuzzy(text):
+    """توحيد النص للمقارنة: بدون تشكيل وهمزات ومد وعلامات ترقيم وحالة الأحرف"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(
+        char for char in decomposed if not unicodedata.combining(char) and char != '\u0640'
+    )
+    return ' '.join(''.join(char if char.isalnum() else ' ' for char in stripped.casefold()).split())
+
+def shingles(normalized):
+    """مقاطع الحروف المتداخلة لنص موحد"""
+    if len(normalized) <= NGRAM_SIZE:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + NGRAM_SIZE] for i in range(len(normalized) - NGRAM_SIZE + 1)}
+
+def hash64(value, signed=False):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(),
+                          'little', signed=signed)
+
+def minhash_bands(text, source_lang, target_lang):
+    """مفاتيح أشرطة LSH لنص (لكل زوج لغات على حدة)؛ قائمة فارغة لنص بدون حروف"""
+    hashes = [hash64(shingle) for shingle in shingles(normalize_fuzzy(text))]
+    if not hashes:
+        return []
+    signature = [min((a * h + b) & MASK64 for h in hashes) for a, b in MINHASH_PARAMS]
+    return [
+        hash64(f"{source_lang}\0{target_lang}\0{band}\0"
+               f"{signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]}", signed=True)
+        for band in range(MINHASH_BANDS)
+    ]
+
+def similarity(text, other):
+    """نسبة التشابه بين نصين بعد التوحيد (1.0 = لا يختلفان إلا في التشكيل والترقيم)"""
+    return difflib.SequenceMatcher(None, normalize_fuzzy(text), normalize_fuzzy(other),
+                                   autojunk=False).ratio()
+
+def similarity_bucket(score):
+    """فئة التشابه في الإحصائيات"""
+    if score >= 1.0:
+        return "1.0"
+    if score < 0.5:
+        return "<0.5"
+    low = int(score * 10) / 10
+    return f"{low:.1f}-{low + 0.1:.1f}"
+
+# ============================================
+# ذاكرة الترجمة
+# ============================================
+
+def make_memory_key(text, source_lang, target_lang, model, prompt_version):
+    """توليد مفتاح الذاكرة من محتوى النص"""
+    raw = '\0'.join([source_lang, target_lang, model, str(prompt_version), text])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class TranslationMemory:
+    """ذاكرة ترجمة SQLite مع حذف حسب الحجم وعدادات إصابة/إخفاق"""
+
+    def __init__(self, path=MEMORY_FILE, max_bytes=MAX_MEMORY_BYTES, read_only=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        # قراءة فقط (وضع الخطة --dry-run): بدون إنشاء جداول ولا تحديث last_used ولا حفظ
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        # البحث التقريبي: {نتيجة: عدد} و {فئة التشابه: عدد}
+        self.fuzzy = {'reused': 0, 'referenced': 0, 'unmatched': 0}
+        self.similarities = {}
+        self._similar = {}
+        self._pending_writes = 0
+        
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            row = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+            self.total_bytes = row[0]
+            return
+        
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                source_lang TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                source_text TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        # أشرطة LSH لكل ترجمة (entry = rowid في entries)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS fuzzy_bands (
+                band INTEGER NOT NULL,
+                entry INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS fuzzy_bands_band ON fuzzy_bands (band)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS fuzzy_bands_entry ON fuzzy_bands (entry)")
+        self.conn.commit()
+        
+        row = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        self.total_bytes = row[0]
+        
+        self.index_missing_bands()
+
+    def index_missing_bands(self):
+        """فهرسة الترجمات المحفوظة قبل إضافة البحث التقريبي (مرة واحدة)"""
+        rows = self.conn.execute("""
+            SELECT rowid, source_lang, target_lang, source_text FROM entries
+            WHERE rowid NOT IN (SELECT entry FROM fuzzy_bands)
+        """).fetchall()
+        for entry, source_lang, target_lang, text in rows:
+            self.add_bands(entry, text, source_lang, target_lang)
+        if rows:
+            self.conn.commit()
+
+    def add_bands(self, entry, text, source_lang, target_lang):
+        self.conn.executemany(
+            "INSERT INTO fuzzy_bands VALUES (?, ?)",
+            [(band, entry) for band in minhash_bands(text, source_lang, target_lang)]
+        )
+
+    def get(self, text, source_lang, target_lang, model, prompt_version, repeat=False):
+        """البحث عن ترجمة محفوظة، أو None
+        
+        repeat: بحث ثانٍ لنفس الطلب بعد إخفاق محسوب (الإخفاق لا يُحسب مرتين، والإصابة تصحح الإخفاق السابق)
+        """
+        key = make_memory_key(text, source_lang, target_lang, model, prompt_version)
+        row = self.conn.execute(
+            "SELECT translation FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        
+        if row is None:
+            if not repeat:
+                self.misses += 1
+            return None
+        
+        if repeat:
+            self.misses -= 1
+        self.hits += 1
+        if self.read_only:
+            return row[0]
+        self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._after_write()
+        return row[0]
+
+    def similar(self, text, source_lang, target_lang, model, prompt_version):
+        """أقرب نص مترجم سابقاً: (التشابه، النص المصدر، الترجمة) أو None"""
+        lookup = (text, source_lang, target_lang, model, prompt_version)
+        if lookup in self._similar:
+            return self._similar[lookup]
+        
+        bands = minhash_bands(text, source_lang, target_lang)
+        best = None
+        if bands:
+            rows = self.conn.execute(f"""
+                SELECT key, source_text, translation FROM entries WHERE rowid IN (
+                    SELECT entry FROM fuzzy_bands WHERE band IN ({','.join('?' * len(bands))})
+                    GROUP BY entry ORDER BY COUNT(*) DESC LIMIT {MAX_CANDIDATES}
+                )
+            """, bands).fetchall()
+            for key, source_text, translation in rows:
+                # نفس النموذج ونسخة الطلب فقط (المفتاح يحتويهما)
+                if key != make_memory_key(source_text, source_lang, target_lang, model, prompt_version):
+                    continue
+                score = similarity(text, source_text)
+                if best is None or score > best[0]:
+                    best = (score, source_text, translation)
+        
+        self._similar[lookup] = best
+        return best
+
+    def record_match(self, outcome, score):
+        """تسجيل نتيجة بحث تقريبي: reused أو referenced أو unmatched"""
+        self.fuzzy[outcome] += 1
+        bucket = similarity_bucket(score)
+        self.similarities[bucket] = self.similarities.get(bucket, 0) + 1
+
+    def put(self, text, source_lang, target_lang, model, prompt_version, translation):
+        """حفظ ترجمة في الذاكرة"""
+        if not translation or self.read_only:
+            return
+        
+        key = make_memory_key(text, source_lang, target_lang, model, prompt_version)
+        # + أشرطة LSH (رقمان لكل شريط)
+        size = (len(text.encode('utf-8')) + len(translation.encode('utf-8')) + len(key) +
+                MINHASH_BANDS * 16)
+        
+        old = self.conn.execute("SELECT rowid, size FROM entries WHERE key = ?", (key,)).fetchone()
+        if old:
+            self.conn.execute("DELETE FROM fuzzy_bands WHERE entry = ?", (old[0],))
+            self.total_bytes -= old[1]
+        
+        cursor = self.conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, source_lang, target_lang, text, translation, size, time.time())
+        )
+        self.add_bands(cursor.lastrowid, text, source_lang, target_lang)
+        self.total_bytes += size
+        # نتائج البحث التقريبي السابقة قد تتغير بالترجمة الجديدة
+        self._similar.clear()
+        
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        
+        self._after_write()
+
+    def evict(self):
+        """حذف الأقدم استخداماً حتى يعود الحجم إلى 90% من الحد"""
+        target = int(self.max_bytes * 0.9)
+        rows = self.conn.execute(
+            "SELECT rowid, size FROM entries ORDER BY last_used"
+        )
+        
+        victims = []
+        for entry, size in rows:
+            if self.total_bytes <= target:
+                break
+            victims.append((entry,))
+            self.total_bytes -= size
+        
+        self.conn.executemany("DELETE FROM fuzzy_bands WHERE entry = ?", victims)
+        self.conn.executemany("DELETE FROM entries WHERE rowid = ?", victims)
+        self._similar.clear()
+        self.evicted += len(victims)
+
+    def _after_write(self):
+        self._pending_writes += 1
+        if self._pending_writes >= COMMIT_EVERY:
+            self.conn.commit()
+            self._pending_writes = 0
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self):
+        """إحصائيات الذاكرة"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'bytes': self.total_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evicted': self.evicted,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            'fuzzy': dict(self.fuzzy),
+            'similarities': dict(sorted(self.similarities.items(),
+                                        key=lambda entry: (entry[0] != '<0.5', entry[0]))),
+        }
+
+    def close(self):
+        if not self.read_only:
+            self.conn.commit()
+        self.conn.close()
+
+def print_memory_stats(memory):
+    """طباعة إحصائيات ذاكرة الترجمة"""
+    stats = memory.stats()
+    print(f"\n💾 ذاكرة الترجمة ({os.path.basename(memory.path)}):")
+    print(f"   إصابات: {stats['hits']} | إخفاقات: {stats['misses']} "
+          f"| نسبة الإصابة: {stats['hit_rate'] * 100:.1f}%")
+    print(f"   عدد الترجمات: {stats['entries']} | الحجم: {stats['bytes'] / 1024:.1f} KB "
+          f"| محذوف: {stats['evicted']}")
+    
+    fuzzy = stats['fuzzy']
+    searched = sum(fuzzy.values())
+    if searched:
+        print(f"   تقريبي: إعادة استخدام {fuzzy['reused']} | مرجع في الطلب {fuzzy['referenced']} "
+              f"| بدون تشابه {fuzzy['unmatched']} "
+              f"| نسبة الإصابة: {(fuzzy['reused'] + fuzzy['referenced']) / searched * 100:.1f}%")
+        print("   أفضل تشابه: " + ", ".join(
+            f"{bucket}: {count}" for bucket, count in stats['similarities'].items()
+        ))
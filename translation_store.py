@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+مخزن مضغوط لبيانات الترجمة في الذاكرة
+بدلاً من dict لكل نص (أسماء الحقول واسم الملف مكررة مع كل نص): أعمدة لكل لغة،
+أسماء الملفات والأنواع مخزنة مرة واحدة (interned) ومرجعها رقم، وحالة "يحتاج ترجمة" بت واحد لكل نص.
+يقدم نفس واجهة القواميس المتداخلة: data[category][key][lang] و items() و get() و setdefault()،
+فيعمل مع translate_batch و generate_translations_jsx و split_translations بدون تعديل
+"""
+
+import json
+from array import array
+from collections.abc import MutableMapping
+
+# ============================================
+# الإعدادات
+# ============================================
+
+# أعمدة النصوص (موجودة دائماً في كل عنصر)
+TEXT_FIELDS = ('ar', 'en', 'fr', 'zh')
+
+# حقول قيمها متكررة بين النصوص: تُخزن مرة واحدة ويُحفظ رقمها
+SYMBOL_FIELDS = ('source_file', 'kind', 'skip_reason')
+
+PENDING_FIELD = 'needs_translation'
+
+# رقم الرمز 0 = الحقل غير موجود في العنصر
+ABSENT = 0
+
+# حجم القراءة في التحليل المتدفق
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# ============================================
+# القراءة المتدفقة
+# ============================================
+
+def iter_items(path, chunk_size=STREAM_CHUNK_SIZE):
+    """قراءة (الفئة، المفتاح، العنصر) من ملف الترجمات دون تحميله كاملاً"""
+    decoder = json.JSONDecoder()
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = ''
+        pos = 0
+        
+        def more():
+            nonlocal buf, pos
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return False
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+        
+        def peek():
+            # تخطي المسافات والفواصل والنقطتين بين العناصر
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n,:':
+                    pos += 1
+                if pos < len(buf):
+                    return buf[pos]
+                if not more():
+                    return ''
+        
+        def value():
+            nonlocal pos
+            peek()
+            while True:
+                try:
+                    result, pos = decoder.raw_decode(buf, pos)
+                    return result
+                except json.JSONDecodeError:
+                    # قيمة مقطوعة في آخر الجزء المقروء
+                    if not more():
+                        raise
+        
+        if peek() != '{':
+            raise ValueError(f"{path}: ليس كائن JSON")
+        pos += 1
+        
+        while peek() not in ('}', ''):
+            category = value()
+            if peek() != '{':
+                raise ValueError(f"{path}: الفئة {category} ليست كائناً")
+            pos += 1
+            
+            while peek() not in ('}', ''):
+                key = value()
+                item = value()
+                yield category, key, item
+            pos += 1
+
+# ============================================
+# العنصر
+# ============================================
+
+class StoredItem(MutableMapping):
+    """عنصر ترجمة واحد: نافذة على صف في المخزن (بدون نسخ البيانات)"""
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, field):
+        store = self.store
+        if field in store.texts:
+            return store.texts[field][self.index]
+        if field in store.symbols:
+            symbol = store.symbols[field][self.index]
+            if symbol == ABSENT:
+                raise KeyError(field)
+            return store.strings[symbol]
+        if field == PENDING_FIELD:
+            return store.is_pending(self.index)
+        return store.extras[self.index][field]
+
+    def __setitem__(self, field, value):
+        store = self.store
+        if self.index in store.released:
+            # نافذة على عنصر محذوف (ترجمة وصلت بعد حذف النص): تُهمل الكتابة
+            return
+        if field in store.texts:
+            store.texts[field][self.index] = value
+        elif field in store.symbols:
+            store.symbols[field][self.index] = store.intern(value)
+        elif field == PENDING_FIELD:
+            store.set_pending(self.index, value)
+        else:
+            store.extras.setdefault(self.index, {})[field] = value
+
+    def __delitem__(self, field):
+        store = self.store
+        if field in store.symbols:
+            if store.symbols[field][self.index] == ABSENT:
+                raise KeyError(field)
+            store.symbols[field][self.index] = ABSENT
+        elif field in store.extras.get(self.index, {}):
+            del store.extras[self.index][field]
+        else:
+            # النصوص وحالة الترجمة موجودة دائماً
+            raise KeyError(field)
+
+    def __iter__(self):
+        store = self.store
+        yield from TEXT_FIELDS
+        if store.symbols['source_file'][self.index] != ABSENT:
+            yield 'source_file'
+        yield PENDING_FIELD
+        for field in SYMBOL_FIELDS[1:]:
+            if store.symbols[field][self.index] != ABSENT:
+                yield field
+        yield from store.extras.get(self.index, ())
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"StoredItem({dict(self)!r})"
+
+# ============================================
+# الفئة
+# ============================================
+
+class StoredCategory(MutableMapping):
+    """فئة: {المفتاح: رقم الصف}"""
+
+    __slots__ = ('store', 'name', 'rows')
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.rows = {}
+
+    def __getitem__(self, key):
+        return StoredItem(self.store, self.rows[key])
+
+    def __setitem__(self, key, item):
+        if key not in self.rows:
+            self.rows[key] = self.store.allocate()
+        self.store.write_row(self.rows[key], item)
+
+    def __delitem__(self, key):
+        self.store.release(self.rows.pop(key))
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __repr__(self):
+        return f"StoredCategory({self.name!r}, {len(self.rows)} items)"
+
+# ============================================
+# المخزن
+# ============================================
+
+class TranslationStore(MutableMapping):
+    """{الفئة: {المفتاح: العنصر}} بتخزين عمودي مضغوط"""
+
+    def __init__(self):
+        self.categories = {}
+        self.texts = {field: [] for field in TEXT_FIELDS}
+        self.symbols = {field: array('I') for field in SYMBOL_FIELDS}
+        # بت لكل صف: 1 = يحتاج ترجمة
+        self.pending = bytearray()
+        # حقول غير معروفة (نادرة): {رقم الصف: {الحقل: القيمة}}
+        self.extras = {}
+        # الرمز 0 محجوز لـ "غير موجود"
+        self.strings = [None]
+        self.string_ids = {}
+        # الصفوف المحذوفة لا يُعاد استخدامها أثناء التشغيل (نافذة قديمة لا تشير إلى نص آخر)
+        self.released = set()
+        self.size = 0
+
+    # ---------- واجهة القاموس ----------
+
+    def __getitem__(self, name):
+        return self.categories[name]
+
+    def __setitem__(self, name, items):
+        category = self.categories.get(name)
+        if category is None:
+            category = self.categories[name] = StoredCategory(self, self.intern_name(name))
+        for key, item in items.items():
+            category[key] = item
+
+    def __delitem__(self, name):
+        category = self.categories.pop(name)
+        for row in category.rows.values():
+            self.release(row)
+
+    def __iter__(self):
+        return iter(self.categories)
+
+    def __len__(self):
+        return len(self.categories)
+
+    def setdefault(self, name, default=None):
+        """الفئة (تُنشأ فارغة إذا لم توجد) مثل dict.setdefault"""
+        if name not in self.categories:
+            self[name] = default or {}
+        return self.categories[name]
+
+    # ---------- الصفوف ----------
+
+    def intern(self, value):
+        """رقم الرمز لقيمة نصية متكررة (None = غير موجود)"""
+        if value is None:
+            return ABSENT
+        symbol = self.string_ids.get(value)
+        if symbol is None:
+            symbol = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return symbol
+
+    def intern_name(self, name):
+        """نسخة واحدة من اسم الفئة"""
+        return self.strings[self.intern(name)]
+
+    def allocate(self):
+        """صف فارغ جديد"""
+        row = self.size
+        self.size += 1
+        for column in self.texts.values():
+            column.append('')
+        for column in self.symbols.values():
+            column.append(ABSENT)
+        if row // 8 >= len(self.pending):
+            self.pending.append(0)
+        return row
+
+    def release(self, row):
+        """تفريغ صف محذوف (يُستعاد حجمه عند الحفظ وإعادة التحميل)"""
+        for column in self.texts.values():
+            column[row] = ''
+        for column in self.symbols.values():
+            column[row] = ABSENT
+        self.set_pending(row, False)
+        self.extras.pop(row, None)
+        self.released.add(row)
+
+    def write_row(self, row, item):
+        """كتابة عنصر (dict أو StoredItem) في صف"""
+        for field in TEXT_FIELDS:
+            self.texts[field][row] = item.get(field, '')
+        for field in SYMBOL_FIELDS:
+            self.symbols[field][row] = self.intern(item.get(field))
+        self.set_pending(row, item.get(PENDING_FIELD, True))
+        extras = {
+            field: value for field, value in item.items()
+            if field not in self.texts and field not in self.symbols and field != PENDING_FIELD
+        }
+        if extras:
+            self.extras[row] = extras
+        else:
+            self.extras.pop(row, None)
+
+    def is_pending(self, row):
+        return bool(self.pending[row >> 3] & (1 << (row & 7)))
+
+    def set_pending(self, row, value):
+        if value:
+            self.pending[row >> 3] |= 1 << (row & 7)
+        else:
+            self.pending[row >> 3] &= ~(1 << (row & 7)) & 0xFF
+
+    # ---------- التكرار ----------
+
+    def iter_items(self):
+        """(الفئة، المفتاح، العنصر) لكل نص، مثل iter_items للملفات"""
+        for name, category in self.categories.items():
+            for key, row in category.rows.items():
+                yield name, key, StoredItem(self, row)
+
+    def iter_pending(self):
+        """العناصر التي تحتاج ترجمة فقط (فحص البت بدون إنشاء عناصر للباقي)"""
+        pending = self.pending
+        for name, category in self.categories.items():
+            for key, row in category.rows.items():
+                if pending[row >> 3] & (1 << (row & 7)):
+                    yield name, key, StoredItem(self, row)
+
+    def pending_count(self):
+        """عدد النصوص التي تحتاج ترجمة"""
+        return sum(bin(byte).count('1') for byte in self.pending)
+
+    # ---------- التحويل ----------
+
+    @classmethod
+    def from_dict(cls, data):
+        """من القواميس المتداخلة"""
+        store = cls()
+        for name, category_data in data.items():
+            store[name] = category_data
+        return store
+
+    @classmethod
+    def load(cls, path):
+        """قراءة ملف JSON بالتحليل المتدفق (بدون إنشاء القواميس كاملة في الذاكرة)"""
+        store = cls()
+        for name, key, item in iter_items(path):
+            store.setdefault(name)[key] = item
+        return store
+
+    def to_dict(self):
+        """قواميس متداخلة عادية"""
+        return {
+            name: {key: dict(StoredItem(self, row)) for key, row in category.rows.items()}
+            for name, category in self.categories.items()
+        }
+
+def json_default(value):
+    """للاستخدام مع json.dump(default=...): المخزن وعناصره كقواميس"""
+    if isinstance(value, MutableMapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
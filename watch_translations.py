@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+وضع المراقبة أثناء التطوير
+يراقب src/pages وعند كل تعديل: يستخرج الملفات المتغيرة فقط، يترجم النصوص الجديدة فقط،
+ويعيد كتابة ملفات اللغات المتأثرة فقط (مع --chunks: ملفات الفئات المتغيرة فقط)
+يستخدم inotify على Linux بدون مكتبات إضافية، ويرجع إلى الفحص الدوري في الأنظمة الأخرى
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+import translate_texts
+from extract_texts import (
+    JOBS, PAGES_DIR, KeyIndex, extract_all_texts, load_existing, load_manifest, save_manifest,
+    save_results,
+)
+from extract_texts import OUTPUT_FILE as EXTRACTED_FILE
+from split_translations import OUTPUT_DIR, add_output_arguments, output_options, write_output
+from translation_backends import BACKENDS, BackendError
+
+# ============================================
+# الإعدادات
+# ============================================
+
+# انتظار هدوء التعديلات قبل التحديث (الحفظ في المحرر يطلق عدة أحداث)
+DEBOUNCE_SECONDS = 0.5
+# أقصى تأخير للتحديث أثناء تعديلات متواصلة
+MAX_DEBOUNCE_SECONDS = 5.0
+
+# فترة الفحص الدوري عند غياب inotify
+POLL_INTERVAL = 1.0
+
+# أحداث inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+
+# رأس كل حدث: wd, mask, cookie, len ثم الاسم
+EVENT_HEADER = struct.Struct('iIII')
+
+# ============================================
+# مراقبة الملفات
+# ============================================
+
+class InotifyWatcher:
+    """مراقبة مجلد وكل مجلداته الفرعية عبر inotify (Linux فقط)"""
+
+    name = "inotify"
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        # AttributeError إذا لم تكن الدالة موجودة (غير Linux)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches = {}
+        self.add_tree(directory)
+
+    def add_tree(self, directory):
+        """مراقبة مجلد وكل ما بداخله (المجلدات الجديدة تُضاف عند إنشائها)"""
+        for root, _, _ in os.walk(directory):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(root), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                raise OSError(error, os.strerror(error), root)
+            self.watches[wd] = root
+
+    def wait(self, timeout=None):
+        """انتظار تغييرات حتى timeout ثانية (None = بلا حد)؛ يرجع مسارات ملفات JSX المتغيرة"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # ضاعت أحداث: الفحص التزايدي سيكتشف التغيير من mtime
+                changed.add(self.directory)
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+
+            path = os.path.join(self.watches.get(wd, self.directory), name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path)
+                if mask & (IN_CREATE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE):
+                    changed.add(path)
+            elif name.endswith('.jsx'):
+                changed.add(path)
+
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """مراقبة بالفحص الدوري لوقت التعديل والحجم (لكل الأنظمة)"""
+
+    name = "polling"
+
+    def __init__(self, directory, interval=POLL_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        """{المسار: (وقت التعديل، الحجم)} لكل ملفات JSX"""
+        snapshot = {}
+        for path in Path(self.directory).rglob('*.jsx'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[str(path)] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout=None):
+        """انتظار تغييرات حتى timeout ثانية (None = بلا حد)؛ يرجع مسارات ملفات JSX المتغيرة"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            if delay > 0:
+                time.sleep(delay)
+
+            current = self.scan()
+            changed = {
+                path for path in current.keys() | self.snapshot.keys()
+                if current.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = current
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+def create_watcher(directory, polling=False, interval=POLL_INTERVAL):
+    """inotify إن أمكن، وإلا الفحص الدوري"""
+    if not polling:
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify غير متاح ({e})، استخدام الفحص الدوري")
+    return PollingWatcher(directory, interval)
+
+def wait_for_changes(watcher, debounce=DEBOUNCE_SECONDS, max_delay=MAX_DEBOUNCE_SECONDS):
+    """انتظار أول تغيير ثم تجميع ما يليه حتى يهدأ (أو max_delay ثانية)"""
+    changed = set()
+    while not changed:
+        changed = watcher.wait()
+
+    deadline = time.monotonic() + max_delay
+    while True:
+        remaining = min(debounce, deadline - time.monotonic())
+        if remaining <= 0:
+            break
+        more = watcher.wait(remaining)
+        if not more:
+            break
+        changed |= more
+    return changed
+
+# ============================================
+# التحديث التزايدي
+# ============================================
+
+class WatchSession:
+    """حالة المراقبة في الذاكرة بين التحديثات: الاستخراج والسجل والترجمات"""
+
+    def __init__(self, pages_dir=PAGES_DIR, jobs=JOBS, translate=True, budget_tokens=None,
+                 budget_usd=None, concurrency=translate_texts.MAX_CONCURRENCY, output=None,
+                 drain_backlog=False):
+        self.pages_dir = pages_dir
+        self.jobs = jobs
+        self.translate = translate
+        self.drain_backlog = drain_backlog
+        self.budget_tokens = budget_tokens
+        self.budget_usd = budget_usd
+        self.concurrency = concurrency
+        self.output = output or {}
+        self.manifest = load_manifest()
+        self.key_index = KeyIndex.load()
+        self.extracted = None
+        self.data = None
+
+    def extract(self):
+        """استخراج الملفات المتغيرة فقط (حسب السجل) وحفظ الناتج"""
+        extracted = extract_all_texts(self.pages_dir, self.manifest, self.extracted, self.jobs,
+                                      self.key_index)
+        save_results(extracted, EXTRACTED_FILE)
+        save_manifest(self.manifest)
+        self.key_index.save()
+        self.extracted = extracted
+        return extracted
+
+    def start(self):
+        """التحديث الأول: استخراج، ثم تحميل الترجمات السابقة وكتابة كل الملفات
+        
+        النصوص المعلقة من تشغيل سابق لا تُترجم إلا مع --drain-backlog،
+        وفي مشروع جديد (بدون ملف ترجمات) تُترجم النصوص الأولى كلها
+        """
+        self.extracted = load_existing(EXTRACTED_FILE)
+        self.extract()
+        previous_run = os.path.exists(translate_texts.OUTPUT_FILE)
+        self.data = translate_texts.load_data()
+        translate_texts.journal = translate_texts.TranslationJournal(self.data)
+        backlog = list(translate_texts.iter_pending(self.data))
+        if backlog and self.translate and previous_run and not self.drain_backlog:
+            print(f"⏸️  {len(backlog)} نص معلق من تشغيل سابق لن يُترجم أثناء المراقبة "
+                  f"(استخدم --drain-backlog أو translate_texts.py)")
+            backlog = []
+        self.update(set(self.data), backlog)
+
+    def refresh(self):
+        """تحديث بعد تغيير الملفات: ترجمة النصوص المضافة فقط"""
+        extracted = self.extract()
+        added, retired, changed = translate_texts.merge_extracted(self.data, extracted)
+        if added or retired:
+            print(f"🔁 +{len(added)} نص جديد، -{retired} نص محذوف")
+        self.update(changed, [
+            (category_name, key, self.data[category_name][key]) for category_name, key in added
+        ])
+
+    def update(self, changed, pending):
+        """ترجمة العناصر المحددة (الفئة، المفتاح، العنصر) وكتابة ملفات الفئات المتغيرة"""
+        # سرعة كل دورة وحدها: بدون وقت الانتظار بين الحفظ والآخر
+        translate_texts.reset_run_counters()
+        pending = [entry for entry in pending if entry[2].get('needs_translation', True)]
+        if pending and self.translate:
+            translate_texts.translate_batch(
+                self.data, self.budget_tokens, self.budget_usd, concurrency=self.concurrency,
+                pending=pending,
+            )
+            translate_texts.save_dead_letters()
+            translate_texts.dead_letters.clear()
+            changed |= {category_name for category_name, _, _ in pending}
+
+        if not changed:
+            print("✓ لا تغيير في النصوص")
+            return
+
+        # نسخة كاملة من translations_final.json + الإحصائيات
+        translate_texts.journal.compact()
+        print(f"\n📝 كتابة {len(changed)} فئة متغيرة في {OUTPUT_DIR}:")
+        write_output(self.data, categories=changed, **self.output)
+
+    def close(self):
+        """حفظ كل شيء عند الإيقاف"""
+        if translate_texts.journal is not None:
+            translate_texts.journal.close()
+        translate_texts.save_dead_letters()
+        translate_texts.telemetry.flush()
+        if translate_texts.memory is not None:
+            translate_texts.memory.close()
+        if translate_texts.backend is not None:
+            translate_texts.backend.close()
+
+# ============================================
+# التشغيل
+# ============================================
+
+def parse_args():
+    """قراءة خيارات سطر الأوامر"""
+    parser = argparse.ArgumentParser(description="مراقبة src/pages وتحديث ملفات الترجمة تلقائياً")
+    parser.add_argument('--poll', action='store_true',
+                        help="الفحص الدوري بدلاً من inotify")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+                        help="فترة الفحص الدوري بالثواني")
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE_SECONDS,
+                        help="انتظار هدوء التعديلات قبل التحديث بالثواني")
+    parser.add_argument('--jobs', '-j', type=int, default=JOBS,
+                        help="عدد العمليات المتوازية للاستخراج (0 = عدد الأنوية)")
+    parser.add_argument('--no-translate', action='store_true',
+                        help="الاستخراج وكتابة الملفات فقط (النصوص الجديدة تبقى فارغة حتى الترجمة)")
+    parser.add_argument('--drain-backlog', action='store_true',
+                        help="ترجمة النصوص المعلقة من تشغيل سابق عند البدء (الافتراضي: الجديدة فقط)")
+    parser.add_argument('--budget-usd', type=float, default=0,
+                        help="ميزانية كل ترجمة بالدولار (0 = بدون حد؛ تهم مع --drain-backlog)")
+    parser.add_argument('--budget-tokens', type=int, default=0,
+                        help="ميزانية كل ترجمة بالتوكنات (0 = بدون حد)")
+    parser.add_argument('--concurrency', type=int, default=translate_texts.MAX_CONCURRENCY,
+                        help="عدد طلبات الترجمة المتزامنة")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=translate_texts.BACKEND,
+                        help="مزوّد الترجمة")
+    parser.add_argument('--base-url', default=translate_texts.BASE_URL,
+                        help="عنوان بديل لـ Messages API (مثلاً خادم fake_anthropic_server.py)")
+    add_output_arguments(parser)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if not os.path.isdir(PAGES_DIR):
+        print(f"❌ المجلد غير موجود: {PAGES_DIR}")
+        exit(1)
+
+    translate_texts.BACKEND = args.backend
+    translate_texts.BASE_URL = args.base_url
+    if not args.no_translate:
+        try:
+            translate_texts.get_backend()
+        except BackendError as e:
+            print(f"❌ خطأ: {e}")
+            print("   قم بتشغيل: export ANTHROPIC_API_KEY='your-key-here'")
+            print("   أو راقب بدون ترجمة: --no-translate")
+            exit(1)
+
+    session = WatchSession(
+        jobs=args.jobs or os.cpu_count() or 1,
+        translate=not args.no_translate,
+        budget_tokens=args.budget_tokens or None,
+        budget_usd=args.budget_usd or None,
+        concurrency=args.concurrency,
+        output=output_options(args),
+        drain_backlog=args.drain_backlog,
+    )
+    watcher = create_watcher(PAGES_DIR, args.poll, args.interval)
+
+    try:
+        session.start()
+        print(f"\n👀 مراقبة {PAGES_DIR} ({watcher.name}) — أوقفها بـ Ctrl+C")
+        while True:
+            changed = wait_for_changes(watcher, args.debounce)
+            started = time.perf_counter()
+            names = sorted(os.path.relpath(path, PAGES_DIR) for path in changed)
+            print(f"\n{'='*50}\n✏️  تغيّر: {', '.join(names[:5])}"
+                  f"{f' (+{len(names) - 5})' if len(names) > 5 else ''}")
+            session.refresh()
+            print(f"⚡ تم التحديث في {time.perf_counter() - started:.2f} ثانية")
+    except KeyboardInterrupt:
+        print("\n⏹️  تم إيقاف المراقبة")
+    finally:
+        watcher.close()
+        session.close()